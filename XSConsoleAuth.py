@@ -13,7 +13,7 @@
 # with this program; if not, write to the Free Software Foundation, Inc.,
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
-import os, spwd, re, sys, time, socket
+import os, spwd, re, sys, time, socket, threading
 
 import pam
 
@@ -34,6 +34,10 @@ else:
 
 class Auth:
     instance = None
+    POOL_MAX_IDLE = 4 # Maximum number of idle sessions kept for reuse
+    POOL_IDLE_EXPIRY_SECS = 300 # Idle sessions older than this are logged out
+    POOL_HEALTH_CHECK_SECS = 30 # Idle sessions older than this are checked before reuse
+    POOL_RECONNECT_ERRORS = ('HOST_IS_SLAVE', 'SESSION_INVALID')
 
     def __init__(self):
         self.isAuthenticated = False
@@ -43,6 +47,9 @@ class Auth:
         self.testingHost = None
         self.authTimestampSeconds = None
         self.masterConnectionBroken = False
+        self.poolLock = threading.Lock()
+        self.idleSessions = [] # List of Struct(session, idleSince), most recently used last
+        self.poolStats = { 'logins' : 0, 'reuses' : 0, 'expired' : 0, 'discarded' : 0 }
         socket.setdefaulttimeout(15)
 
         self.testMode = False
@@ -208,6 +215,105 @@ class Auth:
                 XSLog('XAPI Failed to logout exception was ', e)
         return None
 
+    def AcquireSession(self):
+        # Returns a logged in session from the pool, or a new one.  Pass it to ReleaseSession
+        # when finished with, or to CloseSession if it is no longer valid
+        retVal = None
+        while retVal is None:
+            self.ExpireIdleSessions()
+            self.poolLock.acquire()
+            try:
+                entry = None
+                if len(self.idleSessions) > 0:
+                    entry = self.idleSessions.pop()
+            finally:
+                self.poolLock.release()
+
+            if entry is None:
+                retVal = self.OpenSession()
+                if retVal is not None:
+                    self.poolStats['logins'] += 1
+                break
+            elif getTimeStamp() - entry.idleSince < self.POOL_HEALTH_CHECK_SECS or self.IsSessionHealthy(entry.session):
+                retVal = entry.session
+                self.poolStats['reuses'] += 1
+            else:
+                self.DiscardSession(entry.session)
+
+        return retVal
+
+    def ReleaseSession(self, inSession, inException = None):
+        # Returns a session to the pool.  Sessions that failed with inException are discarded if the
+        # error means that they can't be reused
+        if inSession is None:
+            return None
+        if self.IsReconnectError(inException):
+            self.DiscardSession(inSession)
+            if inException.details[0] == 'HOST_IS_SLAVE':
+                self.DiscardIdleSessions() # The pool master has changed
+            return None
+
+        self.poolLock.acquire()
+        try:
+            self.idleSessions.append(Struct(session = inSession, idleSince = getTimeStamp()))
+            excess = self.idleSessions[:-self.POOL_MAX_IDLE]
+            self.idleSessions = self.idleSessions[-self.POOL_MAX_IDLE:]
+        finally:
+            self.poolLock.release()
+
+        for entry in excess:
+            self.DiscardSession(entry.session)
+        return None
+
+    def ExpireIdleSessions(self):
+        timeNow = getTimeStamp()
+        self.poolLock.acquire()
+        try:
+            expired = [ entry for entry in self.idleSessions if timeNow - entry.idleSince > self.POOL_IDLE_EXPIRY_SECS ]
+            self.idleSessions = [ entry for entry in self.idleSessions if entry not in expired ]
+        finally:
+            self.poolLock.release()
+
+        for entry in expired:
+            self.poolStats['expired'] += 1
+            self.DiscardSession(entry.session)
+
+    def DiscardIdleSessions(self):
+        # Call when xapi has restarted or the network has been reconfigured, as pooled sessions may now be invalid
+        self.poolLock.acquire()
+        try:
+            discarded = self.idleSessions
+            self.idleSessions = []
+        finally:
+            self.poolLock.release()
+
+        for entry in discarded:
+            self.DiscardSession(entry.session)
+
+    def DiscardSession(self, inSession):
+        self.poolStats['discarded'] += 1
+        try:
+            self.CloseSession(inSession)
+        except Exception as e:
+            pass # Session is probably already invalid
+
+    def IsSessionHealthy(self, inSession):
+        try:
+            inSession.xenapi.session.get_this_host(inSession._session)
+            retVal = True
+        except Exception as e:
+            retVal = False
+        return retVal
+
+    def IsReconnectError(self, inException):
+        return isinstance(inException, XenAPI.Failure) and len(inException.details) > 0 and \
+            inException.details[0] in self.POOL_RECONNECT_ERRORS
+
+    def SessionPoolStats(self):
+        retVal = dict(self.poolStats)
+        retVal['idle'] = len(self.idleSessions)
+        return retVal
+
     def IsPasswordSet(self):
         # Security critical - mustn't wrongly return False
         retVal = True
@@ -233,11 +339,11 @@ class Auth:
 
         try:
             # Use xapi if possible, to take care of password changes for pools
-            session = self.OpenSession()
+            session = self.AcquireSession()
             try:
                 session.xenapi.session.change_password(inOldPassword, inNewPassword)
             finally:
-                self.CloseSession(session)
+                self.ReleaseSession(session)
         except Exception as e:
             ShellPipe("/usr/bin/passwd", "--stdin", "root").Call(inNewPassword)
             raise Exception(Lang("The underlying Xen API xapi could not be used.  Password changed successfully on this host only."))
@@ -15,6 +15,7 @@
 
 # App-wide imports
 import copy, inspect, re
+from collections import OrderedDict
 from pprint import pprint
 
 
@@ -38,3 +39,44 @@ class Struct:
 
     def __repr__(self):
         return str(self.__dict__)
+
+class LRUCache:
+    # Bounded cache for values that are expensive to recompute, e.g. wrapped or encoded text.
+    # Every instance is listed in LRUCache.caches so that statistics can be dumped
+    caches = []
+
+    def __init__(self, inName, inMaxEntries):
+        self.name = inName
+        self.maxEntries = inMaxEntries
+        self.entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+        LRUCache.caches.append(self)
+
+    def Lookup(self, inKey, inProc):
+        # Returns the cached value for inKey, or calls inProc to create it
+        if inKey in self.entries:
+            self.hits += 1
+            retVal = self.entries.pop(inKey)
+        else:
+            self.misses += 1
+            retVal = inProc()
+            if len(self.entries) >= self.maxEntries:
+                self.entries.popitem(last = False) # Discard the least recently used entry
+        self.entries[inKey] = retVal
+        return retVal
+
+    def Clear(self):
+        self.entries.clear()
+
+    def Stats(self):
+        return {
+            'entries' : len(self.entries),
+            'hits' : self.hits,
+            'misses' : self.misses
+        }
+
+    @classmethod
+    def Dump(cls):
+        print("\nText cache statistics:")
+        pprint(dict((cache.name, cache.Stats()) for cache in cls.caches))
@@ -0,0 +1,258 @@
+# Copyright (c) 2007-2009 Citrix Systems Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 2 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import os, select, signal, subprocess, sys, threading, time
+
+from XSConsoleBases import *
+from XSConsoleLog import *
+from XSConsoleScheduler import *
+
+class ChildProcess:
+    # A child process run off the main thread.  Output is collected line by line as it arrives, and
+    # the main loop is woken so that dialogues showing it can update.  The child leads its own process
+    # group, so that a timeout or a stop request stops everything that it started
+    KILL_GRACE_SECS = 5.0 # Between SIGTERM and SIGKILL
+    DRAIN_SECS = 1.0 # Wait for output after SIGKILL, in case a grandchild left its own process group holding the pipes
+    EXIT_POLL_SECS = 0.05 # Between checks for exit once the child has closed its output
+
+    def __init__(self, inParams, inTimeoutSecs = None, inShell = False, inMergeStderr = False, inInput = None, inStdin = False, inPassFDs = None):
+        # inParams is a list of parameters, or a string for the shell if inShell is True.  inStdin
+        # leaves stdin open for a later call to Input.  inPassFDs lists file descriptors for the child to inherit
+        self.params = inParams
+        self.timeoutSecs = inTimeoutSecs
+        self.shell = inShell
+        self.mergeStderr = inMergeStderr
+        self.input = inInput
+        self.stdinPiped = inStdin or inInput is not None
+        self.passFDs = FirstValue(inPassFDs, [])
+        self.condition = threading.Condition()
+        self.pipe = None
+        self.wakeRead = None
+        self.wakeWrite = None
+        self.outputLines = [] # stdout and stderr lines in the order they arrived
+        self.stdoutLines = []
+        self.stderrLines = []
+        self.returnCode = None
+        self.error = None # Exception that prevented the command from starting
+        self.started = False
+        self.done = False
+        self.timedOut = False
+        self.stopRequested = False
+        self.startTime = time.time()
+        self.finishTime = None
+
+    def Name(self):
+        if isinstance(self.params, (list, tuple)):
+            return ' '.join(self.params)
+        return self.params
+
+    def Launch(self):
+        # Starts the child and the thread that collects its output.  Raises an exception if the child can't be started
+        keywords = {
+            'stdin' : subprocess.PIPE if self.stdinPiped else open(os.devnull),
+            'stdout' : subprocess.PIPE,
+            'stderr' : subprocess.STDOUT if self.mergeStderr else subprocess.PIPE,
+            'shell' : self.shell
+        }
+        if sys.version_info >= (3, 2):
+            keywords['start_new_session'] = True
+            keywords['pass_fds'] = self.passFDs
+        else:
+            keywords['preexec_fn'] = os.setsid
+            keywords['close_fds'] = (len(self.passFDs) == 0)
+        try:
+            self.pipe = subprocess.Popen(self.params, **keywords)
+        finally:
+            if not self.stdinPiped:
+                keywords['stdin'].close()
+        self.startTime = time.time()
+        self.started = True
+        self.wakeRead, self.wakeWrite = os.pipe()
+        thread = threading.Thread(target = self.CollectOutput, name = 'ChildProcess')
+        thread.daemon = True
+        thread.start()
+        if self.input is not None:
+            self.Input(self.input)
+
+    def Input(self, inInput):
+        # Writes inInput, a string or list of lines, to stdin on a separate thread and then closes it
+        if isinstance(inInput, (list, tuple)):
+            inInput = "\n".join(inInput)
+        data = FirstValue(inInput, '')
+        if sys.version_info >= (3, 0):
+            data = data.encode('utf-8')
+
+        def WriteInput():
+            try:
+                try:
+                    if len(data) > 0:
+                        self.pipe.stdin.write(data)
+                finally:
+                    self.pipe.stdin.close()
+            except (IOError, OSError):
+                pass # The child exited without reading its input
+
+        thread = threading.Thread(target = WriteInput, name = 'ChildProcessInput')
+        thread.daemon = True
+        thread.start()
+
+    def AddLines(self, inName, inData):
+        # inData is a list of complete lines as bytes
+        lines = []
+        for line in inData:
+            if sys.version_info >= (3, 0):
+                line = line.decode('utf-8', 'replace')
+            if line.endswith('\r'):
+                line = line[:-1]
+            lines.append(line)
+        self.condition.acquire()
+        try:
+            if inName == 'stdout':
+                self.stdoutLines += lines
+            else:
+                self.stderrLines += lines
+            self.outputLines += lines
+        finally:
+            self.condition.release()
+
+    def Signal(self, inSignal):
+        try:
+            os.killpg(self.pipe.pid, inSignal)
+        except OSError:
+            pass # Already exited
+
+    def CollectOutput(self):
+        # Runs on the job's own thread until the child exits
+        streams = { self.pipe.stdout.fileno() : 'stdout' }
+        if not self.mergeStderr:
+            streams[self.pipe.stderr.fileno()] = 'stderr'
+        partial = dict((name, b'') for name in streams.values())
+        deadline = None if self.timeoutSecs is None else getTimeStamp() + self.timeoutSecs
+        killTime = None
+        drainDeadline = None
+        terminated = False
+        try:
+            while len(streams) > 0 or self.pipe.poll() is None:
+                timeNow = getTimeStamp()
+                if self.stopRequested and not terminated:
+                    terminated = True
+                    self.Signal(signal.SIGTERM)
+                    killTime = timeNow + self.KILL_GRACE_SECS
+                if deadline is not None and timeNow >= deadline:
+                    XSLogError("Command '"+self.Name()+"' timed out after "+str(self.timeoutSecs)+" seconds")
+                    self.timedOut = True
+                    deadline = None
+                    killTime = timeNow
+                if killTime is not None and timeNow >= killTime:
+                    self.Signal(signal.SIGKILL)
+                    killTime = None
+                    drainDeadline = timeNow + self.DRAIN_SECS
+                if drainDeadline is not None and timeNow >= drainDeadline:
+                    break
+
+                waitUntil = [ due for due in (deadline, killTime, drainDeadline) if due is not None ]
+                timeout = None if len(waitUntil) == 0 else max(0.0, min(waitUntil) - timeNow)
+                if len(streams) == 0:
+                    # The child has closed its output but not exited, and there is no descriptor to wait on for that
+                    timeout = self.EXIT_POLL_SECS if timeout is None else min(timeout, self.EXIT_POLL_SECS)
+                try:
+                    readyFDs = select.select(list(streams.keys()) + [self.wakeRead], [], [], timeout)[0]
+                except select.error as e:
+                    continue # Interrupted by a signal
+                if self.wakeRead in readyFDs:
+                    os.read(self.wakeRead, 4096)
+                gotOutput = False
+                for fd in readyFDs:
+                    if fd in streams:
+                        name = streams[fd]
+                        data = os.read(fd, 65536)
+                        if len(data) == 0:
+                            del streams[fd]
+                            if len(partial[name]) > 0:
+                                self.AddLines(name, [partial[name]])
+                                partial[name] = b''
+                        else:
+                            lines = (partial[name] + data).split(b'\n')
+                            partial[name] = lines.pop()
+                            self.AddLines(name, lines)
+                        gotOutput = True
+                if gotOutput:
+                    Scheduler.Inst().Notify()
+
+            self.returnCode = self.pipe.poll() # None if the child hasn't exited after SIGKILL and the drain
+        except Exception as e:
+            XSLogError("Command '"+self.Name()+"' failed: ", e)
+            self.error = e
+        for fileObj in (self.pipe.stdout, self.pipe.stderr):
+            if fileObj is not None:
+                fileObj.close()
+        self.condition.acquire()
+        try:
+            os.close(self.wakeRead)
+            os.close(self.wakeWrite)
+            self.wakeWrite = None # So that Cancel doesn't write to a reused descriptor
+        finally:
+            self.condition.release()
+        self.Finish()
+
+    def Finish(self):
+        self.condition.acquire()
+        try:
+            self.done = True
+            self.finishTime = time.time()
+            self.condition.notify_all()
+        finally:
+            self.condition.release()
+        Scheduler.Inst().Notify()
+
+    def RequestStop(self):
+        # Asks the output thread to stop the child, with SIGTERM and then SIGKILL
+        self.condition.acquire()
+        try:
+            self.stopRequested = True
+            if self.wakeWrite is not None:
+                os.write(self.wakeWrite, b'x')
+        finally:
+            self.condition.release()
+
+    def Wait(self, inTimeoutSecs = None):
+        # Returns True if the process has finished
+        deadline = None if inTimeoutSecs is None else getTimeStamp() + inTimeoutSecs
+        self.condition.acquire()
+        try:
+            while not self.done:
+                if deadline is None:
+                    self.condition.wait(60.0) # Python 2 ignores KeyboardInterrupt in untimed waits
+                else:
+                    remaining = deadline - getTimeStamp()
+                    if remaining <= 0.0:
+                        break
+                    self.condition.wait(remaining)
+            return self.done
+        finally:
+            self.condition.release()
+
+    def Stdout(self):
+        return self.stdoutLines
+
+    def Stderr(self):
+        return self.stderrLines
+
+    def OutputLines(self):
+        self.condition.acquire()
+        try:
+            return list(self.outputLines)
+        finally:
+            self.condition.release()
@@ -109,6 +109,14 @@ class CursesPalette:
 
 class CursesPane:
     debugBackground = 0
+    bytesWritten = 0 # Total bytes passed to curses, to measure the cost of redraws
+    windowsChanged = False # Set when windows are created or deleted, as the layout then needs a full redraw
+    BOX_CELL = None # Frame cell covered by the box, which is drawn by curses
+    # Status panes redraw the same strings on every frame, so their frame cells, wrapped lines and
+    # encoded bytes are cached
+    cellCache = LRUCache('cells', 1024)
+    wrapCache = LRUCache('wrap', 256)
+    encodeCache = LRUCache('encode', 1024)
 
     def __init__(self, inXPos, inYPos, inXSize, inYSize, inXOffset, inYOffset):
         self.xPos = inXPos
@@ -120,6 +128,24 @@ class CursesPane:
         self.yClipMin = 0
         self.yClipMax = self.ySize
         self.title = ""
+        # In retained mode, drawing between Erase and Refresh goes into a frame of (character, attribute)
+        # cells, and Refresh sends only the cells that differ from the last frame to curses
+        self.retained = False
+        self.frame = None
+        self.lastFrame = None
+        self.forceRedraw = True
+        self.frameChanged = False
+
+    def RetainedSet(self, inRetained):
+        self.retained = inRetained
+        self.Invalidate()
+
+    def Invalidate(self):
+        # The window contents may have been overwritten, so the next frame must be drawn in full
+        self.forceRedraw = True
+
+    def FrameChanged(self):
+        return self.frameChanged
 
     def HasBox(self):
         return self.hasBox
@@ -178,30 +204,36 @@ class CursesPane:
             clippedStr = clippedStr[:self.xSize - xPos]
 
             if len(clippedStr) > 0:
-                try:
-                    encodedStr = clippedStr
-                    if sys.version_info >= (3, 0) and isinstance(clippedStr, str):
-                        # encode the string into bytes using the terminal's charset encoding
-                        encodedStr = clippedStr.encode(Terminal.charset_encoding)
-                    elif not isinstance(encodedStr, str):
-                        # encode the Python2 unicode string into bytes using the terminal's charset encoding:
-                        encodedStr = convert_anything_to_str(clippedStr, Terminal.charset_encoding)
-                        # Clear field here since addstr will clear len(encodedStr)-len(clippedStr) too few spaces
-                        self.win.addstr(
-                            inY,
-                            xPos,
-                            " " * len(encodedStr),
-                            CursesPalette.ColourAttr(FirstValue(inColour, self.defaultColour)),
-                        )
-                        self.win.refresh()
-                    self.win.addstr(inY, xPos, encodedStr, CursesPalette.ColourAttr(FirstValue(inColour, self.defaultColour)))
-                except Exception as e:
-                    if xPos + len(inString) == self.xSize and inY + 1 == self.ySize:
-                        # Curses incorrectly raises an exception when writing the bottom right
-                        # character in a window, but still completes the write, so ignore it
-                        pass
-                    else:
-                        raise Exception("addstr failed with "+Lang(e)+" for '"+inString+"' at "+str(xPos)+', '+str(inY))
+                attr = CursesPalette.ColourAttr(FirstValue(inColour, self.defaultColour))
+                if self.frame is not None:
+                    cells = self.cellCache.Lookup((clippedStr, attr), lambda: [ (char, attr) for char in clippedStr ])
+                    self.frame[inY][xPos:xPos + len(cells)] = cells
+                else:
+                    self.WriteStr(clippedStr, xPos, inY, attr)
+
+    def WriteStr(self, inString, inX, inY, inAttr): # Internal use
+        try:
+            encodedStr = inString
+            if sys.version_info >= (3, 0) and isinstance(inString, str):
+                # encode the string into bytes using the terminal's charset encoding
+                encodedStr = self.encodeCache.Lookup((inString, Terminal.charset_encoding),
+                    lambda: inString.encode(Terminal.charset_encoding))
+            elif not isinstance(encodedStr, str):
+                # encode the Python2 unicode string into bytes using the terminal's charset encoding:
+                encodedStr = self.encodeCache.Lookup((inString, Terminal.charset_encoding),
+                    lambda: convert_anything_to_str(inString, Terminal.charset_encoding))
+                # Clear field here since addstr will clear len(encodedStr)-len(inString) too few spaces
+                self.win.addstr(inY, inX, " " * len(encodedStr), inAttr)
+                self.win.refresh()
+            CursesPane.bytesWritten += len(encodedStr)
+            self.win.addstr(inY, inX, encodedStr, inAttr)
+        except Exception as e:
+            if inX + len(inString) == self.xSize and inY + 1 == self.ySize:
+                # Curses incorrectly raises an exception when writing the bottom right
+                # character in a window, but still completes the write, so ignore it
+                pass
+            else:
+                raise Exception("addstr failed with "+Lang(e)+" for '"+inString+"' at "+str(inX)+', '+str(inY))
 
     def AddBox(self):
         self.hasBox = True
@@ -213,19 +245,27 @@ class CursesPane:
         yPos = inY
         width = self.xSize - inX - 1
         if width >= 1: # Text inside window
-            text = inString+" "
-            while len(text) > 0 and yPos < self.ySize:
-                spacePos = text.rfind(' ', 0, width)
-                if spacePos == -1:
-                    lineLength = width
-                else:
-                    lineLength = spacePos
-
-                thisLine = text[0:lineLength]
-                text = text[lineLength+1:]
+            for thisLine in self.wrapCache.Lookup((inString, width), lambda: self.WrapLines(inString, width)):
+                if yPos >= self.ySize:
+                    break
                 self.ClippedAddStr(thisLine, inX, inY, inColour)
                 yPos += 1
 
+    @classmethod
+    def WrapLines(cls, inString, inWidth): # Internal use
+        retVal = []
+        text = inString+" "
+        while len(text) > 0:
+            spacePos = text.rfind(' ', 0, inWidth)
+            if spacePos == -1:
+                lineLength = inWidth
+            else:
+                lineLength = spacePos
+
+            retVal.append(text[0:lineLength])
+            text = text[lineLength+1:]
+        return tuple(retVal)
+
     def AddHCentredText(self, inString, inY, inColour = None):
         xStart = self.xSize // 2 - len(inString) // 2
         self.ClippedAddStr(inString, xStart, inY, inColour)
@@ -237,19 +277,73 @@ class CursesPane:
             self.AddHCentredText(" "+self.title+" ", 0)
 
     def Erase(self):
-        self.win.erase()
+        if self.retained:
+            # Start a new frame rather than erasing the window
+            blank = (' ', CursesPalette.ColourAttr(self.defaultColour))
+            self.frame = [ [blank] * self.xSize for y in range(self.ySize) ]
+        else:
+            self.win.erase()
         self.Decorate()
 
     def Clear(self):
         self.win.clear()
+        self.Invalidate()
         self.Decorate()
 
     def Box(self):
-        self.win.box(0, 0)
+        if self.frame is not None:
+            for row in (self.frame[0], self.frame[-1]):
+                row[:] = [self.BOX_CELL] * self.xSize
+            for row in self.frame:
+                row[0] = self.BOX_CELL
+                row[-1] = self.BOX_CELL
+        else:
+            self.win.box(0, 0)
 
     def Refresh(self):
+        if self.frame is not None:
+            self.CommitFrame()
         self.win.noutrefresh()
 
+    def CommitFrame(self):
+        # Send the cells that differ from the last frame to curses, in runs of the same attribute
+        frame = self.frame
+        self.frame = None
+        blank = (' ', CursesPalette.ColourAttr(self.defaultColour))
+        lastFrame = self.lastFrame
+        forced = self.forceRedraw or lastFrame is None or len(lastFrame) != len(frame)
+        if not forced:
+            # Cells that become part of the box are only drawn by a full redraw, e.g. when a title shrinks
+            for y in (0, -1):
+                for x in range(self.xSize):
+                    if frame[y][x] is self.BOX_CELL and lastFrame[y][x] is not self.BOX_CELL:
+                        forced = True
+        if forced:
+            self.win.erase()
+            if self.hasBox:
+                self.win.box(0, 0)
+        self.frameChanged = forced
+        for y, row in enumerate(frame):
+            if not forced and row == lastFrame[y]:
+                continue
+            lastRow = None if forced else lastFrame[y]
+            x = 0
+            while x < self.xSize:
+                cell = row[x]
+                if cell is self.BOX_CELL or (forced and cell == blank) or (lastRow is not None and lastRow[x] == cell):
+                    x += 1
+                    continue
+                start = x
+                chars = []
+                while x < self.xSize and row[x] is not self.BOX_CELL and row[x][1] == cell[1] and \
+                    not (forced and row[x] == blank) and (lastRow is None or lastRow[x] != row[x]):
+                    chars.append(row[x][0])
+                    x += 1
+                self.WriteStr(''.join(chars), start, y, cell[1])
+                self.frameChanged = True
+        self.lastFrame = frame
+        self.forceRedraw = False
+
     def Redraw(self):
         self.win.redrawwin()
         self.Decorate()
@@ -262,6 +356,10 @@ class CursesPane:
         self.win.timeout(1000) # Return from getkey after x milliseconds if no key pressed
         return self.win.getkey()
 
+    def GetKeyNonBlocking(self):
+        self.win.timeout(0) # Raises an exception if no key is waiting
+        return self.win.getkey()
+
     def GetKeyBlocking(self):
         self.win.timeout(-1) # Wait for ever
         return self.win.getkey()
@@ -314,10 +412,12 @@ class CursesWindow(CursesPane):
         self.title = ""
         self.hasBox = False
         self.win.timeout(1000) # Return from getkey after x milliseconds if no key pressed
+        CursesPane.windowsChanged = True
 
     def Delete(self):
         # We rely on the garbage collector to call delwin(self.win), in the binding for PyCursesWindow_Dealloc
         del self.win
+        CursesPane.windowsChanged = True
 
 class CursesScreen(CursesPane):
     def __init__(self):
@@ -16,7 +16,7 @@
 import XenAPI
 import datetime
 import time
-import subprocess, re, shutil, sys, tempfile, socket, os, stat
+import subprocess, json, re, shutil, sys, tempfile, socket, os, stat, threading
 from pprint import pprint
 from simpleconfig import SimpleConfigFile
 
@@ -24,25 +24,10 @@ from XSConsoleAuth import *
 from XSConsoleKeymaps import *
 from XSConsoleLang import *
 from XSConsoleLog import *
+from XSConsoleScheduler import *
 from XSConsoleState import *
 from XSConsoleUtils import *
 
-# PR #22: Add py3-compatible wrapper for commands.getstatusoutput() to keep the code base functional:
-if sys.version_info >= (3, 0):
-    getoutput = subprocess.getoutput
-    getstatusoutput = subprocess.getstatusoutput
-
-else:
-    import commands
-
-    getoutput = commands.getoutput
-
-    def getstatusoutput(command):
-        """getstatusoutput with status = exit code, compatible with Python3 getstatusoutput()"""
-
-        status, output = commands.getstatusoutput(command)
-        return os.WEXITSTATUS(status), output  # https://github.com/benjaminp/six/issues/207
-
 
 class DataMethod:
     def __init__(self, inSend, inName):
@@ -55,16 +40,84 @@ class DataMethod:
     def __call__(self,  inDefault = None):
         return self.send(self.name,  inDefault)
 
+class BulkFetcher:
+    # Fetches xapi records a whole class at a time, so that callers can join them locally
+    # instead of making a get_record call per object.  Counts the calls it makes.
+    REFS_PER_QUERY = 64 # Limits the length of the 'or' expressions passed to get_all_records_where
+    NULL_REF = 'OpaqueRef:NULL'
+
+    def __init__(self, inSession):
+        self.session = inSession
+        self.callCounts = {}
+
+    def Call(self, inClass, inMethod, *inParams):
+        name = inClass+'.'+inMethod
+        self.callCounts[name] = self.callCounts.get(name, 0) + 1
+        return getattr(getattr(self.session.xenapi, inClass), inMethod)(*inParams)
+
+    def Record(self, inClass, inRef):
+        return self.Call(inClass, 'get_record', inRef)
+
+    def AllRecords(self, inClass):
+        return self.Call(inClass, 'get_all_records')
+
+    def Where(self, inClass, inExpression):
+        return self.Call(inClass, 'get_all_records_where', inExpression)
+
+    def RecordsWhere(self, inClass, inField, inValues):
+        # Returns a dictionary of OpaqueRef : record for objects whose field inField matches
+        # any of inValues, using one query per REFS_PER_QUERY values
+        if not isinstance(inValues, (list, tuple)):
+            inValues = [ inValues ]
+        values = sorted(set(value for value in inValues if value != self.NULL_REF))
+        retVal = {}
+        for i in range(0, len(values), self.REFS_PER_QUERY):
+            expression = ' or '.join([ 'field "%s" = "%s"' % (inField, value) for value in values[i:i+self.REFS_PER_QUERY] ])
+            retVal.update(self.Where(inClass, expression))
+        return retVal
+
+    def RecordsFor(self, inClass, inRefs):
+        # Returns a dictionary of OpaqueRef : record for the given references.  A single
+        # get_all_records is cheaper than a get_record for each unless there are very few
+        refs = set(ref for ref in inRefs if ref != self.NULL_REF)
+        if len(refs) == 0:
+            retVal = {}
+        elif len(refs) == 1:
+            ref = refs.pop()
+            try:
+                retVal = { ref : self.Record(inClass, ref) }
+            except XenAPI.Failure:
+                retVal = {} # Dangling reference
+        else:
+            retVal = dict((ref, record) for ref, record in self.AllRecords(inClass).items() if ref in refs)
+        return retVal
+
+    def NumCalls(self):
+        return sum(self.callCounts.values())
+
+    def CallReport(self):
+        return ', '.join([ '%s x%d' % (name, count) for name, count in sorted(self.callCounts.items()) ])
+
 class Data:
     DISK_TIMEOUT_SECONDS = 60
     instance = None
+    instCalls = 0 # Lets the plugin importer tell whether a plugin reads host data when registering
+    PROBE_TIMEOUT_SECONDS = 10
+    HARDWARE_CACHE_VERSION = 1
+    HARDWARE_KEYS = ['dmi', 'lspci', 'bmc', 'inventory', 'sslfingerprint', 'sshfingerprint', 'state_on_usb_media']
+    SSH_KEY_TYPES = ['rsa', 'ed25519', 'ecdsa']
+    hardwareCachePath = '/var/cache/xsconsole/hardware-cache.json'
 
     def __init__(self):
         self.data = {}
         self.session = None
+        self.lastCallReport = ''
+        self.updateGeneration = 0 # Incremented whenever self.data is updated or replaced
+        self.updateLock = threading.RLock() # Held by Update, and while a background snapshot is swapped in
 
     @classmethod
     def Inst(cls):
+        cls.instCalls += 1
         if cls.instance is None:
             cls.instance = Data()
             cls.instance.Create()
@@ -106,7 +159,7 @@ class Data:
 
     def RequireSession(self):
         if self.session is None:
-            self.session = Auth.Inst().OpenSession()
+            self.session = Auth.Inst().AcquireSession()
         return self.session
 
     def Create(self):
@@ -116,31 +169,117 @@ class Data:
         self.ReadTimezones()
         self.ReadKeymaps()
 
-        (status, output) = getstatusoutput("dmidecode")
-        if status != 0:
-            # Use test dmidecode file if there's no real output
-            (status, output) = getstatusoutput("/bin/cat ./dmidecode.txt")
+        hardwareKey = self.HardwareCacheKey()
+        hardware = self.ReadHardwareCache(hardwareKey)
+        if hardware is not None:
+            self.data.update(hardware)
+        elif self.ProbeHardware() and hardwareKey is not None:
+            # Cache only complete results, so that a probe that timed out is tried again next time
+            self.WriteHardwareCache(hardwareKey)
+
+        self.Update()
+
+    def HardwareFiles(self):
+        # Files whose contents or presence change what ProbeHardware finds
+        return ['/etc/xensource-inventory', './dmidecode.txt', '/usr/bin/ipmitool',
+            '/opt/xensource/libexec/oem-functions', Config.Inst().XCPConfigDir()+'/xapi-ssl.pem'] + [
+            '/etc/ssh/ssh_host_%s_key.pub' % keyType for keyType in self.SSH_KEY_TYPES ]
+
+    def HardwareCacheKey(self):
+        # The hardware data is static until the next boot, unless one of the files changes.  Returns
+        # None if the boot can't be identified
+        try:
+            bootFile = open('/proc/sys/kernel/random/boot_id')
+            try:
+                retVal = [ self.HARDWARE_CACHE_VERSION, bootFile.read().strip() ]
+            finally:
+                bootFile.close()
+        except Exception:
+            return None
+        for filename in self.HardwareFiles():
+            try:
+                fileStat = os.stat(filename)
+                retVal.append([filename, fileStat.st_mtime, fileStat.st_size])
+            except OSError:
+                retVal.append([filename, None, None])
+        return retVal
 
+    def ReadHardwareCache(self, inKey):
+        retVal = None
+        try:
+            if inKey is not None and os.path.isfile(self.hardwareCachePath):
+                cacheFile = open(self.hardwareCachePath)
+                try:
+                    cache = json.load(cacheFile)
+                finally:
+                    cacheFile.close()
+                if cache.get('key', None) == inKey:
+                    retVal = self.DecodeCached(cache.get('data', {}))
+        except Exception as e:
+            XSLogError('Hardware cache could not be read: ', e)
+        return retVal
+
+    def DecodeCached(self, inValue):
+        if isinstance(inValue, list):
+            return [ self.DecodeCached(value) for value in inValue ]
+        if isinstance(inValue, dict):
+            return dict((str(key), self.DecodeCached(value)) for key, value in inValue.items())
+        if sys.version_info < (3, 0) and isinstance(inValue, unicode):
+            return inValue.encode('utf-8') # json returns unicode strings in Python2
+        return inValue
+
+    def WriteHardwareCache(self, inKey):
+        try:
+            cacheDir = os.path.dirname(self.hardwareCachePath)
+            if not os.path.isdir(cacheDir):
+                os.makedirs(cacheDir, 0o755)
+            tempPath = self.hardwareCachePath+'.tmp'
+            cacheFile = open(tempPath, 'w')
+            try:
+                data = dict((key, self.data[key]) for key in self.HARDWARE_KEYS if key in self.data)
+                json.dump({ 'key' : inKey, 'data' : data }, cacheFile)
+            finally:
+                cacheFile.close()
+            os.rename(tempPath, self.hardwareCachePath)
+        except Exception as e:
+            XSLogError('Hardware cache could not be written: ', e)
+
+    def ProbeHardware(self):
+        # Runs the hardware probes concurrently.  Returns False if any probe timed out
+        probes = ShellProbes()
+        probes.Add('dmidecode', 'dmidecode', self.PROBE_TIMEOUT_SECONDS)
+        probes.Add('dmidecode_file', '/bin/cat ./dmidecode.txt', self.PROBE_TIMEOUT_SECONDS) # Test file used if there's no real output
+        probes.Add('lspci', '/sbin/lspci -m', self.PROBE_TIMEOUT_SECONDS)
+        probes.Add('lspci_usr', '/usr/bin/lspci -m', self.PROBE_TIMEOUT_SECONDS)
+        if os.path.isfile("/usr/bin/ipmitool"):
+            probes.Add('ipmitool', '/usr/bin/ipmitool mc info', self.PROBE_TIMEOUT_SECONDS)
+        probes.Add('openssl', "/usr/bin/openssl x509 -in %s/xapi-ssl.pem -fingerprint -noout" % (Config.Inst().XCPConfigDir()), self.PROBE_TIMEOUT_SECONDS)
+        for keyType in self.SSH_KEY_TYPES:
+            probes.Add('ssh_'+keyType, '/usr/bin/ssh-keygen -lf /etc/ssh/ssh_host_%s_key.pub' % keyType, self.PROBE_TIMEOUT_SECONDS)
+        probes.Add('usb_media', "/bin/bash -c 'source /opt/xensource/libexec/oem-functions; if state_on_usb_media; then exit 1; else exit 0; fi'", self.PROBE_TIMEOUT_SECONDS)
+        results = probes.Run()
+
+        (status, output) = results['dmidecode']
+        if status != 0:
+            (status, output) = results['dmidecode_file']
         if status == 0:
             self.ScanDmiDecode(output.split("\n"))
 
-        (status, output) = getstatusoutput("/sbin/lspci -m")
+        (status, output) = results['lspci']
         if status != 0:
-            (status, output) = getstatusoutput("/usr/bin/lspci -m")
-
+            (status, output) = results['lspci_usr']
         if status == 0:
             self.ScanLspci(output.split("\n"))
 
-        if os.path.isfile("/usr/bin/ipmitool"):
-            (status, output) = getstatusoutput("/usr/bin/ipmitool mc info")
-            if status == 0:
-                self.ScanIpmiMcInfo(output.split("\n"))
-
-        (status, output) = getstatusoutput("/bin/cat /etc/xensource-inventory")
+        (status, output) = results.get('ipmitool', (None, ''))
         if status == 0:
-            self.ScanInventory(output.split("\n"))
+            self.ScanIpmiMcInfo(output.split("\n"))
+
+        (statKey, lines) = ConfigFileReader.Inst().Read('/etc/xensource-inventory')
+        if lines is not None:
+            self.ScanInventory(lines)
 
-        (status, output) = getstatusoutput("/usr/bin/openssl x509 -in %s/xapi-ssl.pem -fingerprint -noout" % (Config.Inst().XCPConfigDir()))
+        (status, output) = results['openssl']
         if status == 0:
             fp = output.split("=")
             if len(fp) >= 2:
@@ -148,31 +287,25 @@ class Data:
             else:
                 self.data['sslfingerprint'] = "<Unknown>"
 
-        def get_ssh_key(filename):
-            fingerprints = ShellPipe('/usr/bin/ssh-keygen', '-lf', filename).AllOutput()[0].split(' ')
-            return fingerprints[1] + ' ' + fingerprints[-1]
-
-        keytypes = ['rsa', 'ed25519', 'ecdsa']
         fingerprints = []
-        for keytype in keytypes:
-            try:
-                fingerprints.append(get_ssh_key('/etc/ssh/ssh_host_%s_key.pub' % keytype))
-            except:
-                pass
+        for keyType in self.SSH_KEY_TYPES:
+            (status, output) = results['ssh_'+keyType]
+            if status == 0:
+                try:
+                    words = output.split("\n")[0].split(' ')
+                    fingerprints.append(words[1] + ' ' + words[-1])
+                except IndexError:
+                    pass
 
         if not fingerprints:
             self.data['sshfingerprint'] = [Lang('<Unknown>')]
         else:
             self.data['sshfingerprint'] = fingerprints
 
-        try:
-            self.data['state_on_usb_media'] = ( ShellPipe('/bin/bash', '-c', 'source /opt/xensource/libexec/oem-functions; if state_on_usb_media; then exit 1; else exit 0; fi').CallRC() != 0 )
-        except:
-            self.data['state_on_usb_media'] = True
-
-
+        # Assume state is on USB media if the probe fails
+        self.data['state_on_usb_media'] = (results['usb_media'][0] != 0)
 
-        self.Update()
+        return None not in [ status for status, output in results.values() ]
 
     def FakeMetrics(self, inPIF):
         retVal = {
@@ -183,14 +316,61 @@ class Data:
         return retVal
 
     def CloseSession(self):
+        # Used when xapi restarts or the network changes, so pooled sessions are discarded too
         if self.session is not None:
             self.session = Auth.Inst().CloseSession(self.session)
+        Auth.Inst().DiscardIdleSessions()
+
+    def RequestUpdate(self, inOnComplete = None):
+        # Update in the background.  Readers see the previous data until the new snapshot is swapped
+        # in, and inOnComplete is then called on the main thread.  Call from the main thread, which is
+        # the only one that modifies self.data, so that the copy can't see it change.  Copy two levels,
+        # as Update replaces some sections and modifies others in place
+        generation = self.updateGeneration
+        snapshot = dict((name, copy.copy(value)) for name, value in self.data.items())
+        RefreshWorker.Inst().Request('data', lambda: self.UpdateSnapshot(snapshot, generation), inOnComplete)
+
+    def Version(self):
+        # Changes whenever the data is updated
+        return self.updateGeneration
+
+    def IsRefreshing(self):
+        return RefreshWorker.Inst().IsPending('data')
+
+    def UpdateSnapshot(self, inSnapshot, inGeneration):
+        # Runs on the refresh worker thread.  Builds the new data from inSnapshot in a separate Data object,
+        # using its own session, then swaps it in with a single assignment
+        builder = Data()
+        builder.data = inSnapshot
+        try:
+            builder.Update()
+        finally:
+            builder.session = Auth.Inst().ReleaseSession(builder.session)
+        self.updateLock.acquire()
+        try:
+            if inGeneration == self.updateGeneration:
+                # Not overtaken by a synchronous Update since the snapshot was taken
+                self.data = builder.data
+                self.lastCallReport = builder.lastCallReport
+                self.updateGeneration += 1
+        finally:
+            self.updateLock.release()
 
     def Update(self):
+        self.updateLock.acquire()
+        try:
+            self.UpdateLocked()
+        finally:
+            self.updateLock.release()
+
+    def UpdateLocked(self):
+        self.updateGeneration += 1
         self.data['host'] = {}
 
         self.RequireSession()
         if self.session is not None:
+            fetcher = None
+            srMap = None
             try:
                 try:
                     thisHost = self.session.xenapi.session.get_this_host(self.session._session)
@@ -202,43 +382,48 @@ class Data:
                         raise Exception('Could not connect to local xapi')
                     thisHost = self.session.xenapi.session.get_this_host(self.session._session)
 
-                hostRecord = self.session.xenapi.host.get_record(thisHost)
+                fetcher = BulkFetcher(self.session)
+
+                hostRecord = fetcher.Record('host', thisHost)
                 self.data['host'] = hostRecord
                 self.data['host']['opaqueref'] = thisHost
 
                 # Expand the items we need in the host record
-                self.data['host']['metrics'] = self.session.xenapi.host_metrics.get_record(self.data['host']['metrics'])
+                self.data['host']['metrics'] = fetcher.Record('host_metrics', self.data['host']['metrics'])
 
-                try:
-                    self.data['host']['suspend_image_sr'] = self.session.xenapi.SR.get_record(self.data['host']['suspend_image_sr'])
-                except:
-                    # NULL or dangling reference
-                    self.data['host']['suspend_image_sr'] = None
+                # One fetch of all SRs serves the host, PBD and pool references below
+                srMap = fetcher.AllRecords('SR')
 
-                try:
-                    self.data['host']['crash_dump_sr'] = self.session.xenapi.SR.get_record(self.data['host']['crash_dump_sr'])
-                except:
-                    # NULL or dangling reference
-                    self.data['host']['crash_dump_sr'] = None
+                def lookupSR(inSRRef):
+                    sr = srMap.get(inSRRef, None)
+                    if sr is not None:
+                        sr = sr.copy()
+                        sr['opaqueref'] = inSRRef
+                    return sr # None for NULL or dangling references
+
+                self.data['host']['suspend_image_sr'] = lookupSR(self.data['host']['suspend_image_sr'])
+                self.data['host']['crash_dump_sr'] = lookupSR(self.data['host']['crash_dump_sr'])
+
+                self.UpdateHostCPUs(fetcher)
 
-                self.UpdateHostCPUs()
+                pifMap = fetcher.RecordsWhere('PIF', 'host', thisHost)
+                pifMetricsMap = fetcher.RecordsFor('PIF_metrics', [ pif['metrics'] for pif in pifMap.values() ])
+                networkMap = fetcher.RecordsFor('network', [ pif['network'] for pif in pifMap.values() ])
 
                 def convertPIF(inPIF):
-                    retVal = self.session.xenapi.PIF.get_record(inPIF)
-                    try:
-                        retVal['metrics'] = self.session.xenapi.PIF_metrics.get_record(retVal['metrics'])
-                    except XenAPI.Failure:
-                        retVal['metrics' ] = self.FakeMetrics(inPIF)
+                    retVal = pifMap[inPIF]
+                    retVal['metrics'] = pifMetricsMap.get(retVal['metrics'], None) or self.FakeMetrics(inPIF)
 
-                    try:
-                        retVal['network'] = self.session.xenapi.network.get_record(retVal['network'])
-                    except XenAPI.Failure as e:
-                        XSLogError('Missing network record: ', e)
+                    network = networkMap.get(retVal['network'], None)
+                    if network is None:
+                        XSLogError('Missing network record: ', retVal['network'])
+                    else:
+                        retVal['network'] = network
 
                     retVal['opaqueref'] = inPIF
                     return retVal
 
-                self.data['host']['PIFs'] = list(map(convertPIF, self.data['host']['PIFs']))
+                self.data['host']['PIFs'] = [ convertPIF(pif) for pif in self.data['host']['PIFs'] if pif in pifMap ]
 
                 # Create missing PIF names
                 for pif in self.data['host']['PIFs']:
@@ -252,76 +437,76 @@ class Data:
                 # Sort PIFs by device name for consistent order
                 self.data['host']['PIFs'].sort(key=lambda pif: pif['device'])
 
+                pbdMap = fetcher.RecordsWhere('PBD', 'host', thisHost)
+
+                # Get VDIs for udev SRs only - a pool may have thousands of non-udev VDIs
+                udevSRRefs = [ pbd['SR'] for pbd in pbdMap.values() if srMap.get(pbd['SR'], {}).get('type', '') == 'udev' ]
+                vdiMap = fetcher.RecordsWhere('VDI', 'SR', udevSRRefs)
+                vbdMap = fetcher.RecordsWhere('VBD', 'VDI', list(vdiMap.keys()))
+
                 def convertVBD(inVBD):
-                    retVBD = self.session.xenapi.VBD.get_record(inVBD)
+                    retVBD = vbdMap[inVBD]
                     retVBD['opaqueref'] = inVBD
                     return retVBD
 
                 def convertVDI(inVDI):
-                    retVDI = self.session.xenapi.VDI.get_record(inVDI)
-                    retVDI['VBDs'] = list(map(convertVBD, retVDI['VBDs']))
+                    retVDI = vdiMap[inVDI]
+                    retVDI['VBDs'] = [ convertVBD(vbd) for vbd in retVDI['VBDs'] if vbd in vbdMap ]
                     retVDI['opaqueref'] = inVDI
                     return retVDI
 
                 def convertPBD(inPBD):
-                    retPBD = self.session.xenapi.PBD.get_record(inPBD)
-                    srRef = retPBD['SR']
-                    try:
-                        retPBD['SR'] = self.session.xenapi.SR.get_record(retPBD['SR'])
-                    except:
-                        retPBD['SR'] = None # retPBD['SR'] is OpaqueRef:NULL
-
-                    # Get VDIs for udev SRs only - a pool may have thousands of non-udev VDIs
-                    if retPBD['SR'] is not None:
-                        retPBD['SR']['opaqueref'] = srRef
-                        if retPBD['SR'].get('type', '') == 'udev':
-                            retPBD['SR']['VDIs'] = list(map(convertVDI, retPBD['SR']['VDIs']))
-                            for vdi in retPBD['SR']['VDIs']:
-                                vdi['SR'] = retPBD['SR']
+                    retPBD = pbdMap[inPBD]
+                    retPBD['SR'] = lookupSR(retPBD['SR'])
+
+                    if retPBD['SR'] is not None and retPBD['SR'].get('type', '') == 'udev':
+                        retPBD['SR']['VDIs'] = [ convertVDI(vdi) for vdi in retPBD['SR']['VDIs'] if vdi in vdiMap ]
+                        for vdi in retPBD['SR']['VDIs']:
+                            vdi['SR'] = retPBD['SR']
 
                     retPBD['opaqueref'] = inPBD
                     return retPBD
 
-                self.data['host']['PBDs'] = list(map(convertPBD, self.data['host']['PBDs']))
+                self.data['host']['PBDs'] = [ convertPBD(pbd) for pbd in self.data['host']['PBDs'] if pbd in pbdMap ]
 
-                # Only load the to DOM-0 VM to save time
+                # Only load the DOM-0 VM, found with a single query rather than a get_domid call per resident VM
+                dom0Map = fetcher.Where('VM', 'field "is_control_domain" = "true" and field "resident_on" = "%s"' % thisHost)
                 vmList = self.data['host']['resident_VMs']
                 for i in range(len(vmList)):
                     vm = vmList[i]
-                    domID = self.session.xenapi.VM.get_domid(vm)
-                    if domID == '0':
-                        vmList[i] = self.session.xenapi.VM.get_record(vm)
-                        vmList[i]['allowed_VBD_devices'] = self.session.xenapi.VM.get_allowed_VBD_devices(vm)
+                    if dom0Map.get(vm, {}).get('domid', None) == '0':
+                        vmList[i] = dom0Map[vm]
+                        vmList[i]['allowed_VBD_devices'] = fetcher.Call('VM', 'get_allowed_VBD_devices', vm)
                         vmList[i]['opaqueref'] = vm
 
-                pools = self.session.xenapi.pool.get_all_records()
+                pools = fetcher.AllRecords('pool')
 
                 def convertPool(inID, inPool):
                     retPool = inPool
                     retPool['opaqueref'] = inID
-                    try:
-                        retPool['master_uuid'] = self.session.xenapi.host.get_uuid(inPool['master'])
-                    except:
-                        retPool['master_uuid'] = None
+                    if inPool['master'] == thisHost:
+                        retPool['master_uuid'] = hostRecord['uuid']
+                    else:
+                        try:
+                            retPool['master_uuid'] = fetcher.Call('host', 'get_uuid', inPool['master'])
+                        except:
+                            retPool['master_uuid'] = None
 
                     # SRs in the pool record are often apparently valid but dangling references.
-                    # We fetch the uuid to determine whether the SRs are real.
+                    # We look up the uuid in the SR records to determine whether the SRs are real.
 
                     # [CP-18907] The checks for NULL references avoid the appearence of spurious
                     #            backtraces in xensource.log
 
                     def update_SR_reference(inPool, retPool, key):
-                        NULL_REF = "OpaqueRef:NULL"
                         key_uuid = "%s_uuid" % key
-                        try:
-                            sr_ref = inPool[key]
-                            if sr_ref == NULL_REF:
-                                retPool[key_uuid] = None
-                            else:
-                                retPool[key_uuid] = self.session.xenapi.SR.get_uuid(sr_ref)
-                        except:
-                            XSLog("Cleared dangling reference for %s" % key)
+                        sr = srMap.get(inPool.get(key, None), None)
+                        if sr is None:
+                            if inPool.get(key, None) != "OpaqueRef:NULL":
+                                XSLog("Cleared dangling reference for %s" % key)
                             retPool[key_uuid] = None
+                        else:
+                            retPool[key_uuid] = sr['uuid']
 
                     update_SR_reference(inPool, retPool, 'default_SR')
                     update_SR_reference(inPool, retPool, 'suspend_image_SR')
@@ -345,7 +530,9 @@ class Data:
                 for pbd in self.data['host'].get('PBDs', []):
                     pbdRefs.append(pbd['opaqueref'])
 
-                srMap= self.session.xenapi.SR.get_all_records()
+                if srMap is None:
+                    fetcher = BulkFetcher(self.session)
+                    srMap = fetcher.AllRecords('SR')
                 for opaqueRef, values in srMap.items():
                     values['opaqueref'] = opaqueRef
                     values['islocal'] = False
@@ -358,6 +545,10 @@ class Data:
             except Exception as e:
                 XSLogError('SR data update failed: ', e)
 
+            if fetcher is not None:
+                self.lastCallReport = fetcher.CallReport()
+                XSLog('Data update made %d xapi calls (%s)' % (fetcher.NumCalls(), self.lastCallReport))
+
         self.UpdateFromResolveConf()
         self.UpdateFromSysconfig()
         self.UpdateFromHostname()
@@ -372,16 +563,20 @@ class Data:
 
         self.DeriveData()
 
-    def UpdateHostCPUs(self):
-        convertCPU = lambda cpu: self.session.xenapi.host_cpu.get_record(cpu)
-        hostCPUs = list(map(convertCPU, self.data['host']['host_CPUs']))
+    def UpdateHostCPUs(self, inFetcher):
+        cpuMap = inFetcher.RecordsWhere('host_cpu', 'host', self.data['host']['opaqueref'])
+        cpuRefs = self.data['host']['host_CPUs']
 
         self.data['host']['host_CPUs'] = []
-        for cpu in hostCPUs:
-            if 'HANDLE_INVALID' in cpu:
-                XSLogError('xenapi host_cpu: ' + ', '.join(cpu))
+        for cpu in cpuRefs:
+            if cpu in cpuMap:
+                self.data['host']['host_CPUs'].append(cpuMap[cpu])
             else:
-                self.data['host']['host_CPUs'].append(cpu)
+                XSLogError('xenapi host_cpu: missing record for ' + str(cpu))
+
+    def LastCallReport(self):
+        # Summary of the xapi calls made by the most recent Update, for diagnostics
+        return self.lastCallReport
 
     def DeriveData(self):
         self.data.update({
@@ -462,6 +657,7 @@ class Data:
 
     def Dump(self):
         pprint(self.data)
+        print("\nxapi calls made by the last update: "+self.lastCallReport)
 
     def HostnameSet(self, inHostname):
         Auth.Inst().AssertAuthenticated()
@@ -481,6 +677,8 @@ class Data:
 
     def NameserversSet(self, inServers):
         self.data['dns']['nameservers'] = inServers
+        # Scan /etc/resolv.conf again on the next update, even if this change isn't saved to it
+        self.data.get('config_files', {}).pop('/etc/resolv.conf', None)
 
     def NTPServersSet(self, inServers):
         self.data['ntp']['servers'] = inServers
@@ -494,20 +692,29 @@ class Data:
         self.session.xenapi.host.add_to_logging(self.host.opaqueref(), 'syslog_destination', inDestination)
         self.session.xenapi.host.syslog_reconfigure(self.host.opaqueref())
 
+    def ScanConfigFile(self, inPath, inScanner):
+        # Passes the lines of inPath to inScanner, unless the file is unchanged since this data last
+        # scanned it.  Returns True if the file was scanned
+        (statKey, lines) = ConfigFileReader.Inst().Read(inPath)
+        if statKey is None:
+            return False
+        scanned = self.data.setdefault('config_files', {})
+        if scanned.get(inPath, None) == statKey:
+            return False
+        inScanner(lines)
+        scanned[inPath] = statKey
+        return True
+
     def UpdateFromResolveConf(self):
-        (status, output) = getstatusoutput("/usr/bin/grep -v \"^;\" /etc/resolv.conf")
-        if status == 0:
-            self.ScanResolvConf(output.split("\n"))
+        self.ScanConfigFile('/etc/resolv.conf', lambda inLines: self.ScanResolvConf([ line for line in inLines if not line.startswith(';') ]))
 
     def UpdateFromSysconfig(self):
-        (status, output) = getstatusoutput("/bin/cat /etc/sysconfig/network")
-        if status == 0:
-            self.ScanSysconfigNetwork(output.split("\n"))
+        if self.ScanConfigFile('/etc/sysconfig/network', self.ScanSysconfigNetwork):
+            # The hostname is stored in the section just replaced, so must be scanned again
+            self.data['config_files'].pop('/etc/hostname', None)
 
     def UpdateFromHostname(self):
-        (status, output) = getstatusoutput("/bin/cat /etc/hostname")
-        if status == 0:
-            self.ScanHostname(output.split("\n"))
+        self.ScanConfigFile('/etc/hostname', self.ScanHostname)
 
     def UpdateFromNTPConf(self):
         if not 'ntp' in self.data:
@@ -574,7 +781,10 @@ class Data:
     def SetNTPMode(self, inMode):
         Auth.Inst().AssertAuthenticated()
         self.RequireSession()
-        self.session.xenapi.host.set_ntp_mode(self.host.opaqueref(), inMode)
+        try:
+            self.session.xenapi.host.set_ntp_mode(self.host.opaqueref(), inMode)
+        finally:
+            ServiceStates.Inst().Invalidate() # xapi reconfigures chronyd
 
     def SetNTPManualServers(self, inServers):
         Auth.Inst().AssertAuthenticated()
@@ -766,11 +976,9 @@ class Data:
                 self.data['bmc']['version'] = match.group(1)
 
     def ScanService(self, service):
-        (status, output) = getstatusoutput("systemctl is-enabled %s" % (service,))
-        self.data['chkconfig'][service] = status == 0
-
-        (status, output) = getstatusoutput("systemctl is-active %s" % (service,))
-        self.data['service_active'][service] = status == 0
+        state = ServiceStates.Inst().State(service)
+        self.data['chkconfig'][service] = state.enabled
+        self.data['service_active'][service] = state.active
 
     def ScanResolvConf(self, inLines):
         self.data['dns'] = {
@@ -1004,7 +1212,7 @@ class Data:
                 raise Exception(output)
         finally:
             # Network reconfigured so this link is potentially no longer valid
-            self.session = Auth.Inst().CloseSession(self.session)
+            self.CloseSession()
 
 
     def DisableManagement(self):
@@ -1019,7 +1227,7 @@ class Data:
                 self.session.xenapi.PIF.reconfigure_ip(pif['opaqueref'], 'None','' ,'' ,'' ,'')
         finally:
             # Network reconfigured so this link is potentially no longer valid
-            self.session = Auth.Inst().CloseSession(self.session)
+            self.CloseSession()
 
     def AdjustNTPForStaticNetwork(self):
         if not self.data['ntp']['servers']: # No NTP servers after removing DHCP
@@ -1042,17 +1250,26 @@ class Data:
     def EnableSSH(self):
         Auth.Inst().AssertAuthenticatedOrPasswordUnset()
         self.RequireSession()
-        self.session.xenapi.host.enable_ssh(self.host.opaqueref())
+        try:
+            self.session.xenapi.host.enable_ssh(self.host.opaqueref())
+        finally:
+            ServiceStates.Inst().Invalidate() # xapi starts or stops sshd
 
     def DisableSSH(self):
         Auth.Inst().AssertAuthenticatedOrPasswordUnset()
         self.RequireSession()
-        self.session.xenapi.host.disable_ssh(self.host.opaqueref())
+        try:
+            self.session.xenapi.host.disable_ssh(self.host.opaqueref())
+        finally:
+            ServiceStates.Inst().Invalidate()
 
     def SetSSHAutoMode(self, inMode):
         Auth.Inst().AssertAuthenticatedOrPasswordUnset()
         self.RequireSession()
-        self.session.xenapi.host.set_ssh_auto_mode(self.host.opaqueref(), inMode)
+        try:
+            self.session.xenapi.host.set_ssh_auto_mode(self.host.opaqueref(), inMode)
+        finally:
+            ServiceStates.Inst().Invalidate()
 
     def Ping(self,  inDest):
         # Must be careful that no unsanitised data is passed to the command
@@ -1121,7 +1338,16 @@ class Data:
 
     def PlugVBD(self, inVBD):
         def TimedOp():
-            self.session.xenapi.VBD.plug(inVBD['opaqueref'])
+            # Uses a session of its own, as the call carries on in the background if it times out
+            session = Auth.Inst().AcquireSession()
+            if session is None:
+                raise Exception('Could not connect to local xapi')
+            try:
+                session.xenapi.VBD.plug(inVBD['opaqueref'])
+            except:
+                Auth.Inst().ReleaseSession(session, sys.exc_info()[1])
+                raise
+            Auth.Inst().ReleaseSession(session)
 
         TimeUtils.TimeoutWrapper(TimedOp, self.DISK_TIMEOUT_SECONDS)
 
@@ -1198,29 +1424,19 @@ class Data:
             State.Inst().SaveIfRequired()
 
     def EnableService(self, service):
-        status, output = getstatusoutput("systemctl enable %s" % (service,))
-        if status != 0:
-            raise Exception(output)
+        ServiceStates.Inst().Control('enable', service)
 
     def DisableService(self, service):
-        status, output = getstatusoutput("systemctl disable %s" % (service,))
-        if status != 0:
-            raise Exception(output)
+        ServiceStates.Inst().Control('disable', service)
 
     def RestartService(self, service):
-        status, output = getstatusoutput("systemctl restart %s" % (service,))
-        if status != 0:
-            raise Exception(output)
+        ServiceStates.Inst().Control('restart', service)
 
     def StartService(self, service):
-        status, output = getstatusoutput("systemctl start %s" % (service,))
-        if status != 0:
-            raise Exception(output)
+        ServiceStates.Inst().Control('start', service)
 
     def StopService(self, service):
-        status, output = getstatusoutput("systemctl stop %s" % (service,))
-        if status != 0:
-            raise Exception(output)
+        ServiceStates.Inst().Control('stop', service)
 
     def SetVerboseBoot(self, inVerbose):
         if inVerbose:
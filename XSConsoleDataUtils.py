@@ -13,7 +13,7 @@
 # with this program; if not, write to the Free Software Foundation, Inc.,
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
-import os, subprocess, re, tempfile, errno
+import os, subprocess, re, tempfile, errno, socket, sys, threading
 
 from XSConsoleBases import *
 from XSConsoleData import *
@@ -33,45 +33,41 @@ class USBNotMountable(Exception):
     pass
 
 class FileUtils:
+    LIST_DISKS_TIMEOUT_SECONDS = 120
+    DEVICE_TIMEOUT_SECONDS = 30 # For device nodes to appear once a disk is plugged or partitioned
+
     @classmethod
     def DeviceList(cls, inWritableOnly):
         retVal = []
 
-        # Device lists can change as, e.g. USB keys are plugged.  Out-of-date device lists are
-        # problematic so always update here
-        Data.Inst().Update()
+        # Device lists can change as, e.g. USB keys are plugged.  DeviceInventory keeps the list
+        # current from udev events, and rereads it here if it isn't receiving them
+        for vdi in DeviceInventory.Inst().VDIs():
+            nameLabel = vdi.get('name_label', Lang('Unknown'))
+            readOnly = vdi.get('read_only', False)
+            if inWritableOnly and readOnly:
+                pass # Skip this VDI because we can't write to it (but need to)
+            else:
+                match = True
+                while match:
+                    match = re.match(r'(.*):0$', nameLabel)
+                    if match:
+                        # Remove multiple trailing :0
+                        nameLabel = match.group(1)
+                nameDesc = vdi.get('name_description', Lang('Unknown device'))
+                match = re.match(r'(.*)\srev\b', nameDesc)
+                if match:
+                    # Remove revision information
+                    nameDesc = match.group(1)
 
-        for pbd in Data.Inst().host.PBDs([]):
-            sr = pbd.get('SR', {})
-            contentType = sr.get('content_type', '')
-            if sr.get('type', '') == 'udev' and contentType in [ 'disk', 'iso' ]:
-                # Scan only SRs with type 'udev' and content type 'disk' or 'iso'
-                for vdi in sr.get('VDIs', []):
-                    nameLabel = vdi.get('name_label', Lang('Unknown'))
-                    readOnly = vdi.get('read_only', False)
-                    if inWritableOnly and readOnly:
-                        pass # Skip this VDI because we can't write to it (but need to)
-                    else:
-                        match = True
-                        while match:
-                            match = re.match(r'(.*):0$', nameLabel)
-                            if match:
-                                # Remove multiple trailing :0
-                                nameLabel = match.group(1)
-                        nameDesc = vdi.get('name_description', Lang('Unknown device'))
-                        match = re.match(r'(.*)\srev\b', nameDesc)
-                        if match:
-                            # Remove revision information
-                            nameDesc = match.group(1)
-
-                        deviceSize = int(vdi.get('physical_utilisation', 0))
-                        if deviceSize < 0:
-                            deviceSize = int(vdi.get('virtual_size', 0))
-
-                        nameSize = cls.SizeString(deviceSize)
-
-                        name =  "%-50s%10.10s%10.10s" % (nameDesc[:50], nameLabel[:10], nameSize[:10])
-                        retVal.append(Struct(name = name, vdi = vdi))
+                deviceSize = int(vdi.get('physical_utilisation', 0))
+                if deviceSize < 0:
+                    deviceSize = int(vdi.get('virtual_size', 0))
+
+                nameSize = cls.SizeString(deviceSize)
+
+                name =  "%-50s%10.10s%10.10s" % (nameDesc[:50], nameLabel[:10], nameSize[:10])
+                retVal.append(Struct(name = name, vdi = vdi))
 
         retVal.sort(key=lambda data: data.vdi['name_label'])
 
@@ -80,7 +76,7 @@ class FileUtils:
     @classmethod
     def SRDeviceList(self):
         retVal= []
-        status, output = getstatusoutput("/opt/xensource/libexec/list_local_disks")
+        status, output = getstatusoutput("/opt/xensource/libexec/list_local_disks", self.LIST_DISKS_TIMEOUT_SECONDS)
         if status == 0:
             regExp = re.compile(r"\s*\(\s*'([^']*)'\s*,\s*'([^']*)'\s*,\s*'([^']*)'\s*,\s*'([^']*)'\s*,\s*'([^']*)'\s*\)")
             for line in output.split("\n"):
@@ -173,6 +169,8 @@ class FileUtils:
         if status != 0:
             raise Exception(output)
 
+        Uevents.WaitForDevice(partitionName, self.DEVICE_TIMEOUT_SECONDS)
+
         # Format the new partition with VFAT
         status, output = getstatusoutput("/sbin/mkfs.vfat -n 'XenServer Backup' -F 32 '" +partitionName + "' 2>&1")
 
@@ -189,6 +187,121 @@ class FileUtils:
     def BugReportFilename(cls):
         return Data.Inst().host.hostname('bugreport')+'-'+time.strftime("%Y%m%d%H%M%S", time.gmtime())+'Z.bugrpt'
 
+class DeviceInventory:
+    # Keeps the list of VDIs in this host's removable device (udev) SRs current.  A thread listens
+    # for removable media uevents on a netlink socket, and each burst of events rescans the udev SRs
+    # and rereads their VDIs on the refresh worker, so the device list is ready when a dialogue
+    # asks for it.  Without netlink, VDIs rereads the list on every call
+    SETTLE_SECS = 0.5 # Events arriving within this time are handled by one refresh
+    CONTENT_TYPES = ['disk', 'iso']
+    __instance = None
+
+    @classmethod
+    def Inst(cls):
+        if cls.__instance is None:
+            cls.__instance = DeviceInventory()
+        return cls.__instance
+
+    def __init__(self):
+        self.vdis = None # None until first read
+        self.generation = 0 # Incremented for each new list
+        self.thread = None
+        self.sock = None
+
+    def Start(self):
+        if self.thread is not None:
+            return
+        try:
+            self.sock = Uevents.Open()
+        except Exception as e:
+            XSLogError('Device events unavailable - device lists will be reread when needed: ', e)
+            return
+        self.thread = threading.Thread(target = self.ListenLoop, name = 'DeviceInventory')
+        self.thread.daemon = True
+        self.thread.start()
+        self.RequestRefresh(False)
+
+    def IsListening(self):
+        return self.thread is not None
+
+    def ListenLoop(self):
+        while True:
+            try:
+                self.sock.settimeout(None)
+                if not Uevents.IsRemovableMediaEvent(Uevents.Parse(self.sock.recv(65536))):
+                    continue
+                # Collect the rest of the burst, e.g. events for the partitions of a new disk, until a fixed
+                # deadline so that unrelated events on a busy host can't put the refresh off indefinitely
+                deadline = time.time() + self.SETTLE_SECS
+                try:
+                    while True:
+                        remainingSecs = deadline - time.time()
+                        if remainingSecs <= 0:
+                            break
+                        self.sock.settimeout(remainingSecs)
+                        self.sock.recv(65536)
+                except socket.timeout:
+                    pass
+                self.RequestRefresh(True)
+            except Exception as e:
+                XSLogError('Device event listener failed: ', e)
+                time.sleep(self.SETTLE_SECS)
+
+    def RequestRefresh(self, inScan):
+        RefreshWorker.Inst().Request('devices', lambda: self.Refresh(inScan))
+
+    def VDIs(self):
+        retVal = self.vdis
+        if retVal is None or not self.IsListening():
+            self.Refresh(False)
+            retVal = self.vdis
+        return retVal
+
+    def UdevSRs(self):
+        retVal = []
+        for pbd in Data.Inst().host.PBDs([]):
+            sr = pbd.get('SR', None) or {}
+            if sr.get('type', '') == 'udev' and sr.get('content_type', '') in self.CONTENT_TYPES:
+                retVal.append(sr)
+        return retVal
+
+    def Refresh(self, inScan):
+        # Rereads the VDIs in udev SRs with a few targeted queries, first asking xapi to rescan the
+        # SRs if inScan is True.  Runs on the refresh worker, or the main thread if not listening
+        srs = self.UdevSRs()
+        session = Auth.Inst().AcquireSession()
+        if session is None:
+            raise Exception('Could not connect to local xapi')
+        try:
+            fetcher = BulkFetcher(session)
+            if inScan:
+                for sr in srs:
+                    try:
+                        fetcher.Call('SR', 'scan', sr['opaqueref'])
+                    except XenAPI.Failure as e:
+                        XSLogError('Scan of SR '+sr.get('name_label', '')+' failed: ', e)
+            vdiMap = fetcher.RecordsWhere('VDI', 'SR', [ sr['opaqueref'] for sr in srs ])
+            vbdMap = fetcher.RecordsWhere('VBD', 'VDI', list(vdiMap.keys()))
+        except:
+            Auth.Inst().ReleaseSession(session, sys.exc_info()[1])
+            raise
+        Auth.Inst().ReleaseSession(session)
+
+        vdis = []
+        for sr in srs:
+            newSR = sr.copy()
+            newSR['VDIs'] = []
+            for vdiRef, vdi in vdiMap.items():
+                if vdi['SR'] == sr['opaqueref']:
+                    vdi['VBDs'] = [ dict(vbdMap[vbd], opaqueref = vbd) for vbd in vdi['VBDs'] if vbd in vbdMap ]
+                    vdi['SR'] = newSR
+                    vdi['opaqueref'] = vdiRef
+                    newSR['VDIs'].append(vdi)
+            vdis += newSR['VDIs']
+
+        self.vdis = vdis
+        self.generation += 1
+
 class MountVDI:
     def __init__(self, inVDI, inMode = None):
         self.vdi = inVDI
@@ -229,7 +342,7 @@ class MountVDI:
 
             self.mountDev = '/dev/'+self.vbd['device']
 
-            time.sleep(1) # Wait a moment for xapi to create the nodes in /dev
+            Uevents.WaitForDevice(self.mountDev, FileUtils.DEVICE_TIMEOUT_SECONDS)
 
             if os.path.exists(self.mountDev+'1'): # First partition
                 self.mountDev += '1'
@@ -349,9 +462,6 @@ class MountVDIDirectly:
         self.mode = FirstValue(inMode, 'ro')
         self.mountedVDI = False
 
-        data = Data.Inst()
-        data.Update() # Get current device list
-
         try:
             self.mountDev = FileUtils.DeviceFromVDI(self.vdi)
 
@@ -478,6 +588,11 @@ class VMUtils:
     @staticmethod
     def numLocalResidentVMs():
         """Returns the number of VMs resident on the local host."""
+        if HotData.Inst().IsSubscribed():
+            # The VM collection is kept current by events, so count using its index
+            db = HotAccessor()
+            return len([ vmRef for vmRef in db.ResidentVMs(db.local_host_ref())
+                if not db.vm[vmRef].is_a_template(False) and not db.vm[vmRef].is_control_domain(False) ])
         query = ('field "is_a_template" = "false" and'
                  'field "is_control_domain" = "false" and '
                  'field "resident_on" = "%s"' % HotAccessor().local_host_ref().opaqueRef)
@@ -42,6 +42,17 @@ class Dialogue:
     def Title(self):
         return self.title
 
+    def Invalidate(self):
+        for pane in self.panes.values():
+            pane.Invalidate()
+
+    def RenderChanged(self):
+        retVal = False
+        for pane in self.panes.values():
+            if pane.RenderChanged():
+                retVal = True
+        return retVal
+
     def Destroy(self):
         for pane in self.panes.values():
             pane.Delete()
@@ -752,6 +763,76 @@ class ProgressDialogue(Dialogue):
         if self.OnComplete:
             self.OnComplete(self.task, *self.args)
 
+class CommandDialogue(ProgressDialogue):
+    # Shows a command run by the Executor, with its latest output lines as they arrive.  OnComplete is
+    # called with the job when the command finishes, and the dialogue then shows the result until dismissed.
+    # OnComplete is held by the job, so still runs if the dialogue is discarded and the Executor cancels the job
+    OUTPUT_LINES = 8
+
+    def __init__(self, inJob, inText, *args, **kwargs):
+        self.successText = kwargs.get('SuccessText', None)
+        self.failureText = kwargs.get('FailureText', None)
+        onComplete = kwargs.pop('OnComplete', None)
+        if onComplete is not None:
+            inJob.AddCompletion(lambda inJob: onComplete(inJob, *args))
+        ProgressDialogue.__init__(self, inJob, inText, *args, **kwargs)
+
+    def AddOutputFields(self):
+        pane = self.Pane()
+        pane.AddWrappedTextField(Lang('Time', 16) + TimeUtils.DurationString(self.task.DurationSecs()))
+        pane.NewLine()
+        for line in self.task.OutputLines()[-self.OUTPUT_LINES:]:
+            pane.AddTextField(line)
+            pane.NewLine()
+
+    def UpdateFieldsINITIAL(self):
+        pane = self.Pane()
+        pane.ResetFields()
+
+        pane.AddTitleField(self.text)
+        self.AddOutputFields()
+        if self.task.CanCancel():
+            pane.AddKeyHelpField( { Lang('<Esc>') : Lang('Cancel Operation') } )
+
+    def UpdateFieldsCANCEL(self):
+        pane = self.Pane()
+        pane.ResetFields()
+
+        pane.AddTitleField(self.text)
+        pane.AddWrappedBoldTextField(Lang('Attempting to cancel operation...'))
+        pane.NewLine()
+        self.AddOutputFields()
+
+    def UpdateFieldsCOMPLETE(self):
+        pane = self.Pane()
+        pane.ResetFields()
+
+        pane.AddTitleField(self.text)
+        if self.task.Succeeded():
+            message = FirstValue(self.successText, self.task.Message())
+        elif self.failureText is not None:
+            message = self.failureText + self.task.Message()
+        else:
+            message = self.task.Message()
+        pane.AddWrappedBoldTextField(message)
+        pane.NewLine()
+        self.AddOutputFields()
+        pane.AddKeyHelpField( { Lang("<Enter>") : Lang("OK") } )
+
+    def HandleCompletion(self):
+        self.ChangeState('COMPLETE')
+        self.task.RunCompletions()
+
+    def HandleKey(self, inKey):
+        # The dialogue can't be hidden while the command runs, as OnComplete is called from UpdateFields
+        if self.state == 'COMPLETE':
+            if inKey in ('KEY_ENTER', 'KEY_ESCAPE'):
+                Layout.Inst().PopDialogue()
+        elif inKey == 'KEY_ESCAPE' and self.task.CanCancel():
+            self.task.Cancel()
+            self.ChangeState('CANCEL')
+        return True
+
 class DialogueUtils:
     # Helper for activate
     @classmethod
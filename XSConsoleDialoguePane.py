@@ -80,6 +80,8 @@ class DialoguePane:
     def ResetFields(self): self.fieldGroup.Reset()
     def NumStaticFields(self): return self.fieldGroup.NumStaticFields()
     def GetFieldValues(self): return self.fieldGroup.GetFieldValues()
+    def SaveFields(self): return self.fieldGroup.Save()
+    def RestoreFields(self, inSaved): self.fieldGroup.Restore(inSaved)
 
     # Delegations to FieldInputTracker
     def ActivateNextInput(self): return self.inputTracker.ActivateNextInput()
@@ -102,6 +104,14 @@ class DialoguePane:
             self.window.TitleSet(self.title)
         if self.hasBox:
             self.window.AddBox()
+        self.window.RetainedSet(True)
+
+    def Invalidate(self):
+        self.Win().Invalidate()
+
+    def RenderChanged(self):
+        # True if the last Render sent anything to curses
+        return self.Win().FrameChanged()
 
     def CursorOff(self):
         self.Win().CursorOff()
@@ -0,0 +1,213 @@
+# Copyright (c) 2007-2009 Citrix Systems Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 2 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import time
+
+from XSConsoleBases import *
+from XSConsoleChildProcess import *
+from XSConsoleLang import *
+from XSConsoleLog import *
+
+# Using the executor:
+# job = Executor.Inst().Submit(ExecutorJob(['/usr/sbin/xen-bugtool', '--yestoall'], 3600))
+# Layout.Inst().PushDialogue(CommandDialogue(job, Lang('Saving Bug Report...')))
+#   ... the dialogue shows output lines as they arrive, and <Esc> cancels the command ...
+#
+# status, output = getstatusoutput('/bin/sync', 30) # Blocks the calling thread only
+
+class ExecutorJob(ChildProcess):
+    # A command run by the Executor, which can be cancelled and shown by a ProgressDialogue
+    def __init__(self, inParams, inTimeoutSecs = None, inShell = False, inMergeStderr = False, inInput = None, inStdin = False, inPassFDs = None, inCanCancel = True):
+        ChildProcess.__init__(self, inParams, inTimeoutSecs, inShell, inMergeStderr, inInput, inStdin, inPassFDs)
+        self.canCancel = inCanCancel
+        self.queued = False # True if submitted to the executor's queue rather than run immediately
+        self.cancelled = False
+        self.completions = [] # Called on the main thread once the job has finished
+
+    def Finish(self):
+        ChildProcess.Finish(self)
+        Executor.Inst().JobFinished(self)
+
+    def Fail(self, inException):
+        # Called if the child could not be started
+        self.error = inException
+        self.outputLines.append(str(inException))
+        self.Finish()
+
+    def Cancel(self):
+        if self.canCancel and not self.done:
+            self.cancelled = True
+            if not self.started:
+                Executor.Inst().Dequeue(self)
+                self.Finish()
+            else:
+                self.RequestStop()
+
+    def AddCompletion(self, inProc):
+        # inProc is called with the job, from RunCompletions
+        self.completions.append(inProc)
+
+    def RunCompletions(self):
+        # Call from the main thread once the job has finished.  Each completion runs once
+        completions = self.completions
+        self.completions = []
+        for completion in completions:
+            try:
+                completion(self)
+            except Exception as e:
+                XSLogError("Completion of command '"+self.Name()+"' failed: ", e)
+
+    def IsPending(self):
+        return not self.done
+
+    def Succeeded(self):
+        return self.done and self.returnCode == 0 and not self.timedOut and not self.cancelled
+
+    def ReturnCode(self):
+        # None if the command didn't run to completion
+        if self.timedOut or self.cancelled:
+            return None
+        return self.returnCode
+
+
+    def StatusOutput(self):
+        # As returned by getstatusoutput, with status None if the command didn't run to completion
+        return (self.ReturnCode(), "\n".join(self.OutputLines()))
+
+    # The methods below let ProgressDialogue show a job as it would an xapi task
+    def CanCancel(self):
+        return self.canCancel and not self.done
+
+    def DurationSecs(self):
+        return FirstValue(self.finishTime, time.time()) - self.startTime
+
+    def ProgressValue(self):
+        return 1.0 if self.done else 0.0
+
+    def Message(self):
+        if not self.done:
+            retVal = Lang('In progress')
+        elif self.cancelled:
+            retVal = Lang('Cancelled')
+        elif self.timedOut:
+            retVal = Lang('Timed out')
+        elif self.error is not None:
+            retVal = Lang('Failed: ')+Lang(self.error)
+        elif self.returnCode == 0:
+            retVal = Lang('Operation was successful')
+        else:
+            retVal = Lang('Failed with exit code ')+str(self.returnCode)
+        return retVal
+
+class Executor:
+    # Runs ExecutorJobs, with at most MAX_RUNNING of those submitted running at once.  Jobs that the
+    # caller waits for, e.g. from ShellPipe, start immediately
+    MAX_RUNNING = 4
+    instance = None
+
+    @classmethod
+    def Inst(cls):
+        if cls.instance is None:
+            cls.instance = Executor()
+        return cls.instance
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.queue = []
+        self.running = []
+
+    def Submit(self, inJob):
+        self.lock.acquire()
+        try:
+            if len([ job for job in self.running if job.queued ]) < self.MAX_RUNNING:
+                start = True
+                self.running.append(inJob)
+            else:
+                start = False
+                self.queue.append(inJob)
+            inJob.queued = True
+        finally:
+            self.lock.release()
+        if start:
+            self.LaunchJob(inJob)
+        return inJob
+
+    def RunNow(self, inJob):
+        # Starts the job regardless of MAX_RUNNING, raising an exception if it can't be started
+        inJob.queued = False
+        self.lock.acquire()
+        try:
+            self.running.append(inJob)
+        finally:
+            self.lock.release()
+        try:
+            inJob.Launch()
+        except:
+            self.JobFinished(inJob)
+            raise
+        return inJob
+
+    def LaunchJob(self, inJob):
+        try:
+            inJob.Launch()
+        except Exception as e:
+            XSLogError("Command '"+inJob.Name()+"' could not be started: ", e)
+            inJob.Fail(e)
+
+    def Dequeue(self, inJob):
+        self.lock.acquire()
+        try:
+            if inJob in self.queue:
+                self.queue.remove(inJob)
+        finally:
+            self.lock.release()
+
+    def JobFinished(self, inJob):
+        nextJob = None
+        self.lock.acquire()
+        try:
+            if inJob in self.running:
+                self.running.remove(inJob)
+            if len(self.queue) > 0 and len([ job for job in self.running if job.queued ]) < self.MAX_RUNNING:
+                nextJob = self.queue.pop(0)
+                self.running.append(nextJob)
+        finally:
+            self.lock.release()
+        if nextJob is not None:
+            self.LaunchJob(nextJob)
+
+    def CancelAll(self):
+        # Called from the main thread when the dialogues showing jobs have gone, e.g. on exit or a Ctrl-C
+        # reset.  The jobs run in their own sessions so don't see Ctrl-C.  Waits for cancelled jobs to stop,
+        # then runs their completions so that they can release files and devices
+        self.lock.acquire()
+        try:
+            jobs = self.queue + self.running
+        finally:
+            self.lock.release()
+        for job in jobs:
+            job.Cancel()
+        for job in jobs:
+            if job.cancelled and job.Wait(ExecutorJob.KILL_GRACE_SECS + ExecutorJob.DRAIN_SECS + 1.0):
+                job.RunCompletions()
+
+def getstatusoutput(inCommand, inTimeoutSecs = None):
+    # As subprocess.getstatusoutput, run through the executor.  The status is None if the command timed out
+    job = Executor.Inst().RunNow(ExecutorJob(inCommand, inTimeoutSecs, inShell = True, inMergeStderr = True))
+    job.Wait()
+    return job.StatusOutput()
+
+def getoutput(inCommand, inTimeoutSecs = None):
+    return getstatusoutput(inCommand, inTimeoutSecs)[1]
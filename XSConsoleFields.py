@@ -202,12 +202,10 @@ class MenuField(Field):
     def __init__(self, menu, colour, highlight, height, flow):
         ParamsToAttr()
         self.scrollPoint = 0
-        self.height = min(self.height, len(self.menu.ChoiceDefs()))
+        self.height = min(self.height, self.menu.NumChoices())
 
     def Width(self):
-        if len(self.menu.ChoiceDefs()) == 0:
-            return 0
-        return max(len(choice.name) for choice in self.menu.ChoiceDefs() )
+        return self.menu.ChoiceNameWidth()
 
     def Height(self):
         return self.height
@@ -225,21 +223,23 @@ class MenuField(Field):
             # Move so the choiceIndex is at the bottom
             self.scrollPoint = choiceIndex - self.height + 1
 
-        choiceDefs = self.menu.ChoiceDefs()
-        for i in range(min(self.height, len(choiceDefs) - self.scrollPoint)):
+        # Only the visible rows are fetched, as menus with a MenuSource create choices on demand
+        for i in range(min(self.height, self.menu.NumChoices() - self.scrollPoint)):
             choiceNum = self.scrollPoint + i
             if choiceNum == choiceIndex:
                 colour = self.highlight
             else:
                 colour = self.colour
 
-            inPane.AddText(choiceDefs[choiceNum].name, inXPos, inYPos + i, colour)
+            inPane.AddText(self.menu.ChoiceName(choiceNum), inXPos, inYPos + i, colour)
 
 class FieldGroup:
     def __init__(self):
+        self.generation = 0
         self.Reset()
 
     def Reset(self):
+        self.generation += 1 # Changes whenever fields are added or reset, so that layouts can be cached
         self.bodyFields = []
         self.bodyFieldNames = []
         self.staticFields = []
@@ -248,6 +248,21 @@ class FieldGroup:
         self.inputOrder = []
         self.inputTags = {}
 
+    def Save(self):
+        # Returns the current fields, so that they can be restored later without rebuilding them
+        return Struct(bodyFields = self.bodyFields[:], bodyFieldNames = self.bodyFieldNames[:],
+            staticFields = self.staticFields[:], staticFieldNames = self.staticFieldNames[:],
+            inputOrder = self.inputOrder[:], inputTags = dict(self.inputTags))
+
+    def Restore(self, inSaved):
+        self.Reset()
+        self.bodyFields = inSaved.bodyFields[:]
+        self.bodyFieldNames = inSaved.bodyFieldNames[:]
+        self.staticFields = inSaved.staticFields[:]
+        self.staticFieldNames = inSaved.staticFieldNames[:]
+        self.inputOrder = inSaved.inputOrder[:]
+        self.inputTags = dict(inSaved.inputTags)
+
     def NumStaticFields(self):
         return len(self.staticFields)
 
@@ -263,13 +278,23 @@ class FieldGroup:
     def InputField(self, inIndex):
         return self.inputOrder[inIndex]
 
+    def Generation(self):
+        return self.generation
+
+    def InputWidths(self):
+        # Input fields grow as text is typed, which changes the layout without adding fields
+        return tuple(field.Width() for field in self.inputOrder)
+
     def BodyFieldAdd(self, inTag, inField):
+        self.generation += 1
         self.bodyFields.append(inField)
 
     def StaticFieldAdd(self, inTag, inField):
+        self.generation += 1
         self.staticFields.append(inField)
 
     def InputFieldAdd(self, inTag, inField):
+        self.generation += 1
         # Three reference to the same field
         self.inputTags[inTag] = inField
         self.inputOrder.append(inField)
@@ -296,6 +321,7 @@ class FieldArranger:
     def Reset(self):
         self.layoutXSize = None
         self.layoutYSize = None
+        self.layoutCache = {} # 'body' or 'static' : Struct(key, layout)
 
     def XSizeSet(self, inXSize):
         self.baseXSize = inXSize
@@ -388,11 +414,20 @@ class FieldArranger:
 
         return retVal
 
+    def CachedLayout(self, inName, inFields, inYStep):
+        # Laying out can reflow wrapped text, so layouts are reused until the fields or sizes change
+        key = (self.fieldGroup.Generation(), self.baseXSize, self.baseYSize, self.hasBox, self.fieldGroup.InputWidths())
+        cached = self.layoutCache.get(inName, None)
+        if cached is None or cached.key != key:
+            cached = Struct(key = key, layout = self.LayoutFields(inFields, inYStep))
+            self.layoutCache[inName] = cached
+        return list(cached.layout) # Callers pop entries from the list
+
     def BodyLayout(self):
-        return self.LayoutFields(self.fieldGroup.BodyFields(), 1)
+        return self.CachedLayout('body', self.fieldGroup.BodyFields(), 1)
 
     def StaticLayout(self):
-        return self.LayoutFields(self.fieldGroup.StaticFields(), -1)
+        return self.CachedLayout('static', self.fieldGroup.StaticFields(), -1)
 
 class FieldInputTracker:
     def __init__(self, inFieldGroup):
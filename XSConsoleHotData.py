@@ -15,11 +15,12 @@
 
 import XenAPI
 
-import re, shutil, sys, socket
+import re, shutil, sys, socket, threading, time
 from pprint import pprint
 
 from XSConsoleAuth import *
 from XSConsoleLang import *
+from XSConsoleScheduler import *
 from XSConsoleState import *
 from XSConsoleUtils import *
 
@@ -98,6 +99,31 @@ class HotAccessor:
     def HotOpaqueRef(self):
         return self.refs[-1]
 
+    # Index lookups.  These return HotOpaqueRefs from indexes that HotData rebuilds whenever the
+    # underlying collection is refreshed, e.g. HotAccessor().vm[HotAccessor().RefByUUID('vm', uuid)]
+    def RefByUUID(self, inType, inUUID):
+        refs = HotData.Inst().IndexLookup(inType+'_by_uuid', inUUID)
+        if len(refs) == 0:
+            return None
+        return refs[0]
+
+    def ResidentVMs(self, inHostRef):
+        return HotData.Inst().IndexLookup('vms_by_host', inHostRef)
+
+    def VMsInPowerState(self, inPowerState):
+        return HotData.Inst().IndexLookup('vms_by_power_state', inPowerState.lower())
+
+    def HostPBDs(self, inHostRef):
+        return HotData.Inst().IndexLookup('pbds_by_host', inHostRef)
+
+    def SRHosts(self, inSRRef):
+        # Hosts with a PBD for this SR
+        return HotData.Inst().IndexLookup('hosts_by_sr', inSRRef)
+
+    def SRPoolRoles(self, inSRRef):
+        # Any of 'default', 'suspend' and 'crashdump', for SRs used in those roles by the pool
+        return HotData.Inst().IndexLookup('pool_roles_by_sr', inSRRef)
+
     def __str__(self):
         return str(self.__dict__)
 
@@ -105,13 +131,35 @@ class HotAccessor:
         return str(self.__dict__)
 
 class HotData:
+    # Classes kept current by the event.from subscription, mapped to their converter method names.
+    # xapi's event class names are the same as the fetcher names
+    EVENT_CLASSES = {
+        'host' : 'ConvertHost',
+        'host_cpu' : 'ConvertHostCPU',
+        'pbd' : 'ConvertPBD',
+        'pool' : 'ConvertPool',
+        'sr' : 'ConvertSR',
+        'vm' : 'ConvertVM'
+    }
+    EVENT_TIMEOUT_SECS = 10.0 # Must be shorter than the socket timeout set by Auth
+    EVENT_RETRY_SECS = 5
     instance = None
 
     def __init__(self):
         self.data = {}
         self.timestamps = {}
         self.session = None
+        self.ownerThread = threading.current_thread()
+        self.threadSessions = threading.local() # Sessions for fetches made by the refresh worker
+        # eventData holds the subscribed collections.  The event thread replaces each collection
+        # dictionary as a whole, so readers never see a collection being modified
+        self.eventData = {}
+        self.eventThread = None
+        self.subscribed = False
+        self.version = 0 # Incremented whenever cached data changes, so that views built from it can be reused
+        self.fetchAccesses = 0 # Reads not served by the subscription, so only as current as the fetcher lifetime
         self.InitialiseFetchers()
+        self.InitialiseIndexes()
 
     @classmethod
     def Inst(cls):
@@ -122,14 +170,119 @@ class HotData:
     @classmethod
     def Reset(cls):
         if cls.instance is not None:
+            cls.instance.Unsubscribe()
             del cls.instance
             cls.instance = None
 
     def DeleteCache(self):
+        # Subscribed collections are kept up to date by events, so are not deleted here
         self.data = {}
         self.timestamps = {}
+        self.version += 1
+
+    def Version(self):
+        return self.version
+
+    def FetchAccesses(self):
+        return self.fetchAccesses
+
+    def ShortestLifetimeSecs(self):
+        return min(fetcher.lifetimeSecs for fetcher in self.fetchers.values())
+
+    def Subscribe(self):
+        # Start keeping the EVENT_CLASSES collections current using xapi's event.from
+        if not self.subscribed:
+            self.subscribed = True
+            self.eventThread = threading.Thread(target = self.EventLoop, name = 'HotDataEvents')
+            self.eventThread.daemon = True
+            self.eventThread.start()
+
+    def Unsubscribe(self):
+        # The event thread exits after its current event.from call returns
+        self.subscribed = False
+        self.eventThread = None
+        self.eventData = {}
+
+    def IsSubscribed(self):
+        return self.subscribed and len(self.eventData) > 0
+
+    def EventLoop(self):
+        thisThread = threading.current_thread()
+        session = None
+        token = ''
+        while self.subscribed and self.eventThread is thisThread:
+            try:
+                if session is None:
+                    session = Auth.Inst().AcquireSession()
+                    if session is None:
+                        raise Exception('Could not open a session for event.from')
+                    token = '' # A new session needs a full resynchronisation
+                eventFrom = getattr(session.xenapi.event, 'from')
+                result = eventFrom(list(self.EVENT_CLASSES.keys()), token, self.EVENT_TIMEOUT_SECS)
+                if self.subscribed and self.eventThread is thisThread:
+                    self.ApplyEvents(result['events'], token == '')
+                token = result['token']
+            except Exception as e:
+                XSLogError('HotData event subscription failed - will resynchronise: ', e)
+                # Fall back to fetching until the subscription is back in sync
+                self.eventData = {}
+                if session is not None:
+                    try: Auth.Inst().CloseSession(session)
+                    except Exception: pass
+                    session = None
+                time.sleep(self.EVENT_RETRY_SECS)
+
+        Auth.Inst().ReleaseSession(session)
+
+    def ApplyEvents(self, inEvents, inIsInitial):
+        # Apply add/mod/del deltas to copies of the affected collections, then swap them in.
+        # The first batch from event.from holds every object, so replaces the collections entirely
+        if inIsInitial:
+            newData = dict((name, {}) for name in self.EVENT_CLASSES)
+        else:
+            newData = {}
+        for event in inEvents:
+            eventClass = event.get('class', '').lower()
+            if eventClass not in self.EVENT_CLASSES:
+                continue
+            if eventClass not in newData:
+                newData[eventClass] = dict(self.eventData.get(eventClass, {}))
+            collection = newData[eventClass]
+            ref = HotOpaqueRef(event['ref'], eventClass)
+            if event.get('operation', '') == 'del':
+                collection.pop(ref, None)
+            elif 'snapshot' in event:
+                converter = getattr(self, self.EVENT_CLASSES[eventClass])
+                collection[ref] = converter(event['snapshot'])
+
+        if inIsInitial:
+            self.eventData = newData
+        else:
+            eventData = dict(self.eventData)
+            eventData.update(newData)
+            self.eventData = eventData
+
+        if len(newData) > 0:
+            self.version += 1
+            Scheduler.Inst().Notify() # Wake the main loop to show the changes
+
+    def EventValue(self, inName, inRef):
+        # Returns the subscribed collection or record, or None if not subscribed or not present
+        eventData = self.eventData # Take a reference, as the event thread may replace it
+        if isinstance(inRef, HotOpaqueRef):
+            retVal = eventData.get(inRef.Type(), {}).get(inRef, None)
+        elif inRef is None:
+            retVal = eventData.get(inName, None)
+        else:
+            retVal = None
+        return retVal
 
     def Fetch(self, inName, inRef):
+        retVal = self.EventValue(inName, inRef)
+        if retVal is not None:
+            return retVal
+        self.fetchAccesses += 1
+
         # Top-level object are cached by name, referenced objects by reference
         cacheName = FirstValue(inRef, inName)
         cacheEntry = self.data.get(cacheName, None)
@@ -138,16 +291,97 @@ class HotData:
         # If inRef is an array index, the result can't be cached
         if not isinstance(inRef, int) and cacheEntry is not None and timeNow - cacheEntry.timestamp < fetcher.lifetimeSecs:
             retVal = cacheEntry.value
+        elif inRef is None and cacheEntry is not None and fetcher.staleWhileRevalidate and \
+            threading.current_thread() is self.ownerThread:
+            # Return the stale collection and refetch it in the background
+            retVal = cacheEntry.value
+            jobName = 'hotdata.'+inName
+            if not RefreshWorker.Inst().IsPending(jobName):
+                RefreshWorker.Inst().Request(jobName, lambda: self.FetchAndCache(inName, inRef))
         else:
-            try:
-                retVal = fetcher.fetcher(inRef)
-                # Save in the cache
-                self.data[cacheName] = Struct(timestamp = timeNow, value = retVal)
-            except socket.timeout:
-                self.session = None
-                raise socket.timeout
+            retVal = self.FetchAndCache(inName, inRef)
         return retVal
 
+    def FetchAndCache(self, inName, inRef):
+        cacheName = FirstValue(inRef, inName)
+        timeNow = time.time()
+        try:
+            retVal = self.fetchers[inName].fetcher(inRef)
+            cacheEntry = self.data.get(cacheName, None)
+            if cacheEntry is None or cacheEntry.value != retVal:
+                self.version += 1
+            # Save in the cache
+            self.data[cacheName] = Struct(timestamp = timeNow, value = retVal)
+            if inRef is None:
+                self.CacheCollectionItems(retVal, timeNow)
+            elif isinstance(inRef, HotOpaqueRef):
+                self.UpdateCachedCollection(inRef, retVal)
+        except socket.timeout:
+            self.DropSession()
+            raise socket.timeout
+        return retVal
+
+    def CacheCollectionItems(self, inCollection, inTimestamp):
+        # A collection fetched with get_all_records already holds the record for each of its items,
+        # so cache those by reference too.  This saves a get_record call per item when iterating
+        if isinstance(inCollection, dict):
+            for key, value in inCollection.items():
+                if isinstance(key, HotOpaqueRef) and isinstance(value, dict) and key.Type() in self.fetchers:
+                    self.data[key] = Struct(timestamp = inTimestamp, value = value)
+
+    def UpdateCachedCollection(self, inRef, inValue):
+        # Keep a cached collection consistent with a record that has just been refetched
+        cacheEntry = self.data.get(inRef.Type(), None)
+        if cacheEntry is not None and isinstance(cacheEntry.value, dict) and inRef in cacheEntry.value:
+            cacheEntry.value[inRef] = inValue
+            # The collection was changed in place, so its indexes must be rebuilt
+            for name, indexDef in self.indexDefs.items():
+                if indexDef.collection == inRef.Type():
+                    self.indexes.pop(name, None)
+
+    def AddIndex(self, inName, inCollection, inPairFunction):
+        # inPairFunction(ref, record) returns a list of (key, value) pairs to add to the index
+        self.indexDefs[inName] = Struct(collection = inCollection, pairFunction = inPairFunction)
+
+    def InitialiseIndexes(self):
+        self.indexDefs = {}
+        self.indexes = {}
+        for name in ('host', 'pbd', 'pool', 'sr', 'vm'):
+            self.AddIndex(name+'_by_uuid', name, lambda ref, record: [ (record.get('uuid', None), ref) ])
+        self.AddIndex('vms_by_host', 'vm', lambda ref, record: [ (record.get('resident_on', None), ref) ])
+        self.AddIndex('vms_by_power_state', 'vm', lambda ref, record: [ (record.get('power_state', '').lower(), ref) ])
+        self.AddIndex('pbds_by_host', 'pbd', lambda ref, record: [ (record.get('host', None), ref) ])
+        self.AddIndex('hosts_by_sr', 'pbd', lambda ref, record: [ (record.get('SR', None), record.get('host', None)) ])
+        self.AddIndex('pool_roles_by_sr', 'pool', lambda ref, record: [
+            (record.get('default_SR', None), 'default'),
+            (record.get('suspend_image_SR', None), 'suspend'),
+            (record.get('crash_dump_SR', None), 'crashdump')
+        ])
+
+    def Index(self, inName):
+        # Returns a dictionary of key : list of values, rebuilt whenever the collection is refetched
+        indexDef = self.indexDefs[inName]
+        try:
+            collection = self.Fetch(indexDef.collection, None)
+        except Exception as e:
+            return {} # Data not present/fetchable, as in GetData
+
+        index = self.indexes.get(inName, None)
+        if index is None or index.source is not collection:
+            value = {}
+            seen = set() # (key, item) pairs already added, to keep each list free of duplicates in linear time
+            for ref, record in collection.items():
+                for key, item in indexDef.pairFunction(ref, record):
+                    if key is not None and (key, item) not in seen:
+                        seen.add((key, item))
+                        value.setdefault(key, []).append(item)
+            index = Struct(source = collection, value = value)
+            self.indexes[inName] = index
+        return index.value
+
+    def IndexLookup(self, inName, inKey):
+        return self.Index(inName).get(inKey, [])
+
     def FetchByRef(self, inRef):
         retVal = self.Fetch(inRef.Type(), inRef)
         return retVal
@@ -208,25 +442,31 @@ class HotData:
             raise Exception("Unknown method HotData."+inName)
         return HotAccessor([inName], [None])
 
-    def AddFetcher(self, inKey, inFetcher, inLifetimeSecs):
-        self.fetchers[inKey] = Struct( fetcher = inFetcher, lifetimeSecs = inLifetimeSecs )
+    def AddFetcher(self, inKey, inFetcher, inLifetimeSecs, inStaleWhileRevalidate = False):
+        # With inStaleWhileRevalidate, an expired collection is returned as-is while the refresh worker
+        # refetches it, so the UI doesn't wait for xapi
+        self.fetchers[inKey] = Struct( fetcher = inFetcher, lifetimeSecs = inLifetimeSecs,
+            staleWhileRevalidate = inStaleWhileRevalidate )
+
+    def SetStaleWhileRevalidate(self, inKey, inEnabled):
+        self.fetchers[inKey].staleWhileRevalidate = inEnabled
 
     def InitialiseFetchers(self):
         self.fetchers = {}
         self.AddFetcher('guest_metrics', self.FetchVMGuestMetrics, 5)
-        self.AddFetcher('guest_vm', self.FetchGuestVM, 5)
+        self.AddFetcher('guest_vm', self.FetchGuestVM, 5, True)
         self.AddFetcher('guest_vm_derived', self.FetchGuestVMDerived, 5)
-        self.AddFetcher('host', self.FetchHost, 5)
+        self.AddFetcher('host', self.FetchHost, 5, True)
         self.AddFetcher('host_cpu', self.FetchHostCPUs, 5)
         self.AddFetcher('local_host', self.FetchLocalHost, 5) # Derived
         self.AddFetcher('local_host_ref', self.FetchLocalHostRef, 60) # Derived
         self.AddFetcher('local_pool', self.FetchLocalPool, 5) # Derived
         self.AddFetcher('metrics', self.FetchMetrics, 5)
-        self.AddFetcher('pbd', self.FetchPBD, 5)
+        self.AddFetcher('pbd', self.FetchPBD, 5, True)
         self.AddFetcher('pool', self.FetchPool, 5)
-        self.AddFetcher('sr', self.FetchSR, 5)
-        self.AddFetcher('visible_sr', self.FetchVisibleSR, 5) # Derived
-        self.AddFetcher('vm', self.FetchVM, 5)
+        self.AddFetcher('sr', self.FetchSR, 5, True)
+        self.AddFetcher('visible_sr', self.FetchVisibleSR, 5, True) # Derived
+        self.AddFetcher('vm', self.FetchVM, 5, True)
         self.AddFetcher('dmv', self.FetchDMVDrivers, 60)
 
     def FetchVMGuestMetrics(self, inOpaqueRef):
@@ -244,20 +484,20 @@ class HotData:
                     retVal[key] = value
         return retVal
 
-    def FetchHostCPUs(self, inOpaqueRef):
-        def LocalConverter(inCPU):
-            return HotData.ConvertOpaqueRefs(inCPU,
-                host='host'
-                )
+    def ConvertHostCPU(self, inCPU):
+        return HotData.ConvertOpaqueRefs(inCPU,
+            host='host'
+            )
 
+    def FetchHostCPUs(self, inOpaqueRef):
         if inOpaqueRef is not None:
             cpu = self.Session().xenapi.host_cpu.get_record(inOpaqueRef.OpaqueRef())
-            retVal = LocalConverter(cpu)
+            retVal = self.ConvertHostCPU(cpu)
         else:
             cpus = self.Session().xenapi.host_cpu.get_all_records()
             retVal = {}
             for key, cpu in cpus.items():
-                cpu = LocalConverter(cpu)
+                cpu = self.ConvertHostCPU(cpu)
                 retVal[HotOpaqueRef(key, 'host_cpu')] = cpu
         return retVal
 
@@ -287,7 +527,10 @@ class HotData:
         return retVal
 
     def FetchLocalHost(self, inOpaqueRef):
-        retVal = self.FetchHost(self.FetchLocalHostRef(inOpaqueRef))
+        hostRef = self.FetchLocalHostRef(inOpaqueRef)
+        retVal = self.EventValue('host', hostRef)
+        if retVal is None:
+            retVal = self.FetchHost(hostRef)
         return retVal
 
     def FetchLocalHostRef(self, inOpaqueRef):
@@ -301,6 +544,10 @@ class HotData:
         if inOpaqueRef is not None:
             raise Exception("Request for local pool must not be passed an OpaqueRef")
 
+        subscribedPools = self.EventValue('pool', None)
+        if subscribedPools is not None and len(subscribedPools) == 1:
+            return list(subscribedPools.values())[0]
+
         pools = self.Session().xenapi.pool.get_all()
         if len(pools) != 1:
             raise Exception("Unexpected number of pools "+str(pools))
@@ -308,30 +555,30 @@ class HotData:
         retVal = self.FetchPool(HotOpaqueRef(pools[0], 'pool'))
         return retVal
 
-    def FetchHost(self, inOpaqueRef):
-        def LocalConverter(inHost):
-            return HotData.ConvertOpaqueRefs(inHost,
-                crash_dump_sr = 'sr',
-                consoles = 'console',
-                current_operations = 'task',
-                host_CPUs = 'host_cpu',
-                metrics = 'host::metrics',
-                PBDs = 'pbd',
-                PIFs='pif',
-                resident_VMs = 'vm',
-                suspend_image_sr = 'sr',
-                VBDs = 'vbd',
-                VIFs = 'vif'
-                )
+    def ConvertHost(self, inHost):
+        return HotData.ConvertOpaqueRefs(inHost,
+            crash_dump_sr = 'sr',
+            consoles = 'console',
+            current_operations = 'task',
+            host_CPUs = 'host_cpu',
+            metrics = 'host::metrics',
+            PBDs = 'pbd',
+            PIFs='pif',
+            resident_VMs = 'vm',
+            suspend_image_sr = 'sr',
+            VBDs = 'vbd',
+            VIFs = 'vif'
+            )
 
+    def FetchHost(self, inOpaqueRef):
         if inOpaqueRef is not None:
             host = self.Session().xenapi.host.get_record(inOpaqueRef.OpaqueRef())
-            retVal = LocalConverter(host)
+            retVal = self.ConvertHost(host)
         else:
             hosts = self.Session().xenapi.host.get_all_records()
             retVal = {}
             for key, host in hosts.items():
-                host = LocalConverter(host)
+                host = self.ConvertHost(host)
                 retVal[HotOpaqueRef(key, 'host')] = host
         return retVal
 
@@ -366,59 +613,59 @@ class HotData:
             raise Exception("Unknown metrics type '"+inOpaqueRef.Type()+"'")
         return retVal
 
-    def FetchPBD(self, inOpaqueRef):
-        def LocalConverter(inPBD):
-            return HotData.ConvertOpaqueRefs(inPBD,
-                host='host',
-                SR='sr'
-            )
+    def ConvertPBD(self, inPBD):
+        return HotData.ConvertOpaqueRefs(inPBD,
+            host='host',
+            SR='sr'
+        )
 
+    def FetchPBD(self, inOpaqueRef):
         if inOpaqueRef is not None:
             pbd = self.Session().xenapi.PBD.get_record(inOpaqueRef.OpaqueRef())
-            retVal = LocalConverter(pbd)
+            retVal = self.ConvertPBD(pbd)
         else:
             pbds = self.Session().xenapi.PBD.get_all_records()
             retVal = {}
             for key, pbd in pbds.items():
-                pbd = LocalConverter(pbd)
+                pbd = self.ConvertPBD(pbd)
                 retVal[HotOpaqueRef(key, 'pbd')] = pbd
         return retVal
 
-    def FetchPool(self, inOpaqueRef):
-        def LocalConverter(inPool):
-            return HotData.ConvertOpaqueRefs(inPool,
-                crash_dump_SR='sr',
-                default_SR='sr',
-                master='host',
-                suspend_image_SR='sr'
-            )
+    def ConvertPool(self, inPool):
+        return HotData.ConvertOpaqueRefs(inPool,
+            crash_dump_SR='sr',
+            default_SR='sr',
+            master='host',
+            suspend_image_SR='sr'
+        )
 
+    def FetchPool(self, inOpaqueRef):
         if inOpaqueRef is not None:
             pool = self.Session().xenapi.pool.get_record(inOpaqueRef.OpaqueRef())
-            retVal = LocalConverter(pool)
+            retVal = self.ConvertPool(pool)
         else:
             pools = self.Session().xenapi.pool.get_all_records()
             retVal = {}
             for key, pool in pools.items():
-                pool = LocalConverter(pool)
+                pool = self.ConvertPool(pool)
                 retVal[HotOpaqueRef(key, 'pool')] = pool
         return retVal
 
-    def FetchSR(self, inOpaqueRef):
-        def LocalConverter(inSR):
-            return HotData.ConvertOpaqueRefs(inSR,
-                current_operations = 'task',
-                PBDs = 'pbd',
-                VDIs = 'vdi')
+    def ConvertSR(self, inSR):
+        return HotData.ConvertOpaqueRefs(inSR,
+            current_operations = 'task',
+            PBDs = 'pbd',
+            VDIs = 'vdi')
 
+    def FetchSR(self, inOpaqueRef):
         if inOpaqueRef is not None:
             sr = self.Session().xenapi.SR.get_record(inOpaqueRef.OpaqueRef())
-            retVal = LocalConverter(sr)
+            retVal = self.ConvertSR(sr)
         else:
             srs = self.Session().xenapi.SR.get_all_records()
             retVal = {}
             for key, sr in srs.items():
-                sr = LocalConverter(sr)
+                sr = self.ConvertSR(sr)
                 retVal[HotOpaqueRef(key, 'sr')] = sr
         return retVal
 
@@ -428,42 +675,37 @@ class HotData:
             retVal = self.FetchSR(inOpaqueRef)
         else:
             retVal = {}
+            localHostRef = HotAccessor().local_host_ref()
             for sr in HotAccessor().sr: # Iterates through HotAccessors to SRs
-                visible = False
-                if len(sr.PBDs()) == 0:
-                    visible = True # This is a detached SR so list it as visible
-                else:
-                    for pbd in sr.PBDs(): # Iterates through HotOpaqueRefs to PBDs
-                        if pbd in HotAccessor().local_host.PBDs(): # host.PBDs() is a list of HotOpaqueRefs
-                            visible = True
-                if visible:
+                # Detached SRs, with no PBDs, are listed as visible
+                if len(sr.PBDs()) == 0 or localHostRef in HotAccessor().SRHosts(sr.HotOpaqueRef()):
                     retVal[sr.HotOpaqueRef()] = sr
 
         return retVal
 
-    def FetchVM(self, inOpaqueRef):
-        def LocalConverter(inVM):
-            return HotData.ConvertOpaqueRefs(inVM,
-                affinity='host',
-                consoles='console',
-                current_operations = 'task',
-                guest_metrics='guest_metrics',
-                metrics='vm::metrics',
-                PIFs='pif',
-                resident_on='host',
-                suspend_VDI='vdi',
-                snapshot_of='snapshot',
-                VBDs = 'vbd',
-                VIFs = 'vif')
+    def ConvertVM(self, inVM):
+        return HotData.ConvertOpaqueRefs(inVM,
+            affinity='host',
+            consoles='console',
+            current_operations = 'task',
+            guest_metrics='guest_metrics',
+            metrics='vm::metrics',
+            PIFs='pif',
+            resident_on='host',
+            suspend_VDI='vdi',
+            snapshot_of='snapshot',
+            VBDs = 'vbd',
+            VIFs = 'vif')
 
+    def FetchVM(self, inOpaqueRef):
         if inOpaqueRef is not None:
             vm = self.Session().xenapi.VM.get_record(inOpaqueRef.OpaqueRef())
-            retVal = LocalConverter(vm)
+            retVal = self.ConvertVM(vm)
         else:
             vms = self.Session().xenapi.VM.get_all_records()
             retVal = {}
             for key, vm in vms.items():
-                vm = LocalConverter(vm)
+                vm = self.ConvertVM(vm)
                 retVal[HotOpaqueRef(key, 'vm')] = vm
         return retVal
 
@@ -503,10 +745,24 @@ class HotData:
         return ioObj
 
     def Session(self):
+        if threading.current_thread() is not self.ownerThread:
+            # xmlrpc sessions can't be shared between threads
+            if getattr(self.threadSessions, 'session', None) is None:
+                self.threadSessions.session = Auth.Inst().AcquireSession()
+            return self.threadSessions.session
         if self.session is None:
-            self.session = Auth.Inst().OpenSession()
+            self.session = Auth.Inst().AcquireSession()
         return self.session
 
+    def DropSession(self):
+        if threading.current_thread() is not self.ownerThread:
+            self.threadSessions.session = None
+        else:
+            self.session = None
+
     def Dump(self):
         print("Contents of HotData cache:")
         pprint(self.data)
+        if self.IsSubscribed():
+            print("\nSubscribed HotData collections:")
+            pprint(self.eventData)
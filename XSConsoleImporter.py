@@ -15,13 +15,56 @@
 # with this program; if not, write to the Free Software Foundation, Inc.,
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
-import imp, os, re, sys, traceback
+import inspect, json, os, re, sys, time, traceback
+
+if sys.version_info >= (3, 5):
+    import importlib.util
+else:
+    import imp
 
 from XSConsoleLog import *
 from XSConsoleMenus import *
 
 
+class PlugInReference:
+    # Stands in for a handler or resource recorded in the plugin manifest.  The plugin module is
+    # imported when the reference is first called or one of its attributes is used
+    def __init__(self, inModuleName, inPathName, inAttributes):
+        self.moduleName = inModuleName
+        self.pathName = inPathName
+        self.attributes = inAttributes
+        self.target = None
+
+    def Resolve(self):
+        if self.target is None:
+            retVal = Importer.RequireModule(self.moduleName, self.pathName)
+            for attribute in self.attributes:
+                retVal = getattr(retVal, attribute)
+            self.target = retVal
+        return self.target
+
+    def __call__(self, *inParams, **inKeywords):
+        return self.Resolve()(*inParams, **inKeywords)
+
+    def __getattr__(self, inName):
+        if inName.startswith('__'):
+            raise AttributeError(inName)
+        return getattr(self.Resolve(), inName)
+
+    def __repr__(self):
+        return '<PlugInReference '+'.'.join([self.moduleName] + self.attributes)+'>'
+
 class Importer:
+    # The manifest records what each plugin registers, so that on later starts plugins can be
+    # registered without importing them.  It is rebuilt when the command line or any plugin or core file
+    # changes, as an upgrade of the core files can change, e.g., Lang strings or Config values used in registrations
+    MANIFEST_VERSION = 1
+    manifestPath = '/var/cache/xsconsole/plugin-manifest.json'
+    manifest = None
+    recording = None # Registrations made by the plugin being imported, while building the manifest
+    deferredModules = {} # Module name : True if the module has been imported
+    suppressRegistration = False
+
     plugIns = {}
     menuEntries = {}
     menuRegenerators = {}
@@ -34,28 +77,196 @@ class Importer:
         cls.menuRegenerators = {}
         cls.resources = {}
 
+    @classmethod
+    def LoadModule(cls, inModuleName, inPathName):
+        # Import using variable as module name
+        if sys.version_info >= (3, 5):
+            spec = importlib.util.spec_from_file_location(inModuleName, inPathName)
+            module = importlib.util.module_from_spec(spec)
+            sys.modules[inModuleName] = module
+            try:
+                spec.loader.exec_module(module)
+            except Exception:
+                del sys.modules[inModuleName]
+                raise
+        else:
+            fileObj = open(inPathName, 'U')
+            try:
+                module = imp.load_module(inModuleName, fileObj, inPathName, ('.py', 'U', imp.PY_SOURCE))
+            finally:
+                fileObj.close()
+        return module
+
+    @classmethod
+    def LoadModuleAndLog(cls, inModuleName, inPathName):
+        try:
+            return cls.LoadModule(inModuleName, inPathName)
+        except Exception as e:
+            try: XSLogError(*traceback.format_tb(sys.exc_info()[2]))
+            except: pass
+            try: XSLogError("*** PlugIn '"+inModuleName+"' failed to load: "+str(e))
+            except: pass
+            return None
+
+    @classmethod
+    def RequireModule(cls, inModuleName, inPathName):
+        # Imports a plugin registered from the manifest.  Its registrations are already in place,
+        # so are ignored while it is imported
+        if not cls.deferredModules.get(inModuleName, False):
+            startTime = time.time()
+            cls.suppressRegistration = True
+            try:
+                cls.LoadModule(inModuleName, inPathName)
+            finally:
+                cls.suppressRegistration = False
+            cls.deferredModules[inModuleName] = True
+            XSLog("Imported deferred PlugIn '%s' in %.3f seconds" % (inModuleName, time.time() - startTime))
+        return sys.modules[inModuleName]
+
+    @classmethod
+    def PlugInFiles(cls, inDir):
+        # Returns a list of (module name, path name, stat key) for the .py files in inDir
+        retVal = []
+        for root, dirs, files in os.walk(inDir):
+            for filename in files:
+                match =  re.match(r'([^/]+)\.py$', filename) # Pick out .py files in the base directory
+                if match:
+                    pathName = os.path.join(root, filename)
+                    stat = os.stat(pathName)
+                    retVal.append([match.group(1), pathName, [stat.st_mtime, stat.st_size]])
+        return retVal
+
+    @classmethod
+    def CoreFiles(cls):
+        # Returns a list of [filename, stat key] for the core modules, which plugin registrations can depend on
+        retVal = []
+        coreDir = os.path.dirname(os.path.abspath(__file__))
+        for filename in sorted(os.listdir(coreDir)):
+            if re.match(r'(XSConsole.*|simpleconfig)\.py$', filename):
+                stat = os.stat(os.path.join(coreDir, filename))
+                retVal.append([filename, [stat.st_mtime, stat.st_size]])
+        return retVal
+
+    @classmethod
+    def ReadManifest(cls):
+        if cls.manifest is None:
+            cls.manifest = {}
+            try:
+                if os.path.isfile(cls.manifestPath):
+                    manifestFile = open(cls.manifestPath)
+                    try:
+                        manifest = json.load(manifestFile)
+                    finally:
+                        manifestFile.close()
+                    if manifest.get('version', None) == cls.MANIFEST_VERSION and manifest.get('argv', None) == sys.argv[1:] and \
+                        manifest.get('core', None) == cls.CoreFiles():
+                        cls.manifest = manifest.get('dirs', {})
+            except Exception as e:
+                XSLogError('Plugin manifest could not be read: ', e)
+        return cls.manifest
+
+    @classmethod
+    def WriteManifest(cls):
+        try:
+            manifestDir = os.path.dirname(cls.manifestPath)
+            if not os.path.isdir(manifestDir):
+                os.makedirs(manifestDir, 0o755)
+            tempPath = cls.manifestPath+'.tmp'
+            manifestFile = open(tempPath, 'w')
+            try:
+                json.dump({ 'version' : cls.MANIFEST_VERSION, 'argv' : sys.argv[1:], 'core' : cls.CoreFiles(),
+                    'dirs' : cls.manifest }, manifestFile)
+            finally:
+                manifestFile.close()
+            os.rename(tempPath, cls.manifestPath)
+        except Exception as e:
+            XSLogError('Plugin manifest could not be written: ', e)
+
+    @classmethod
+    def EncodeValue(cls, inModule, inValue):
+        # Converts registration parameters to JSON, with handlers and classes as references to
+        # attributes of the plugin module.  Raises an exception for anything else, e.g. lambdas
+        if inValue is None or isinstance(inValue, (bool, int, float, type(''), type(u''))):
+            return inValue
+        if isinstance(inValue, (list, tuple)):
+            return [ cls.EncodeValue(inModule, value) for value in inValue ]
+        if isinstance(inValue, dict):
+            retVal = {}
+            for key, value in inValue.items():
+                if not isinstance(key, type('')):
+                    raise Exception('Cannot record key '+repr(key))
+                retVal[key] = cls.EncodeValue(inModule, value)
+            return retVal
+        name = getattr(inValue, '__name__', None)
+        if name is not None and getattr(inModule, name, None) is inValue:
+            return { '__ref__' : [name] }
+        if inspect.ismethod(inValue) and inspect.isclass(inValue.__self__):
+            owner = inValue.__self__
+            if getattr(inModule, owner.__name__, None) is owner and getattr(owner, name, None) == inValue:
+                return { '__ref__' : [owner.__name__, name] }
+        raise Exception('Cannot record '+repr(inValue))
+
+    @classmethod
+    def DecodeValue(cls, inModuleName, inPathName, inValue):
+        if isinstance(inValue, list):
+            return [ cls.DecodeValue(inModuleName, inPathName, value) for value in inValue ]
+        if isinstance(inValue, dict):
+            if list(inValue.keys()) == ['__ref__']:
+                return PlugInReference(inModuleName, inPathName, inValue['__ref__'])
+            return dict((str(key), cls.DecodeValue(inModuleName, inPathName, value)) for key, value in inValue.items())
+        if sys.version_info < (3, 0) and isinstance(inValue, unicode):
+            return inValue.encode('utf-8') # json returns unicode strings in Python2
+        return inValue
+
+    @classmethod
+    def RecordModule(cls, inModuleName, inPathName, inStatKey):
+        # Imports the plugin and returns its manifest entry
+        cls.recording = []
+        dataCalls = Data.instCalls
+        try:
+            module = cls.LoadModuleAndLog(inModuleName, inPathName)
+            registrations = cls.recording
+        finally:
+            cls.recording = None
+        retVal = { 'name' : inModuleName, 'path' : inPathName, 'stat' : inStatKey, 'deferred' : False }
+        if Data.instCalls != dataCalls:
+            # What is registered depends on the host, e.g. menu text with the product name
+            XSLog("PlugIn '"+inModuleName+"' cannot be deferred: it reads host data when registering")
+        elif module is not None:
+            try:
+                retVal['registrations'] = [ [kind, name, cls.EncodeValue(module, params)] for kind, name, params in registrations ]
+                retVal['deferred'] = True
+            except Exception as e:
+                # This plugin will be imported on every start
+                XSLog("PlugIn '"+inModuleName+"' cannot be deferred: "+str(e))
+        return retVal
+
     @classmethod
     def ImportAbsDir(cls, inDir):
         if os.path.isdir(inDir): # Ignore non-existent directories
-            for root, dirs, files in os.walk(inDir):
-                for filename in files:
-                    match =  re.match(r'([^/]+)\.py$', filename) # Pick out .py files in the base directory
-                    if match:
-                        importName = match.group(1)
-                        fileObj = None
-                        try:
-                            try:
-                                # Import using variable as module name
-                                (fileObj, pathName, description) = imp.find_module(importName, [root])
-                                imp.load_module(importName, fileObj, pathName, description)
-                            except Exception as e:
-                                try: XSLogError(*traceback.format_tb(sys.exc_info()[2]))
-                                except: pass
-                                try: XSLogError("*** PlugIn '"+importName+"' failed to load: "+str(e))
-                                except: pass
-                        finally:
-                            if fileObj is not None:
-                                fileObj.close()
+            startTime = time.time()
+            plugInFiles = cls.PlugInFiles(inDir)
+            manifest = cls.ReadManifest()
+            entries = manifest.get(inDir, None)
+            if entries is not None and [ [entry['name'], entry['path'], entry['stat']] for entry in entries ] != plugInFiles:
+                entries = None # Plugins have been added, removed or changed
+            numDeferred = 0
+            if entries is None:
+                entries = [ cls.RecordModule(*plugInFile) for plugInFile in plugInFiles ]
+                manifest[inDir] = entries
+                cls.WriteManifest()
+            else:
+                for entry in entries:
+                    if entry['deferred'] and not cls.deferredModules.get(entry['name'], False):
+                        cls.deferredModules[entry['name']] = False
+                        for kind, name, params in entry['registrations']:
+                            registerFunc = getattr(cls, 'Register'+kind)
+                            registerFunc(None, name, cls.DecodeValue(entry['name'], entry['path'], params))
+                        numDeferred += 1
+                    else:
+                        cls.LoadModuleAndLog(entry['name'], entry['path'])
+            XSLog('Registered %d PlugIns (%d deferred) from %s in %.3f seconds' %
+                (len(entries), numDeferred, inDir, time.time() - startTime))
 
     @classmethod
     def ImportRelativeDir(self, inDir):
@@ -65,8 +276,17 @@ class Importer:
             basePath = sys.path[1]
         self.ImportAbsDir(basePath+'/'+inDir)
 
+    @classmethod
+    def Record(cls, inKind, inName, inParams):
+        # Returns True if the registration should be ignored
+        if cls.recording is not None:
+            cls.recording.append((inKind, inName, inParams))
+        return cls.suppressRegistration
+
     @classmethod
     def RegisterMenuEntry(cls, inObj, inName, inParams):
+        if cls.Record('MenuEntry', inName, inParams):
+            return
         if inName not in cls.menuEntries:
             cls.menuEntries[inName] = []
 
@@ -83,6 +303,8 @@ class Importer:
 
     @classmethod
     def RegisterNamedPlugIn(cls, inObj, inName, inParams):
+        if cls.Record('NamedPlugIn', inName, inParams):
+            return
         cls.plugIns[inName] = inParams
         # Store inObj only when we need to reregister plugins
 
@@ -92,6 +314,8 @@ class Importer:
 
     @classmethod
     def RegisterResource(cls, inObj, inName, inParams):
+        if cls.Record('Resource', inName, inParams):
+            return
         cls.resources[inName] = inParams
         # Store inObj only when we need to reregister plugins
 
@@ -17,6 +17,7 @@ import sys
 
 import XenAPI  # For XenAPI.Failure
 
+from XSConsoleBases import *
 from XSConsoleConfig import *
 from XSConsoleLangErrors import *
 
@@ -56,6 +57,7 @@ class Language:
     stringHook = None
     errorHook = None
     errorLoggingHook = None
+    reflowCache = LRUCache('reflow', 512)
 
     def __init__(self):
         self.brandingMap = Config.Inst().BrandingMap()
@@ -122,7 +124,12 @@ class Language:
 
     @classmethod
     def ReflowText(cls, inText, inWidth):
-        # Return an array of string that are at most inWidth characters long
+        # Return an array of string that are at most inWidth characters long.  Panes are rebuilt
+        # on every update, so the same text is reflowed repeatedly and the results are cached
+        return list(cls.reflowCache.Lookup((inText, inWidth), lambda: tuple(cls.ReflowUncached(inText, inWidth))))
+
+    @classmethod
+    def ReflowUncached(cls, inText, inWidth): # Internal use
         retArray = []
         text = inText+" "
         while len(text) > 0:
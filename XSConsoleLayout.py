@@ -32,6 +32,8 @@ class Layout:
         self.exitCommand = None # Not layout, but keep with layout for convenience
         self.exitBanner = None # Not layout, but keep with layout for convenience
         self.exitCommandIsExec = True # Not layout, but keep with layout for convenience
+        self.fullRedraw = True
+        self.frameStats = Struct(frames = 0, lastFrameBytes = 0, totalBytes = 0, bytesAtLastFrame = 0)
 
     def AssertScreenSize(self):
         consoleXSize = self.parent.XSize()
@@ -93,7 +95,7 @@ class Layout:
         self.dialogues.pop()
         if len(self.dialogues) == 1:
             # When the display returns to the root screen, it's possible that data has changed, so
-            # delete the HotData cache to force a refetch
+            # delete the HotData cache to force a refetch.  Subscribed collections are already current
             HotData.Inst().DeleteCache()
         self.TopDialogue().UpdateFields()
         self.Refresh()
@@ -143,12 +145,24 @@ class Layout:
         self.TopDialogue().Reset()
 
     def Refresh(self):
-        self.Window(self.WIN_MAIN).Erase() # Unknown why main won't redraw without this
+        # Dialogue panes keep their last frame and send only changed cells to curses.  Everything is
+        # redrawn when windows have been created or deleted, and a dialogue that changes forces a
+        # redraw of the dialogues above it, as they may overlap
+        fullRedraw = self.fullRedraw or CursesPane.windowsChanged
+        self.fullRedraw = False
+        CursesPane.windowsChanged = False
+
+        if fullRedraw:
+            self.Window(self.WIN_MAIN).Erase() # Unknown why main won't redraw without this
         for window in self.windows:
             window.Refresh()
 
         for dialogue in self.dialogues:
+            if fullRedraw:
+                dialogue.Invalidate()
             dialogue.Render()
+            if dialogue.RenderChanged():
+                fullRedraw = True
 
         if not self.TopDialogue().NeedsCursor():
             self.TopDialogue().CursorOff()
@@ -161,8 +175,22 @@ class Layout:
     def Clear(self):
         for window in self.windows:
             window.Clear()
+        self.fullRedraw = True
         self.Refresh()
 
     def DoUpdate(self):
         curses.doupdate()
+        stats = self.frameStats
+        stats.frames += 1
+        stats.lastFrameBytes = CursesPane.bytesWritten - stats.bytesAtLastFrame
+        stats.bytesAtLastFrame = CursesPane.bytesWritten
+        stats.totalBytes += stats.lastFrameBytes
+
+    def FrameStats(self):
+        # Bytes passed to curses in the last frame and in total, for --dump and debugging
+        return {
+            'frames' : self.frameStats.frames,
+            'last_frame_bytes' : self.frameStats.lastFrameBytes,
+            'total_bytes' : self.frameStats.totalBytes
+        }
 
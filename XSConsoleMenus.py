@@ -35,6 +35,59 @@ class ChoiceDef:
     def OnAction(self):
         return self.onAction
 
+class MenuSource:
+    # Virtual list of menu choices for menus with thousands of entries, e.g. VMs in a large pool.
+    # Holds a name index of (name, handle) pairs, and creates ChoiceDefs only for the rows that are
+    # displayed or selected.  The index can be filtered by typing part of a name
+    MAX_CACHED_CHOICES = 256
+
+    def __init__(self, inEntries, inChoiceFunc, inEmptyChoiceDef):
+        # inEntries is a list of (name, handle), in display order.  inChoiceFunc(name, handle) returns a ChoiceDef
+        self.entries = inEntries
+        self.lowerNames = [ name.lower() for name, handle in inEntries ]
+        self.choiceFunc = inChoiceFunc
+        self.emptyChoiceDef = inEmptyChoiceDef
+        self.nameWidth = max([ len(name) for name, handle in inEntries ] + [ len(inEmptyChoiceDef.name) ])
+        self.filterText = ''
+        self.visible = list(range(len(inEntries))) # Indices into self.entries that match the filter
+        self.choiceDefs = {} # Index into self.entries : ChoiceDef
+
+    def FilterText(self):
+        return self.filterText
+
+    def FilterSet(self, inText):
+        text = inText.lower()
+        if text.startswith(self.filterText.lower()):
+            candidates = self.visible # Typing more characters can only narrow the previous matches
+        else:
+            candidates = range(len(self.entries))
+        self.visible = [ i for i in candidates if text in self.lowerNames[i] ]
+        self.filterText = inText
+
+    def NumChoices(self):
+        return max(1, len(self.visible)) # The empty choice is shown when nothing matches
+
+    def ChoiceName(self, inIndex):
+        if len(self.visible) == 0:
+            return self.emptyChoiceDef.name
+        return self.entries[self.visible[inIndex]][0]
+
+    def NameWidth(self):
+        return self.nameWidth
+
+    def ChoiceDef(self, inIndex):
+        if len(self.visible) == 0:
+            return self.emptyChoiceDef
+        entryIndex = self.visible[inIndex]
+        retVal = self.choiceDefs.get(entryIndex, None)
+        if retVal is None:
+            if len(self.choiceDefs) >= self.MAX_CACHED_CHOICES:
+                self.choiceDefs = {}
+            name, handle = self.entries[entryIndex]
+            retVal = self.choiceFunc(name, handle)
+            self.choiceDefs[entryIndex] = retVal
+        return retVal
+
 class Menu:
     def __init__(self, inOwner = None, inParent = None, inTitle = None, inChoiceDefs = None):
         self.owner = inOwner
@@ -43,6 +96,7 @@ class Menu:
         self.choiceDefs = FirstValue(inChoiceDefs, [])
         self.choiceIndex = 0
         self.defaultPriority=1000
+        self.source = None
         for choice in self.choiceDefs:
             if choice.priority is None:
                 choice.priority = self.defaultPriority
@@ -50,11 +104,47 @@ class Menu:
 
     def Parent(self): return self.parent
     def ParentSet(self, inParent): self.parent = inParent
-    def Title(self): return self.title
     def TitleSet(self, inTitle): self.title = inTitle
-    def ChoiceDefs(self): return self.choiceDefs
     def ChoiceIndex(self): return self.choiceIndex
-    def NumChoices(self): return len(self.choiceDefs)
+    def Source(self): return self.source
+
+    def Title(self):
+        if self.source is not None and self.source.FilterText() != '':
+            return self.title+' ['+self.source.FilterText()+']'
+        return self.title
+
+    def SourceSet(self, inSource):
+        # Replaces the choices with a MenuSource, keeping any filter that was typed
+        if self.source is not None:
+            inSource.FilterSet(self.source.FilterText())
+        self.source = inSource
+        self.choiceDefs = []
+
+    def ChoiceDefs(self):
+        # For menus with a source this creates every ChoiceDef, so use NumChoices and ChoiceDefAt instead
+        if self.source is not None:
+            return [ self.source.ChoiceDef(i) for i in range(self.source.NumChoices()) ]
+        return self.choiceDefs
+
+    def NumChoices(self):
+        if self.source is not None:
+            return self.source.NumChoices()
+        return len(self.choiceDefs)
+
+    def ChoiceDefAt(self, inIndex):
+        if self.source is not None:
+            return self.source.ChoiceDef(inIndex)
+        return self.choiceDefs[inIndex]
+
+    def ChoiceName(self, inIndex):
+        if self.source is not None:
+            return self.source.ChoiceName(inIndex)
+        return self.choiceDefs[inIndex].name
+
+    def ChoiceNameWidth(self):
+        if self.source is not None:
+            return self.source.NameWidth()
+        return max([ len(choice.name) for choice in self.choiceDefs ] + [0])
 
     def AddChoiceDef(self, inChoiceDef, inPriority = None):
         if inPriority is None:
@@ -75,33 +165,52 @@ class Menu:
     def RemoveChoices(self):
         self.choiceDefs = []
         self.defaultPriority=1000
+        self.source = None
 
     def CurrentChoiceSet(self,  inChoice):
         self.choiceIndex = inChoice
         # Also need to call HandleEnter
 
     def CurrentChoiceDef(self):
-        if self.choiceIndex >= len(self.choiceDefs):
-            self.choiceIndex = max(0, len(self.choiceDefs) - 1)
-        return self.choiceDefs[self.choiceIndex]
+        if self.choiceIndex >= self.NumChoices():
+            self.choiceIndex = max(0, self.NumChoices() - 1)
+        return self.ChoiceDefAt(self.choiceIndex)
 
     def HandleArrowDown(self):
         self.choiceIndex += 1
-        if self.choiceIndex >= len(self.choiceDefs):
+        if self.choiceIndex >= self.NumChoices():
             self.choiceIndex = 0
         self.HandleEnter()
         return True
 
     def HandleArrowUp(self):
         if self.choiceIndex == 0:
-            self.choiceIndex = len(self.choiceDefs) - 1
+            self.choiceIndex = self.NumChoices() - 1
         else:
             self.choiceIndex -= 1
         self.HandleEnter()
         return True
 
+    def HandleFilterKey(self, inKey):
+        # Type-ahead filtering for menus with a source.  Escape clears the filter before leaving the menu
+        filterText = self.source.FilterText()
+        if inKey == 'KEY_BACKSPACE' and filterText != '':
+            filterText = filterText[:-1]
+        elif inKey == 'KEY_ESCAPE' and filterText != '':
+            filterText = ''
+        elif len(inKey) == 1 and inKey >= ' ' and inKey < '\177':
+            filterText += inKey
+        else:
+            return False
+        self.source.FilterSet(filterText)
+        self.choiceIndex = 0
+        self.HandleEnter()
+        return True
+
     def HandleArrowLeft(self):
         if self.parent:
+            if self.source is not None:
+                self.source.FilterSet('') # Start unfiltered when the menu is next entered
             self.owner.ChangeMenu(self.parent)
             handled = True
         else:
@@ -128,7 +237,9 @@ class Menu:
 
     def HandleKey(self, inKey):
         handled = False
-        if inKey == 'KEY_DOWN':
+        if self.source is not None and self.HandleFilterKey(inKey):
+            handled = True
+        elif inKey == 'KEY_DOWN':
             handled = self.HandleArrowDown()
         elif inKey == 'KEY_UP':
             handled = self.HandleArrowUp()
@@ -140,11 +251,11 @@ class Menu:
             # Move to next menu item starting with the key pressed
             keyPressed = inKey[0].lower()
             if keyPressed >= 'a' and keyPressed <= 'z':
-                numChoices = len(self.choiceDefs)
+                numChoices = self.NumChoices()
                 nextChoice = self.choiceIndex
                 for i in range(numChoices):
                     nextChoice = (nextChoice + 1) % numChoices
-                    choiceName = self.choiceDefs[nextChoice].name
+                    choiceName = self.ChoiceName(nextChoice)
                     if len(choiceName) > 0 and choiceName[0].lower() == keyPressed:
                         self.choiceIndex = nextChoice
                         self.HandleEnter()
@@ -170,6 +281,9 @@ class RootMenu:
     def CurrentMenu(self):
         return self.menus[self.currentKey]
 
+    def CurrentKey(self):
+        return self.currentKey
+
     def CurrentMenuSet(self, inMenu):
         self.menus[self.currentKey] = inMenu
 
@@ -13,8 +13,11 @@
 # with this program; if not, write to the Free Software Foundation, Inc.,
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
-import xml.dom.minidom
+import io
+import math
 import sys
+from array import array
+import xml.etree.ElementTree
 
 from XSConsoleAuth import *
 from XSConsoleBases import *
@@ -22,18 +25,66 @@ from XSConsoleLang import *
 
 if sys.version_info[0] == 2:
     # Python 2
-    from urllib import URLopener
-
-    def urlopen(url):
-       return URLopener().open(url)
+    from httplib import HTTPConnection, HTTPException
 else:
     # Python 3
-    from urllib.request import urlopen
+    from http.client import HTTPConnection, HTTPException
+
+
+class MetricsHistory:
+    # Fixed-size ring buffers of recent metric values, one array per series, sharing a row of timestamps
+    def __init__(self, inRows):
+        self.rows = inRows
+        self.times = array('d', [0.0] * inRows)
+        self.series = {}
+        self.count = 0 # Total number of rows appended
+
+    def Append(self, inTime, inEntries, inValues):
+        slot = self.count % self.rows
+        self.times[slot] = inTime
+        updated = set()
+        for entry, value in zip(inEntries, inValues):
+            series = self.series.get(entry, None)
+            if series is None:
+                series = array('d', [float('nan')] * self.rows)
+                self.series[entry] = series
+            try:
+                series[slot] = float(value)
+            except ValueError:
+                series[slot] = float('nan')
+            updated.add(entry)
 
+        if len(updated) != len(self.series):
+            # Series missing from this row, e.g. for VMs that have stopped
+            for entry in list(self.series.keys()):
+                if entry not in updated:
+                    series = self.series[entry]
+                    series[slot] = float('nan')
+                    if all(math.isnan(value) for value in series):
+                        del self.series[entry]
+        self.count += 1
+
+    def LastTime(self):
+        if self.count == 0:
+            return None
+        return self.times[(self.count - 1) % self.rows]
+
+    def Series(self, inEntry):
+        # Returns a list of (time, value) pairs, oldest first
+        retVal = []
+        series = self.series.get(inEntry, None)
+        if series is not None:
+            for i in range(max(0, self.count - self.rows), self.count):
+                slot = i % self.rows
+                if not math.isnan(series[slot]):
+                    retVal.append( (self.times[slot], series[slot]) )
+        return retVal
 
 class HotMetrics:
     LIFETIME_SECS = 5 # The lifetime of objects in the cache before they are refetched
-    SNAPSHOT_SECS = 10 # The number of seconds of metric data to fetch
+    SNAPSHOT_SECS = 10 # The number of seconds of metric data to fetch when there is no previous fetch
+    HISTORY_ROWS = 120 # Number of rows held in the history, i.e. 10 minutes at xapi's 5 second step
+    HISTORY_SECS = 600 # Never fetch further back than this
     __instance = None
 
     @classmethod
@@ -44,121 +95,249 @@ class HotMetrics:
 
     def __init__(self):
         self.data = {}
+        self.hostMetrics = {}
+        self.vmMetrics = {}
         self.timestamp = None
+        self.accesses = 0 # Number of metric lookups, so callers can tell whether a view depends on metrics
         self.thisHostUUID = None
+        self.history = MetricsHistory(self.HISTORY_ROWS)
+        self.session = None # Long-lived xapi session, reused for every fetch
+        self.connection = None # Persistent HTTP/1.1 connection to the local xapi
+        self.counters = {
+            'fetches' : 0,
+            'logins' : 0,
+            'logins_avoided' : 0,
+            'connections' : 0,
+            'connections_reused' : 0,
+            'session_reconnects' : 0
+        }
+
+    def Counters(self):
+        return dict(self.counters)
+
+    def Accesses(self):
+        return self.accesses
 
     def LocalHostMetrics(self):
         self.UpdateMetrics()
-        retVal = {}
-        hostPrefix = r'AVERAGE:host:'+self.thisHostUUID
-        cpuRE = re.compile(hostPrefix+r':cpu[0-9]+$')
-        cpuValues = [ float(v) for k, v in self.data.items() if cpuRE.match(k) ]
-        retVal['numcpus'] = len(cpuValues)
-        if len(cpuValues) == 0:
-            retVal['cpuusage'] = None
-        else:
-            retVal['cpuusage'] = sum(cpuValues) / len(cpuValues)
+        return dict(self.hostMetrics.get(self.thisHostUUID, self.SummariseMetrics('host', {})))
 
-        try:
-            retVal['memory_total'] = float(self.data[hostPrefix +':memory_total_kib']) * 1024.0
-        except Exception as e:
-            retVal['memory_total'] = None
+    def VMMetrics(self, inUUID):
+        self.UpdateMetrics()
+        return dict(self.vmMetrics.get(inUUID, self.SummariseMetrics('vm', {})))
+
+    def AllVMMetrics(self):
+        # Metrics for every VM in the most recent fetch, as uuid : VMMetrics dictionary
+        self.UpdateMetrics()
+        return dict((uuid, dict(metrics)) for uuid, metrics in self.vmMetrics.items())
+
+    def History(self, inType, inUUID, inMetric):
+        # Recent values of one metric as (time, value) pairs, oldest first, e.g. History('vm', uuid, 'vif_0_rx')
+        self.UpdateMetrics()
+        return self.history.Series('AVERAGE:%s:%s:%s' % (inType, inUUID, inMetric))
+
+    def UpdateMetrics(self):
+        self.accesses += 1
+        timeNow = time.time()
+        if self.timestamp is None or abs(timeNow - self.timestamp) > self.LIFETIME_SECS:
+            # Refetch host metrics
+            self.data = self.FetchData()
+            self.BuildIndex()
+            self.timestamp = timeNow
+
+    def BuildIndex(self):
+        # Groups the legend entries by object in a single pass, so that per-object queries
+        # don't need to scan the whole legend
+        cpuRE = re.compile(r'cpu[0-9]+$')
+        objects = { 'host' : {}, 'vm' : {} }
+        for key, value in FirstValue(self.data, {}).items():
+            fields = key.split(':', 3) # e.g. AVERAGE:vm:<uuid>:cpu0
+            if len(fields) != 4 or fields[0] != 'AVERAGE' or fields[1] not in objects:
+                continue
+            metrics = objects[fields[1]].setdefault(fields[2], { 'cpus' : [] })
+            if cpuRE.match(fields[3]):
+                metrics['cpus'].append(float(value))
+            else:
+                metrics[fields[3]] = value
 
+        self.hostMetrics = dict((uuid, self.SummariseMetrics('host', metrics)) for uuid, metrics in objects['host'].items())
+        self.vmMetrics = dict((uuid, self.SummariseMetrics('vm', metrics)) for uuid, metrics in objects['vm'].items())
+
+    @classmethod
+    def ScaledValue(cls, inMetrics, inName, inScale):
         try:
-            retVal['memory_free'] = float(self.data[hostPrefix +':memory_free_kib']) * 1024.0
+            retVal = float(inMetrics[inName]) * inScale
         except Exception as e:
-            retVal['memory_free'] = None
-
+            retVal = None
         return retVal
 
-    def VMMetrics(self, inUUID):
-        self.UpdateMetrics()
+    @classmethod
+    def SummariseMetrics(cls, inType, inMetrics):
         retVal = {}
-        vmPrefix = r'AVERAGE:vm:' + inUUID
-
-        cpuRE = re.compile(vmPrefix+r':cpu[0-9]+$')
-        cpuValues = [ float(v) for k, v in self.data.items() if cpuRE.match(k) ]
+        cpuValues = inMetrics.get('cpus', [])
         retVal['numcpus'] = len(cpuValues)
         if len(cpuValues) == 0:
             retVal['cpuusage'] = None
         else:
             retVal['cpuusage'] = sum(cpuValues) / len(cpuValues)
 
-        try:
-            retVal['memory_total'] = float(self.data[vmPrefix +':memory']) # Not scaled
-        except Exception as e:
-            retVal['memory_total'] = None
+        if inType == 'host':
+            retVal['memory_total'] = cls.ScaledValue(inMetrics, 'memory_total_kib', 1024.0)
+            retVal['memory_free'] = cls.ScaledValue(inMetrics, 'memory_free_kib', 1024.0)
+        else:
+            retVal['memory_total'] = cls.ScaledValue(inMetrics, 'memory', 1.0) # Not scaled
+            retVal['memory_free'] = cls.ScaledValue(inMetrics, 'memory_internal_free', 1024.0) # Value is in kiB
 
-        try:
-            retVal['memory_free'] = float(self.data[vmPrefix +':memory_internal_free']) * 1024.0 # Value is in kiB
-        except Exception as e:
-            retVal['memory_free'] = None
+        # vif/vbd and other counters, as fetched
+        retVal['counters'] = dict((name, value) for name, value in inMetrics.items() if name != 'cpus')
 
         return retVal
 
-    def UpdateMetrics(self):
-        timeNow = time.time()
-        if self.timestamp is None or abs(timeNow - self.timestamp) > self.LIFETIME_SECS:
-            # Refetch host metrics
-            self.data = self.FetchData()
-            self.timestamp = timeNow
-
     def ParseXML(self, inXML):
-        xmlDoc = xml.dom.minidom.parseString(inXML)
-        metaNode = xmlDoc.getElementsByTagName('meta')[0]
-        valuesNode = xmlDoc.getElementsByTagName('data')[0]
-
-        meta = Struct()
-        # Values comments out below are currently not required
-        # for name in ('start', 'end', 'rows', 'columns'):
-        #     setattr(meta, name, int(metaNode.getElementsByTagName(name)[0].firstChild.nodeValue.strip()))
-        legendNode = metaNode.getElementsByTagName('legend')[0]
-        meta.entries = [ str(entry.firstChild.nodeValue.strip()) for entry in legendNode.getElementsByTagName('entry') ]
-
-        # Find the most recent row in the values
-        mostRecentRow = None
+        if not isinstance(inXML, bytes):
+            inXML = inXML.encode('utf-8')
+        return self.ParseStream(io.BytesIO(inXML))
+
+    def ParseStream(self, inFile, inRowHandler = None):
+        # Streaming parse of an rrd_updates document.  The legend is read once and only the most
+        # recent row is kept, so memory use depends on the legend size rather than the document size.
+        # inRowHandler(rowTime, entries, values) is called for every row
+        entries = []
+        mostRecentValues = None
         mostRecentTime = None
-        for row in valuesNode.getElementsByTagName('row'):
-            rowTime = int(row.getElementsByTagName('t')[0].firstChild.nodeValue.strip())
-            if mostRecentTime is None or mostRecentTime < rowTime:
-                mostRecentRow = row
-                mostRecentTime = rowTime
-
-        # Decode the row contents
-        if mostRecentRow is None:
-            values = []
-        else:
-            values = [ str(v.firstChild.nodeValue.strip()) for v in mostRecentRow.getElementsByTagName('v') ]
+        parent = None
+        for event, element in xml.etree.ElementTree.iterparse(inFile, events=('start', 'end')):
+            if event == 'start':
+                if element.tag in ('legend', 'data'):
+                    parent = element
+            elif element.tag == 'entry':
+                entries.append(str(element.text.strip()))
+            elif element.tag == 'row':
+                rowTime = int(element.findtext('t').strip())
+                isMostRecent = mostRecentTime is None or mostRecentTime < rowTime
+                if isMostRecent or inRowHandler is not None:
+                    values = [ str(v.text.strip()) for v in element.findall('v') ]
+                    if inRowHandler is not None:
+                        inRowHandler(rowTime, entries, values)
+                    if isMostRecent:
+                        mostRecentValues = values
+                        mostRecentTime = rowTime
+                parent.clear() # Discard rows once read
+            elif element.tag == 'legend':
+                element.clear()
 
         retVal = {}
-        for entry, value in zip(meta.entries, values):
+        for entry, value in zip(entries, FirstValue(mostRecentValues, [])):
             retVal[entry] = value
 
         return retVal
 
-    def FetchData(self):
-        retVal = None
-        session = Auth.Inst().OpenSession()
-        try:
-            sessionID = session._session
-            if self.thisHostUUID is None:
-                # Make use of this session to get the local host UUID
-                opaqueRef = session.xenapi.session.get_this_host(sessionID)
-                self.thisHostUUID = session.xenapi.host.get_uuid(opaqueRef)
+    def FetchStart(self):
+        # Ask only for rows newer than those already in the history
+        retVal = int(time.time()) - self.SNAPSHOT_SECS
+        lastTime = self.history.LastTime()
+        if lastTime is not None:
+            retVal = max(int(lastTime), int(time.time()) - self.HISTORY_SECS)
+        return retVal
 
-            httpRequest = 'http://localhost/rrd_updates?session_id=%s&start=%s&host=true' % (sessionID, int(time.time()) - self.SNAPSHOT_SECS)
+    def AddHistoryRows(self, inRows):
+        lastTime = self.history.LastTime()
+        for rowTime, entries, values in sorted(inRows, key = lambda row: row[0]):
+            if lastTime is None or rowTime > lastTime:
+                self.history.Append(rowTime, entries, values)
+                lastTime = rowTime
 
-            http_socket = urlopen(httpRequest)
+    def Session(self):
+        if self.session is None:
+            self.session = Auth.Inst().AcquireSession()
+            if self.session is None:
+                raise Exception(Lang('Unable to open a session to xapi'))
+            self.counters['logins'] += 1
+        else:
+            self.counters['logins_avoided'] += 1
+        return self.session
+
+    def Connection(self):
+        if self.connection is None:
+            self.connection = HTTPConnection('localhost')
+            self.counters['connections'] += 1
+        else:
+            self.counters['connections_reused'] += 1
+        return self.connection
+
+    def CloseSession(self):
+        if self.session is not None:
             try:
-                content = http_socket.read().decode('utf-8')
-            finally:
-                http_socket.close()
-            retVal = self.ParseXML(content)
+                Auth.Inst().CloseSession(self.session)
+            except Exception as e:
+                pass # The session may already be invalid
+            self.session = None
 
-        finally:
-            if session is not None:
-                Auth.Inst().CloseSession(session)
+    def CloseConnection(self):
+        if self.connection is not None:
+            try:
+                self.connection.close()
+            except Exception as e:
+                pass
+            self.connection = None
+
+    def Close(self):
+        self.CloseConnection()
+        self.CloseSession()
 
+    def FetchRows(self, inRows):
+        # Returns the HTTP status, or the parsed newest row if the request succeeded
+        session = self.Session()
+        sessionID = session._session
+        if self.thisHostUUID is None:
+            # Make use of this session to get the local host UUID
+            opaqueRef = session.xenapi.session.get_this_host(sessionID)
+            self.thisHostUUID = session.xenapi.host.get_uuid(opaqueRef)
+
+        connection = self.Connection()
+        connection.request('GET', '/rrd_updates?session_id=%s&start=%s&host=true' % (sessionID, self.FetchStart()))
+        response = connection.getresponse()
+        try:
+            if response.status != 200:
+                response.read()
+                retVal = response.status
+            else:
+                retVal = self.ParseStream(response, lambda rowTime, entries, values: inRows.append((rowTime, entries, values)))
+                response.read() # Consume any trailing data so that the connection can be reused
+        finally:
+            if response.will_close:
+                self.CloseConnection()
         return retVal
 
+    def FetchData(self):
+        self.counters['fetches'] += 1
+        rows = []
+        try:
+            retVal = self.FetchRows(rows)
+        except (HTTPException, socket.error) as e:
+            # The persistent connection was closed by xapi, so retry once on a new one
+            self.CloseConnection()
+            del rows[:]
+            retVal = self.FetchRows(rows)
+        except XenAPI.Failure as e:
+            if e.details[0] != 'SESSION_INVALID':
+                raise
+            self.CloseSession()
+            retVal = 403
+
+        if not isinstance(retVal, dict):
+            # Most likely the session has expired or xapi has restarted, so log in again and retry once
+            XSLog('Metrics fetch returned HTTP status '+str(retVal)+', reconnecting with a new session')
+            self.counters['session_reconnects'] += 1
+            self.CloseSession()
+            del rows[:]
+            retVal = self.FetchRows(rows)
+            if not isinstance(retVal, dict):
+                self.Close()
+                raise Exception(Lang('Metrics fetch failed with HTTP status ')+str(retVal))
 
+        self.AddHistoryRows(rows)
+        if len(rows) == 0:
+            retVal = self.data # No new rows since the last fetch, so the previous values still hold
+
+        return retVal
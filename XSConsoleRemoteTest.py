@@ -92,6 +92,10 @@ class XMLRPCRemoteTest:
     def SetApp(self, inApp):
         self.app = inApp
 
+    def FileNo(self):
+        # The main loop waits on this socket and calls Poll when it is readable
+        return self.server.fileno()
+
     def Poll(self):
         retVal = self.server.handle_request() # True if the server handled a request, False if timed out
 
@@ -278,6 +282,9 @@ class NullRemoteTest:
     def Poll(self):
         return False
 
+    def FileNo(self):
+        return None
+
     def SetApp(self, *inParams):
         pass
 
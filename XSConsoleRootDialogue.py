@@ -13,7 +13,7 @@
 # with this program; if not, write to the Free Software Foundation, Inc.,
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
-import re
+import re, time
 
 from XSConsoleAuth import *
 from XSConsoleBases import *
@@ -23,9 +23,11 @@ from XSConsoleData import *
 from XSConsoleDialoguePane import *
 from XSConsoleDialogueBases import *
 from XSConsoleFields import *
+from XSConsoleHotData import *
 from XSConsoleImporter import *
 from XSConsoleLang import *
 from XSConsoleMenus import *
+from XSConsoleMetrics import *
 
 class RootDialogue(Dialogue):
 
@@ -37,10 +39,25 @@ class RootDialogue(Dialogue):
         statusPane.ColoursSet('HELP_BASE', 'HELP_BRIGHT', None, None, None, 'HELP_FLASH')
         self.menu = Importer.BuildRootMenu(self)
         self.menuName = 'MENU_ROOT'
+        self.menuVersions = {} # Menu name : DataVersion when the menu was last regenerated
+        self.statusCache = {} # (menu name, choice index, handle) : Struct(fields, expiry)
+        self.statusCacheVersion = None
         self.UpdateFields()
 
+    def DataVersion(self):
+        # Changes whenever data shown by the menus and status panes may have changed
+        return (Data.Inst().Version(), HotData.Inst().Version(), Auth.Inst().IsAuthenticated(),
+            Auth.Inst().LoggedInUsername())
+
+    def RegenerateMenu(self, inName):
+        # Regenerating can rebuild and sort large menus, e.g. of VMs, so only do it when the data has changed
+        version = self.DataVersion()
+        if self.menuVersions.get(inName, None) != version:
+            self.menu.SetMenu(inName, Importer.RegenerateMenu(inName, self.menu.GetMenu(inName)))
+            self.menuVersions[inName] = version
+
     def UpdateFields(self):
-        self.menu.SetMenu(self.menuName, Importer.RegenerateMenu(self.menuName, self.menu.GetMenu(self.menuName)))
+        self.RegenerateMenu(self.menuName)
         currentMenu = self.menu.CurrentMenu()
         currentChoiceDef = currentMenu.CurrentChoiceDef()
 
@@ -53,27 +70,55 @@ class RootDialogue(Dialogue):
 
         statusPane = self.Pane('status')
 
-        try:
-            statusPane.ResetFields()
+        version = self.DataVersion()
+        if self.statusCacheVersion != version:
+            self.statusCache = {}
+            self.statusCacheVersion = version
+        statusKey = (self.menu.CurrentKey(), currentMenu.ChoiceIndex(), currentChoiceDef.handle)
+        cachedStatus = self.statusCache.get(statusKey, None)
+        if cachedStatus is not None and (cachedStatus.expiry is None or time.time() < cachedStatus.expiry):
+            statusPane.RestoreFields(cachedStatus.fields)
             statusPane.ResetPosition()
+        else:
+            cachedStatus = None
+            metricsAccesses = HotMetrics.Inst().Accesses()
+            fetchAccesses = HotData.Inst().FetchAccesses()
+            try:
+                statusPane.ResetFields()
+                statusPane.ResetPosition()
+
+                statusUpdateHandler = currentChoiceDef.StatusUpdateHandler()
+                if statusUpdateHandler is not None:
+                    if currentChoiceDef.handle is not None:
+                        statusUpdateHandler(statusPane, currentChoiceDef.handle)
+                    else:
+                        statusUpdateHandler(statusPane)
 
-            statusUpdateHandler = currentChoiceDef.StatusUpdateHandler()
-            if statusUpdateHandler is not None:
-                if currentChoiceDef.handle is not None:
-                    statusUpdateHandler(statusPane, currentChoiceDef.handle)
                 else:
-                    statusUpdateHandler(statusPane)
-
-            else:
-                raise Exception(Lang("Missing status handler"))
+                    raise Exception(Lang("Missing status handler"))
+
+                # Metrics, and HotData not kept current by events, change without changing DataVersion,
+                # so panes that read them are refreshed at the fetcher lifetime
+                lifetimes = []
+                if HotMetrics.Inst().Accesses() != metricsAccesses:
+                    lifetimes.append(HotMetrics.LIFETIME_SECS)
+                if HotData.Inst().FetchAccesses() != fetchAccesses or not HotData.Inst().IsSubscribed():
+                    lifetimes.append(HotData.Inst().ShortestLifetimeSecs())
+                if len(lifetimes) == 0:
+                    expiry = None
+                else:
+                    expiry = time.time() + min(lifetimes)
+                cachedStatus = Struct(fields = None, expiry = expiry)
 
-        except Exception as e:
-            statusPane.ResetFields()
-            statusPane.ResetPosition()
-            statusPane.AddTitleField(Lang("Information not available"))
-            statusPane.AddWrappedTextField(Lang(e))
+            except Exception as e:
+                statusPane.ResetFields()
+                statusPane.ResetPosition()
+                statusPane.AddTitleField(Lang("Information not available"))
+                statusPane.AddWrappedTextField(Lang(e))
 
         keyHash = { Lang("<Up/Down>") : Lang("Select") }
+        if currentMenu.Source() is not None:
+            keyHash[ Lang("<Type>") ] = Lang("Filter")
         if self.menu.CurrentMenu().Parent() != None:
             keyHash[ Lang("<Esc/Left>") ] = Lang("Back")
         else:
@@ -89,6 +134,11 @@ class RootDialogue(Dialogue):
                     Lang("<F5>") : Lang("Refresh"),
                 })
 
+        if cachedStatus is not None and cachedStatus.fields is None:
+            # Errors aren't cached, so that the handler is retried
+            cachedStatus.fields = statusPane.SaveFields()
+            self.statusCache[statusKey] = cachedStatus
+
     def HandleKey(self, inKey):
         currentMenu = self.menu.CurrentMenu()
 
@@ -110,7 +160,7 @@ class RootDialogue(Dialogue):
         return handled
 
     def ChangeMenu(self, inName):
-        self.menu.SetMenu(inName, Importer.RegenerateMenu(inName, self.menu.GetMenu(inName)))
+        self.RegenerateMenu(inName)
         self.menuName = inName
         self.menu.ChangeMenu(inName)
         self.menu.CurrentMenu().HandleEnter()
@@ -0,0 +1,228 @@
+# Copyright (c) 2007-2009 Citrix Systems Inc.
+#
+# This program is free software; you can redistribute it and/or modify
+# it under the terms of the GNU General Public License as published by
+# the Free Software Foundation; version 2 only.
+#
+# This program is distributed in the hope that it will be useful,
+# but WITHOUT ANY WARRANTY; without even the implied warranty of
+# MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+# GNU General Public License for more details.
+#
+# You should have received a copy of the GNU General Public License along
+# with this program; if not, write to the Free Software Foundation, Inc.,
+# 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
+
+import errno, fcntl, heapq, os, select, sys, threading, time
+
+from XSConsoleBases import *
+from XSConsoleLog import *
+
+if sys.version_info >= (3, 0):
+    getTimeStamp = time.monotonic
+else:
+    getTimeStamp = time.time
+
+
+class Scheduler:
+    # Timer heap and wakeup pipe for the main loop.  The main loop waits in Wait() on its file
+    # descriptors, the self-pipe and the next timer, so an idle console sleeps until there is work
+    __instance = None
+
+    @classmethod
+    def Inst(cls):
+        if cls.__instance is None:
+            cls.__instance = Scheduler()
+        return cls.__instance
+
+    def __init__(self):
+        self.heap = [] # (due time, sequence number, timer name)
+        self.timers = {} # timer name : Struct(due, interval, proc, sequence)
+        self.sequence = 0
+        self.notifyLock = threading.Lock()
+        self.notified = False
+        self.pipeRead, self.pipeWrite = os.pipe()
+        for fd in (self.pipeRead, self.pipeWrite):
+            fcntl.fcntl(fd, fcntl.F_SETFL, fcntl.fcntl(fd, fcntl.F_GETFL) | os.O_NONBLOCK)
+
+    def AddTimer(self, inName, inDelaySecs, inProc, inIntervalSecs = None):
+        # Replaces any timer with the same name.  Timers with an interval repeat until cancelled
+        self.sequence += 1
+        timer = Struct(due = getTimeStamp() + inDelaySecs, interval = inIntervalSecs, proc = inProc, sequence = self.sequence)
+        self.timers[inName] = timer
+        heapq.heappush(self.heap, (timer.due, timer.sequence, inName))
+
+    def CancelTimer(self, inName):
+        # The heap entry is left in place and skipped when it falls due
+        self.timers.pop(inName, None)
+
+    def HasTimer(self, inName):
+        return inName in self.timers
+
+    def SecondsToNextTimer(self):
+        self.DiscardCancelled()
+        if len(self.heap) == 0:
+            return None
+        return max(0.0, self.heap[0][0] - getTimeStamp())
+
+    def DiscardCancelled(self):
+        while len(self.heap) > 0:
+            due, sequence, name = self.heap[0]
+            timer = self.timers.get(name, None)
+            if timer is not None and timer.sequence == sequence:
+                break
+            heapq.heappop(self.heap)
+
+    def RunDueTimers(self):
+        timeNow = getTimeStamp()
+        self.DiscardCancelled()
+        while len(self.heap) > 0 and self.heap[0][0] <= timeNow:
+            due, sequence, name = heapq.heappop(self.heap)
+            timer = self.timers.get(name, None)
+            if timer is None or timer.sequence != sequence:
+                continue # Cancelled or replaced
+            if timer.interval is None:
+                del self.timers[name]
+            else:
+                # Schedule from the due time so that repeating timers don't drift, but skip missed runs
+                nextDue = due + timer.interval
+                if nextDue <= timeNow:
+                    nextDue = timeNow + timer.interval
+                self.sequence += 1
+                timer.due = nextDue
+                timer.sequence = self.sequence
+                heapq.heappush(self.heap, (timer.due, timer.sequence, name))
+            try:
+                timer.proc()
+            except Exception as e:
+                XSLogError('Timer '+name+' failed: ', e)
+            self.DiscardCancelled()
+
+    def Notify(self):
+        # Wakes the main loop.  Safe to call from any thread
+        self.notifyLock.acquire()
+        try:
+            if not self.notified:
+                self.notified = True
+                try:
+                    os.write(self.pipeWrite, b'x')
+                except OSError as e:
+                    if e.errno != errno.EAGAIN:
+                        raise
+        finally:
+            self.notifyLock.release()
+
+    def DrainNotifications(self):
+        # Returns True if Notify was called since the last call
+        self.notifyLock.acquire()
+        try:
+            retVal = self.notified
+            self.notified = False
+            try:
+                while len(os.read(self.pipeRead, 4096)) > 0:
+                    pass
+            except OSError as e:
+                if e.errno != errno.EAGAIN:
+                    raise
+        finally:
+            self.notifyLock.release()
+        return retVal
+
+    def Wait(self, inFDs, inMaxSecs = None):
+        # Waits for input on any of inFDs, a notification or the next timer.  Returns the list of
+        # ready file descriptors from inFDs, and runs any timers that are due
+        timeout = self.SecondsToNextTimer()
+        if inMaxSecs is not None:
+            timeout = inMaxSecs if timeout is None else min(timeout, inMaxSecs)
+        fds = [ fd for fd in inFDs if fd is not None ]
+        try:
+            readyFDs = select.select(fds + [self.pipeRead], [], [], timeout)[0]
+        except select.error as e:
+            readyFDs = [] # Interrupted by a signal, e.g. SIGWINCH
+        retVal = [ fd for fd in readyFDs if fd != self.pipeRead ]
+        self.RunDueTimers()
+        return retVal
+
+class RefreshWorker:
+    # Runs refresh jobs, e.g. rebuilding Data, on a background thread so that the main loop never
+    # waits for xapi.  Requests for a job that is already queued are merged.  Completion handlers
+    # run on the main thread, from RunCompletions, after the worker wakes the main loop
+    __instance = None
+
+    @classmethod
+    def Inst(cls):
+        if cls.__instance is None:
+            cls.__instance = RefreshWorker()
+        return cls.__instance
+
+    def __init__(self):
+        self.condition = threading.Condition()
+        self.queue = [] # Names of queued jobs, in order
+        self.jobs = {} # Queued job name : Struct(proc, completions)
+        self.running = None # Name of the job being run
+        self.completions = [] # Handlers waiting to run on the main thread
+        self.thread = None
+
+    def Request(self, inName, inProc, inOnComplete = None):
+        self.condition.acquire()
+        try:
+            job = self.jobs.get(inName, None)
+            if job is None:
+                job = Struct(proc = inProc, completions = [])
+                self.jobs[inName] = job
+                self.queue.append(inName)
+            if inOnComplete is not None:
+                job.completions.append(inOnComplete)
+            if self.thread is None:
+                self.thread = threading.Thread(target = self.WorkLoop, name = 'RefreshWorker')
+                self.thread.daemon = True
+                self.thread.start()
+            self.condition.notify()
+        finally:
+            self.condition.release()
+
+    def IsBusy(self):
+        return self.running is not None or len(self.queue) > 0
+
+    def IsPending(self, inName):
+        return self.running == inName or inName in self.jobs
+
+    def WorkLoop(self):
+        while True:
+            self.condition.acquire()
+            try:
+                while len(self.queue) == 0:
+                    self.condition.wait()
+                name = self.queue.pop(0)
+                job = self.jobs.pop(name)
+                self.running = name
+            finally:
+                self.condition.release()
+
+            try:
+                job.proc()
+            except Exception as e:
+                XSLogError('Background refresh '+name+' failed: ', e)
+
+            self.condition.acquire()
+            try:
+                self.running = None
+                self.completions += job.completions
+            finally:
+                self.condition.release()
+            Scheduler.Inst().Notify()
+
+    def RunCompletions(self):
+        # Call from the main thread
+        self.condition.acquire()
+        try:
+            completions = self.completions
+            self.completions = []
+        finally:
+            self.condition.release()
+
+        for completion in completions:
+            try:
+                completion()
+            except Exception as e:
+                XSLogError('Background refresh completion failed: ', e)
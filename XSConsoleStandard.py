@@ -23,6 +23,7 @@ from XSConsoleData import *
 from XSConsoleDataUtils import *
 from XSConsoleDialogueBases import *
 from XSConsoleDialoguePane import *
+from XSConsoleExecutor import *
 from XSConsoleFields import *
 from XSConsoleHotData import *
 from XSConsoleImporter import *
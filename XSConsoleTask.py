@@ -17,6 +17,8 @@ from XSConsoleAuth import *
 from XSConsoleBases import *
 from XSConsoleHotData import *
 
+import threading
+
 class TaskEntry:
     def __init__(self, inHotOpaqueRef, inSession):
         self.hotOpaqueRef = inHotOpaqueRef
@@ -36,23 +38,31 @@ class TaskEntry:
         self.completed = True
         self.completionStatus = inStatus
 
-        self.creationTime = TimeUtils.DateTimeToSecs(self.session.xenapi.task.get_created(self.hotOpaqueRef.OpaqueRef()))
-        self.finishTime = TimeUtils.DateTimeToSecs(self.session.xenapi.task.get_finished(self.hotOpaqueRef.OpaqueRef()))
+        self.creationTime = TimeUtils.DateTimeToSecs(self.Field('created'))
+        self.finishTime = TimeUtils.DateTimeToSecs(self.Field('finished'))
         if inStatus.startswith('success'):
-            result = self.session.xenapi.task.get_result(self.hotOpaqueRef.OpaqueRef())
+            result = self.Field('result')
             result = result.replace("<value>", "").replace("</value>", "")
             self.result = HotOpaqueRef(result, 'any')
         if inStatus.startswith('failure'):
-            self.errorInfo = self.session.xenapi.task.get_error_info(self.hotOpaqueRef.OpaqueRef())
+            self.errorInfo = self.Field('error_info')
 
-        Auth.Inst().CloseSession(self.session)
-        self.session = None
+        self.session = Auth.Inst().ReleaseSession(self.session)
+
+    def Field(self, inName):
+        # Use the task record streamed by Task's event watcher if present, otherwise ask xapi
+        record = Task.Inst().TaskRecord(self.hotOpaqueRef)
+        if record is not None and inName in record:
+            retVal = record[inName]
+        else:
+            retVal = getattr(self.session.xenapi.task, 'get_'+inName)(self.hotOpaqueRef.OpaqueRef())
+        return retVal
 
     def Status(self):
         if self.Completed():
             status = self.completionStatus
         else:
-            status = self.session.xenapi.task.get_status(self.hotOpaqueRef.OpaqueRef())
+            status = self.Field('status')
             if not status.startswith('pending'):
                 self.HandleCompletion(status)
         return status
@@ -64,7 +74,7 @@ class TaskEntry:
         if self.Completed():
             retVal = False
         else:
-            allowedOps = self.session.xenapi.task.get_allowed_operations(self.hotOpaqueRef.OpaqueRef())
+            allowedOps = self.Field('allowed_operations')
             retVal = ('cancel' in allowedOps)
 
         return retVal
@@ -101,9 +111,17 @@ class TaskEntry:
         if self.Completed():
             retVal = 1.0
         else:
-            retVal = self.session.xenapi.task.get_progress(self.hotOpaqueRef.OpaqueRef())
+            retVal = self.Field('progress')
         return retVal
 
+    def Wait(self):
+        # Block until the task is no longer pending.  Wakes on task events rather than polling xapi
+        while True:
+            generation = Task.Inst().Generation()
+            if not self.IsPending():
+                break
+            Task.Inst().WaitForChange(generation)
+
     def DurationSecs(self):
         if self.creationTime is not None and self.finishTime is not None:
             retVal = self.finishTime - self.creationTime
@@ -117,9 +135,18 @@ class TaskEntry:
 
 class Task:
     instance = None
+    EVENT_TIMEOUT_SECS = 5.0
+    WAIT_SECS = 5.0 # Maximum wait for an event before rechecking, in case one is missed
+    POLL_SECS = 0.1 # Wait between polls when the event watcher isn't running
+
     def __init__(self):
         self.taskList = {}
         self.syncSession = None
+        self.records = {} # Streamed task records for tasks in taskList
+        self.generation = 0 # Incremented whenever records change
+        self.condition = threading.Condition()
+        self.watchThread = None
+        self.watching = False
 
     @classmethod
     def Inst(cls):
@@ -130,20 +157,110 @@ class Task:
     def Create(self, inProc):
         session = None
         try:
-            session = Auth.Inst().NewSession()
+            session = Auth.Inst().AcquireSession()
             taskRef = inProc(session)
         except:
-            if session is not None:
-                Auth.Inst().CloseSession(session)
+            Auth.Inst().ReleaseSession(session, sys.exc_info()[1])
             raise
 
         hotTaskRef = HotOpaqueRef(taskRef, 'task')
         taskEntry = TaskEntry(hotTaskRef, session)
         self.taskList[hotTaskRef] = taskEntry
+        self.StartWatching()
         return taskEntry
 
+    def StartWatching(self):
+        # One event.from stream on the task class serves every outstanding task
+        self.condition.acquire()
+        try:
+            if self.watchThread is None:
+                self.watchThread = threading.Thread(target = self.WatchLoop, name = 'TaskWatch')
+                self.watchThread.daemon = True
+                self.watching = True
+                self.watchThread.start()
+        finally:
+            self.condition.release()
+
+    def HasPendingTasks(self):
+        for ref, taskEntry in list(self.taskList.items()):
+            if not taskEntry.Completed():
+                record = self.records.get(ref, None)
+                if record is None or record.get('status', '').lower() in ('pending', 'cancelling'):
+                    return True
+        return False
+
+    def WatchLoop(self):
+        session = None
+        token = ''
+        finished = False
+        try:
+            try:
+                session = Auth.Inst().AcquireSession()
+                if session is None:
+                    raise Exception('Could not open a session for task events')
+                eventFrom = getattr(session.xenapi.event, 'from')
+                while self.HasPendingTasks():
+                    result = eventFrom(['task'], token, self.EVENT_TIMEOUT_SECS)
+                    self.ApplyEvents(result['events'])
+                    token = result['token']
+                session = Auth.Inst().ReleaseSession(session)
+                finished = True
+            except Exception as e:
+                XSLogError('Task event watcher failed - falling back to polling: ', e)
+                if session is not None:
+                    Auth.Inst().CloseSession(session)
+        finally:
+            self.condition.acquire()
+            try:
+                if not finished:
+                    # Streamed records would go stale, so TaskEntry.Field must ask xapi until a new watcher starts
+                    self.records = {}
+                self.watchThread = None
+                self.watching = False
+                self.generation += 1
+                self.condition.notify_all()
+            finally:
+                self.condition.release()
+
+        if finished and self.HasPendingTasks():
+            self.StartWatching() # A task was created as the watcher finished
+
+    def ApplyEvents(self, inEvents):
+        self.condition.acquire()
+        try:
+            for event in inEvents:
+                ref = HotOpaqueRef(event['ref'], 'task')
+                if ref not in self.taskList:
+                    continue # Not one of ours
+                if event['operation'] == 'del':
+                    self.records.pop(ref, None)
+                else:
+                    self.records[ref] = event['snapshot']
+            self.generation += 1
+            self.condition.notify_all()
+        finally:
+            self.condition.release()
+        Scheduler.Inst().Notify() # Progress dialogues update from the new records
+
+    def TaskRecord(self, inHotOpaqueRef):
+        return self.records.get(inHotOpaqueRef, None)
+
+    def Generation(self):
+        return self.generation
+
+    def WaitForChange(self, inGeneration):
+        self.condition.acquire()
+        try:
+            if self.generation == inGeneration:
+                if self.watching:
+                    self.condition.wait(self.WAIT_SECS)
+                else:
+                    self.condition.wait(self.POLL_SECS)
+        finally:
+            self.condition.release()
+
     def GarbageCollect(self):
-        # This may be expensive as it must fetch status from xapi for each incomplete task
+        # Status comes from the task event stream where possible, otherwise from xapi
         deleteKeys = []
         for key, value in self.taskList.items():
             # Forget tasks that have of duration of greater than one day
@@ -153,10 +270,11 @@ class Task:
 
         for key in deleteKeys:
             del self.taskList[key]
+            self.records.pop(key, None)
 
     def SyncSession(self):
         if self.syncSession is None:
-            self.syncSession = Auth.Inst().NewSession()
+            self.syncSession = Auth.Inst().AcquireSession()
         return self.syncSession
 
     def SyncOperation(self, inProc):
@@ -20,6 +20,7 @@ from XSConsoleAuth import *
 from XSConsoleBases import *
 from XSConsoleCurses import *
 from XSConsoleData import *
+from XSConsoleDataUtils import *
 from XSConsoleHotData import *
 from XSConsoleImporter import *
 from XSConsoleMenus import *
@@ -28,6 +29,7 @@ from XSConsoleLayout import *
 from XSConsoleLog import *
 from XSConsoleRemoteTest import *
 from XSConsoleRootDialogue import *
+from XSConsoleScheduler import *
 from XSConsoleState import *
 
 
@@ -79,10 +81,16 @@ class App:
                 except: pass # Not all VMs  have guest metrics
                 HotAccessor().pool()
             HotData.Inst().Dump()
+            LRUCache.Dump()
             doQuit = True
 
         RemoteTest.Inst().SetApp(self)
 
+        # Keep the HotData collections current from xapi events rather than refetching them, and the
+        # removable device list current from udev events
+        HotData.Inst().Subscribe()
+        DeviceInventory.Inst().Start()
+
         # Reinstate keymap
         if State.Inst().Keymap() is not None:
             Data.Inst().KeymapSet(State.Inst().Keymap())
@@ -143,7 +151,7 @@ class App:
                             # Does not return
                         else:
                             os.system(self.layout.ExitCommand())
-                            Data.Inst().Update() # Pick up changes caused by the subshell command
+                            Data.Inst().RequestUpdate() # Pick up changes caused by the subshell command
 
             except KeyboardInterrupt as e: # Catch Ctrl-C
                 XSLog('Resetting due to Ctrl-C')
@@ -174,11 +182,11 @@ class App:
             self.layout.TopDialogue().Reset()
             self.needsRefresh = True
         elif inKeypress == 'KEY_F(5)':
-            Data.Inst().Update()
-            self.layout.UpdateRootFields()
-            self.needsRefresh = True
+            Data.Inst().RequestUpdate(self.HandleDataRefreshed)
+            self.needsRefresh = True # Show the refreshing indicator
         elif inKeypress == '\014': # Ctrl-L
             Layout.Inst().Clear() # Full redraw
+            self.renderer.Invalidate()
             self.needsRefresh = True
         else:
             handled = False
@@ -186,124 +194,162 @@ class App:
         return handled
 
     def MainLoop(self):
-        doQuit= False
-        startSeconds = getTimeStamp()
-        lastDataUpdateSeconds = startSeconds
-        lastScreenUpdateSeconds = startSeconds
-        lastGarbageCollectSeconds = startSeconds
-        self.lastWakeSeconds = startSeconds
-        resized = False
-        data = Data.Inst()
-        errorCount = 0
+        self.doQuit = False
+        self.lastWakeSeconds = getTimeStamp()
+        self.resized = False
+        self.errorCount = 0
+        scheduler = Scheduler.Inst()
+        window = self.layout.Window(Layout.WIN_MAIN)
+        stdinFD = sys.stdin.fileno()
+        remoteFD = RemoteTest.Inst().FileNo()
+
+        # Periodic work runs from the timer heap rather than on every wake
+        scheduler.AddTimer('data_update', 4, self.HandleDataUpdateTimer, 4)
+        scheduler.AddTimer('root_fields', 4, self.HandleRootFieldsTimer, 4)
+        scheduler.AddTimer('live_update', 1, self.HandleLiveUpdateTimer, 1)
+        scheduler.AddTimer('garbage_collect', 60, lambda: Task.Inst().GarbageCollect(), 60)
+        self.HandleClockTimer()
 
         self.layout.DoUpdate()
-        while not doQuit:
-            self.needsRefresh = False
-            gotTestCommand = RemoteTest.Inst().Poll()
-            secondsNow = getTimeStamp()
-            try:
-                if gotTestCommand:
-                    gotKey = None # Prevent delay whilst waiting for a keypress
-                elif secondsNow - self.lastWakeSeconds > State.Inst().SleepSeconds():
-                    gotKey = None
-                    Layout.Inst().PushDialogue(BannerDialogue(Lang("Press any key to access this console")))
-                    Layout.Inst().Refresh()
-                    Layout.Inst().DoUpdate()
-                    XSLog('Entering sleep due to inactivity - xsconsole is now blocked waiting for a keypress')
-                    self.layout.Window(Layout.WIN_MAIN).GetKeyBlocking()
-                    XSLog('Exiting sleep')
-                    self.lastWakeSeconds = getTimeStamp()
-                    self.needsRefresh = True
-                    Layout.Inst().PopDialogue()
-                else:
-                    gotKey = self.layout.Window(Layout.WIN_MAIN).GetKey()
-
-            except Exception as e:
-                gotKey = None # Catch timeout
-
-            if gotKey == "\011": gotKey = "KEY_TAB"
-            if gotKey == "\012": gotKey = "KEY_ENTER"
-            if gotKey == "\033": gotKey = "KEY_ESCAPE"
-            if gotKey == "\177": gotKey = "KEY_BACKSPACE"
-            if gotKey == '\xc2': gotKey = "KEY_F(5)" # Handle function key mistranslation on vncterm
-            if gotKey == '\xc5': gotKey = "KEY_F(8)" # Handle function key mistranslation on vncterm
-
-            if gotKey == 'KEY_RESIZE':
-                XSLog('Activity on another console')
-                resized = True
-            elif resized and gotKey is not None:
-                if os.path.isfile("/bin/setfont"): os.system("/bin/setfont") # Restore the default font
-                resized = False
-
-            # Screen out non-ASCII and unusual characters
-            for char in FirstValue(gotKey, ''):
-                if char >="\177": # Characters 128 and greater
-                    gotKey = None
-                    break
-
-            secondsNow = getTimeStamp()
-            secondsRunning = secondsNow - startSeconds
-
-            if data.host.address('') == '' or len(data.derived.managementpifs([])) == 0:
-                # If the host doesn't yet have an IP or doesn't have any
-                # management PIFs yet, reload data occasionally to pick up
-                # DHCP updates
-                if secondsNow - lastDataUpdateSeconds >= 4:
-                    lastDataUpdateSeconds = secondsNow
-                    data.Update()
-                    self.layout.UpdateRootFields()
-                    self.needsRefresh = True
-
-            if secondsNow - lastScreenUpdateSeconds >= 4:
-                lastScreenUpdateSeconds = secondsNow
-                self.layout.UpdateRootFields()
-                self.needsRefresh = True
-
-            if gotKey is not None:
-                try:
-                    self.HandleKeypress(gotKey)
-
-                except Exception as e:
-                    if Auth.Inst().IsTestMode():
-                        raise
-                    message = Lang(e) # Also logs the error
-                    if errorCount <= 10:
-                        if errorCount == 10:
-                            message += Lang('\n\n(No more errors will be reported)')
-                        errorCount += 1
-                        Layout.Inst().PushDialogue(InfoDialogue(Lang("Error"), message))
-
-            if self.layout.ExitCommand() is not None:
-                doQuit = True
-
-            brand = Language.Inst().Branding(data.derived.brand())
-            version = data.derived.shortversion()
+        try:
+            while not self.doQuit:
+                self.needsRefresh = False
+                self.liveUpdate = False
+                readyFDs = scheduler.Wait([stdinFD, remoteFD])
+
+                if scheduler.DrainNotifications():
+                    # A background thread has new data, e.g. from xapi events or the refresh worker
+                    self.liveUpdate = True
+                    self.statusDue = True
+                    RefreshWorker.Inst().RunCompletions()
+
+                if remoteFD in readyFDs:
+                    RemoteTest.Inst().Poll()
+
+                if stdinFD in readyFDs:
+                    # Handle every key that curses has buffered, not just the first
+                    while not self.doQuit:
+                        try:
+                            gotKey = window.GetKeyNonBlocking()
+                        except Exception as e:
+                            break # No more keys waiting
+                        self.ProcessKey(gotKey)
+                    self.statusDue = True # Keys can log in or out, or start a refresh
+
+                if getTimeStamp() - self.lastWakeSeconds > State.Inst().SleepSeconds():
+                    self.Sleep()
+
+                if self.layout.ExitCommand() is not None:
+                    self.doQuit = True
+
+                if self.statusDue:
+                    self.RenderStatusLine()
+
+                if self.needsRefresh:
+                    self.layout.Refresh()
+                elif self.liveUpdate and self.layout.LiveUpdateFields():
+                    self.layout.Refresh()
+
+                self.layout.DoUpdate()
+        finally:
+            for name in ('data_update', 'root_fields', 'live_update', 'garbage_collect', 'clock'):
+                scheduler.CancelTimer(name)
+            Executor.Inst().CancelAll() # The dialogues showing them have gone, including after Ctrl-C
+
+    def Sleep(self):
+        Layout.Inst().PushDialogue(BannerDialogue(Lang("Press any key to access this console")))
+        Layout.Inst().Refresh()
+        Layout.Inst().DoUpdate()
+        XSLog('Entering sleep due to inactivity - xsconsole is now blocked waiting for a keypress')
+        try:
+            self.layout.Window(Layout.WIN_MAIN).GetKeyBlocking()
+        except Exception as e:
+            pass
+        XSLog('Exiting sleep')
+        self.lastWakeSeconds = getTimeStamp()
+        self.needsRefresh = True
+        Layout.Inst().PopDialogue()
 
-            bannerStr = brand + ' ' + version
+    def HandleDataUpdateTimer(self):
+        data = Data.Inst()
+        if data.host.address('') == '' or len(data.derived.managementpifs([])) == 0:
+            # If the host doesn't yet have an IP or doesn't have any
+            # management PIFs yet, reload data occasionally to pick up
+            # DHCP updates
+            if not data.IsRefreshing():
+                data.RequestUpdate(self.HandleDataRefreshed)
+
+    def HandleDataRefreshed(self):
+        self.layout.UpdateRootFields()
+        self.needsRefresh = True
 
-            if Auth.Inst().IsAuthenticated():
-                hostStr = Auth.Inst().LoggedInUsername()+'@'+data.host.hostname('')
-            else:
-                hostStr = data.host.hostname('')
+    def HandleRootFieldsTimer(self):
+        self.layout.UpdateRootFields()
+        self.needsRefresh = True
 
-            # Testing
-            # if gotKey is not None:
-            #     bannerStr = gotKey
+    def HandleLiveUpdateTimer(self):
+        self.liveUpdate = True
+
+    def HandleClockTimer(self):
+        # Runs just after each second boundary, so that the clock in the status line ticks evenly
+        self.statusDue = True
+        Scheduler.Inst().AddTimer('clock', 1.001 - time.time() % 1.0, self.HandleClockTimer)
+
+    def ProcessKey(self, inKey):
+        gotKey = inKey
+        if gotKey == "\011": gotKey = "KEY_TAB"
+        if gotKey == "\012": gotKey = "KEY_ENTER"
+        if gotKey == "\033": gotKey = "KEY_ESCAPE"
+        if gotKey == "\177": gotKey = "KEY_BACKSPACE"
+        if gotKey == '\xc2': gotKey = "KEY_F(5)" # Handle function key mistranslation on vncterm
+        if gotKey == '\xc5': gotKey = "KEY_F(8)" # Handle function key mistranslation on vncterm
+
+        if gotKey == 'KEY_RESIZE':
+            XSLog('Activity on another console')
+            self.resized = True
+        elif self.resized and gotKey is not None:
+            if os.path.isfile("/bin/setfont"): os.system("/bin/setfont") # Restore the default font
+            self.resized = False
+
+        # Screen out non-ASCII and unusual characters
+        for char in FirstValue(gotKey, ''):
+            if char >="\177": # Characters 128 and greater
+                gotKey = None
+                break
+
+        if gotKey is not None:
+            try:
+                self.HandleKeypress(gotKey)
 
-            timeStr = time.strftime(" %H:%M:%S %Z [UTC%z] ", time.localtime())
-            statusLine = ("%-25s%28.28s%27.27s" % (bannerStr[:25], timeStr[:28], hostStr[:27]))
-            self.renderer.RenderStatus(self.layout.Window(Layout.WIN_TOPLINE), statusLine)
+            except Exception as e:
+                if Auth.Inst().IsTestMode():
+                    raise
+                message = Lang(e) # Also logs the error
+                if self.errorCount <= 10:
+                    if self.errorCount == 10:
+                        message += Lang('\n\n(No more errors will be reported)')
+                    self.errorCount += 1
+                    Layout.Inst().PushDialogue(InfoDialogue(Lang("Error"), message))
+
+    def RenderStatusLine(self):
+        self.statusDue = False
+        data = Data.Inst()
+        brand = Language.Inst().Branding(data.derived.brand())
+        version = data.derived.shortversion()
 
-            if self.needsRefresh:
-                self.layout.Refresh()
-            elif self.layout.LiveUpdateFields():
-                self.layout.Refresh()
+        bannerStr = brand + ' ' + version
 
-            self.layout.DoUpdate()
+        if Auth.Inst().IsAuthenticated():
+            hostStr = Auth.Inst().LoggedInUsername()+'@'+data.host.hostname('')
+        else:
+            hostStr = data.host.hostname('')
 
-            if secondsNow - lastGarbageCollectSeconds >= 60:
-                lastGarbageCollectSeconds = secondsNow
-                Task.Inst().GarbageCollect()
+        if RefreshWorker.Inst().IsBusy():
+            timeStr = time.strftime(" %H:%M:%S ", time.localtime()) + Lang('Refreshing...')
+        else:
+            timeStr = time.strftime(" %H:%M:%S %Z [UTC%z] ", time.localtime())
+        statusLine = ("%-25s%28.28s%27.27s" % (bannerStr[:25], timeStr[:28], hostStr[:27]))
+        self.renderer.RenderStatus(self.layout.Window(Layout.WIN_TOPLINE), statusLine)
 
     @classmethod
     def TransientBannerHandler(self, inMessage):
@@ -314,7 +360,17 @@ class App:
         layout.PopDialogue()
 
 class Renderer:
+    def __init__(self):
+        self.lastStatus = None
+
+    def Invalidate(self):
+        # The screen has been cleared, so redraw the status line next time
+        self.lastStatus = None
+
     def RenderStatus(self, inWindow, inText):
+        if inText == self.lastStatus:
+            return # Unchanged, so avoid the erase and redraw
+        self.lastStatus = inText
         (cursY, cursX) = curses.getsyx() # Store cursor position
         inWindow.Win().erase()
         inWindow.AddText(inText, 0, 0)
@@ -13,12 +13,14 @@
 # with this program; if not, write to the Free Software Foundation, Inc.,
 # 51 Franklin Street, Fifth Floor, Boston, MA 02110-1301 USA.
 
-import re, signal, string, subprocess, time, types
+import os, re, select, socket, string, struct, subprocess, threading, time, types
 from pprint import pprint
 
 from XSConsoleBases import *
 from XSConsoleConstants import *
+from XSConsoleExecutor import *
 from XSConsoleLang import *
+from XSConsoleLog import *
 
 # Utils that need to access Data must go in XSConsoleDataUtils,
 # and XSConsoleData can't use anything in XSConsoleDataUtils without creating
@@ -45,6 +47,8 @@ from XSConsoleLang import *
 # Note: ShellPipe does not use /bin/sh so sh-like features are not available
 
 class ShellPipe:
+    # Compatibility wrapper around ExecutorJob.  The command starts when the ShellPipe is created, and
+    # the caller waits for it when collecting the output.  Use ExecutorJob directly to avoid waiting
     def __init__(self, *inParams):
         self._NewPipe(*inParams)
         self.stdout = []
@@ -57,12 +61,9 @@ class ShellPipe:
         else:
             params = inParams
 
-        self.pipe = subprocess.Popen(params,
-            stdin=subprocess.PIPE,
-            stdout=subprocess.PIPE,
-            stderr=subprocess.PIPE,
-            universal_newlines=True,
-            close_fds=True)
+        if not isinstance(params, (list, tuple)):
+            params = [params] # A single command with no parameters
+        self.job = Executor.Inst().RunNow(ExecutorJob(list(params), inStdin = True))
         self.called = False
 
     def Stdout(self):
@@ -84,28 +85,20 @@ class ShellPipe:
         if self.called:
             raise Exception("ShellPipe called more than once")
         self.called = True
-        while True:
-            try:
-                if isinstance(inInput, (list, tuple)):
-                    stdout, stderr = self.pipe.communicate("\n".join(inInput))
-                else:
-                    stdout, stderr = self.pipe.communicate(inInput)
-
-                self.stdout += stdout.splitlines()
-                self.stderr += stderr.splitlines()
-                break
-            except IOError as e:
-                if e.errno != errno.EINTR: # Loop if EINTR
-                    raise
-            # Other exceptions propagate to the caller
+        self.job.Input(inInput)
+        self.job.Wait()
+        if self.job.error is not None:
+            raise self.job.error
+        self.stdout += self.job.Stdout()
+        self.stderr += self.job.Stderr()
 
     def CallRC(self, inInput = None): # Raise exception or return the return code
         self.Communicate(inInput)
-        return self.pipe.returncode
+        return self.job.returnCode
 
     def Call(self, inInput = None): # Raise exception on failure
         self.Communicate(inInput)
-        if self.pipe.returncode != 0:
+        if self.job.returnCode != 0:
             if len(self.stderr) > 0:
                 raise Exception("\n".join(self.stderr))
             if len(self.stdout) > 0:
@@ -149,23 +142,176 @@ class ShellUtils:
                 if e.errno != errno.EINTR: # Loop if EINTR
                     raise
 
+class ShellProbes:
+    # Runs shell commands concurrently, each with its own timeout.  Results are (status, output) pairs
+    # as returned by getstatusoutput, with status None if the command timed out or could not be started
+    def __init__(self):
+        self.probes = []
+
+    def Add(self, inName, inCommand, inTimeoutSecs):
+        self.probes.append(Struct(name = inName, job = ExecutorJob(inCommand, inTimeoutSecs, inShell = True, inMergeStderr = True)))
+
+    def Run(self):
+        retVal = {}
+        for probe in self.probes:
+            try:
+                Executor.Inst().RunNow(probe.job)
+            except Exception as e:
+                retVal[probe.name] = (None, str(e))
+
+        for probe in self.probes:
+            if probe.name not in retVal:
+                probe.job.Wait()
+                retVal[probe.name] = probe.job.StatusOutput()
+        return retVal
+
+class ConfigFileReader:
+    # Reads small configuration files directly rather than through /bin/cat.  Each file's lines are kept
+    # with its (st_mtime, st_ino, st_size), and the file is read again only when those change
+    instance = None
+
+    @classmethod
+    def Inst(cls):
+        if cls.instance is None:
+            cls.instance = ConfigFileReader()
+        return cls.instance
+
+    def __init__(self):
+        self.files = {}
+        self.reads = 0
+
+    @classmethod
+    def StatKey(cls, inPath):
+        try:
+            fileStat = os.stat(inPath)
+        except OSError:
+            return None
+        return (fileStat.st_mtime, fileStat.st_ino, fileStat.st_size)
+
+    def Read(self, inPath):
+        # Returns (statKey, lines), or (None, None) if the file can't be read.  Lines are split as
+        # getstatusoutput('/bin/cat ...') would split them.  The list is shared, so callers must not modify it
+        statKey = self.StatKey(inPath)
+        if statKey is None:
+            return (None, None)
+        cached = self.files.get(inPath, None)
+        if cached is not None and cached[0] == statKey:
+            return cached
+        try:
+            configFile = open(inPath)
+            try:
+                contents = configFile.read()
+            finally:
+                configFile.close()
+        except IOError:
+            return (None, None)
+        self.reads += 1
+        if contents.endswith('\n'):
+            contents = contents[:-1]
+        retVal = (statKey, contents.split('\n'))
+        self.files[inPath] = retVal # Single assignment, as the refresh worker thread also reads files
+        return retVal
+
+class ServiceStates:
+    # Enablement and activity of the systemd units that xsconsole reports on, fetched for every unit
+    # with one 'systemctl show' call.  Kept until an operation that changes service state invalidates
+    # them, or for LIFETIME_SECS so that changes made outside xsconsole are also seen
+    LIFETIME_SECS = 60.0
+    # States for which 'systemctl is-enabled' and 'systemctl is-active' succeed
+    ENABLED_STATES = ['enabled', 'enabled-runtime', 'alias', 'static', 'indirect', 'generated', 'transient']
+    ACTIVE_STATES = ['active', 'reloading', 'refreshing']
+    instance = None
+
+    @classmethod
+    def Inst(cls):
+        if cls.instance is None:
+            cls.instance = ServiceStates()
+        return cls.instance
+
+    def __init__(self):
+        self.units = ['sshd', 'chronyd']
+        self.states = None
+        self.fetchTime = 0.0
+        self.generation = 0 # Incremented by Invalidate, so that a fetch overtaken by a change is discarded
+        self.fetches = 0
+
+    def Invalidate(self):
+        self.generation += 1
+        self.states = None
+
+    def Fetch(self):
+        generation = self.generation
+        units = list(self.units)
+        retVal = dict((unit, Struct(enabled = False, active = False)) for unit in units)
+        try:
+            pipe = ShellPipe(['systemctl', 'show', '--property=UnitFileState,ActiveState', '--'] + units)
+            if pipe.CallRC() == 0:
+                # One block of properties per unit, in the order given and separated by blank lines
+                unitIndex = 0
+                inBlock = False
+                for line in pipe.Stdout():
+                    if line == '':
+                        if inBlock:
+                            unitIndex += 1
+                            inBlock = False
+                    elif unitIndex < len(units):
+                        inBlock = True
+                        name, value = (line.split('=', 1) + [''])[:2]
+                        if name == 'UnitFileState':
+                            retVal[units[unitIndex]].enabled = value in self.ENABLED_STATES
+                        elif name == 'ActiveState':
+                            retVal[units[unitIndex]].active = value in self.ACTIVE_STATES
+        except Exception as e:
+            XSLogError('Service states could not be read: ', e)
+        self.fetches += 1
+        if generation == self.generation:
+            self.states = retVal
+            self.fetchTime = time.time()
+        return retVal
+
+    def State(self, inUnit):
+        # Returns a Struct with booleans enabled and active
+        if inUnit not in self.units:
+            self.units.append(inUnit)
+            self.Invalidate()
+        states = self.states
+        if states is None or inUnit not in states or time.time() - self.fetchTime > self.LIFETIME_SECS:
+            states = self.Fetch()
+        return states[inUnit]
+
+    def Control(self, inVerb, inUnit):
+        # Runs e.g. 'systemctl enable sshd', raising an exception containing the output on failure
+        pipe = ShellPipe('systemctl', inVerb, inUnit)
+        try:
+            if pipe.CallRC() != 0:
+                raise Exception("\n".join(pipe.AllOutput()))
+        finally:
+            self.Invalidate()
+
 class TimeException(Exception):
     pass
 
 class TimeUtils:
-    @staticmethod
-    def AlarmHandler(inSigNum, inStackFrame):
-        raise TimeException("Operation timed out")
-
     @classmethod
     def TimeoutWrapper(cls, inCallable, inTimeout):
-        oldHandler = signal.signal(signal.SIGALRM, TimeUtils.AlarmHandler)
-        signal.alarm(inTimeout)
-        try:
-            inCallable()
-        finally:
-            signal.alarm(0)
-            signal.signal(signal.SIGALRM, oldHandler)
+        # Runs inCallable on a thread of its own, so that several timeouts can be active at once without
+        # SIGALRM.  On timeout the call is abandoned but carries on in the background, so it must not
+        # share state with the caller, e.g. an xapi session
+        result = Struct(exception = None)
+        def Run():
+            try:
+                inCallable()
+            except Exception as e:
+                result.exception = e
+
+        thread = threading.Thread(target = Run, name = 'TimeoutWrapper')
+        thread.daemon = True
+        thread.start()
+        thread.join(inTimeout)
+        if thread.is_alive():
+            raise TimeException("Operation timed out")
+        if result.exception is not None:
+            raise result.exception
 
     @classmethod
     def DurationString(cls, inSecs):
@@ -189,6 +335,99 @@ class TimeUtils:
             retVal = 0.0
         return retVal
 
+class DeviceTimeout(TimeException):
+    pass
+
+class Uevents:
+    # Device events from the kernel and udev, received on a netlink socket
+    NETLINK_KOBJECT_UEVENT = 15
+    KERNEL_GROUP = 1
+    UDEV_GROUP = 2 # Sent by udev once its rules have run
+    UDEV_MAGIC = 0xfeedcafe
+    UDEV_DATA_DIR = '/run/udev/data'
+    SYSFS_DIR = '/sys'
+    POLL_SECS = 0.1 # Used by WaitForDevice if netlink is unavailable
+
+    @classmethod
+    def Open(cls, inGroups = None):
+        sock = socket.socket(socket.AF_NETLINK, socket.SOCK_DGRAM, cls.NETLINK_KOBJECT_UEVENT)
+        try:
+            sock.bind((0, FirstValue(inGroups, cls.KERNEL_GROUP | cls.UDEV_GROUP)))
+        except:
+            sock.close()
+            raise
+        return sock
+
+    @classmethod
+    def Parse(cls, inMessage):
+        # Returns a dictionary of the properties in a kernel or udev uevent message
+        if inMessage.startswith(b'libudev\0'):
+            magic, = struct.unpack_from('!I', inMessage, 8)
+            headerSize, propertiesOff, propertiesLen = struct.unpack_from('=III', inMessage, 12)
+            if magic != cls.UDEV_MAGIC:
+                return {}
+            fields = inMessage[propertiesOff:propertiesOff+propertiesLen].split(b'\0')
+        else:
+            fields = inMessage.split(b'\0')[1:] # The first field is ACTION@DEVPATH
+        retVal = {}
+        for field in fields:
+            name, sep, value = field.partition(b'=')
+            if sep:
+                retVal[name.decode('utf-8', 'replace')] = value.decode('utf-8', 'replace')
+        return retVal
+
+    @classmethod
+    def IsRemovableMediaEvent(cls, inProperties):
+        # Ignores the block devices that come and go with VMs, e.g. tapdisk, nbd, dm and loop devices.
+        # udev events carry ID_BUS and ID_CDROM.  Kernel events don't, so for those check that a disk is removable
+        if inProperties.get('SUBSYSTEM', '') != 'block' or inProperties.get('ACTION', '') not in ('add', 'remove', 'change'):
+            return False
+        if inProperties.get('ID_BUS', '') == 'usb' or inProperties.get('ID_CDROM', '') == '1':
+            return True
+        if inProperties.get('DEVTYPE', '') != 'disk' or 'DEVPATH' not in inProperties:
+            return False
+        try:
+            removableFile = open(cls.SYSFS_DIR+inProperties['DEVPATH']+'/removable')
+            try:
+                return removableFile.read().strip() == '1'
+            finally:
+                removableFile.close()
+        except IOError:
+            return False # Already removed, in which case the udev event is the one to act on
+
+    @classmethod
+    def IsDeviceReady(cls, inPath):
+        # True once the device node exists and udev has finished processing it
+        try:
+            devNum = os.stat(inPath).st_rdev
+        except OSError:
+            return False
+        if not os.path.isdir(cls.UDEV_DATA_DIR):
+            return True # No udev, so the node is all there is to wait for
+        return os.path.exists('%s/b%d:%d' % (cls.UDEV_DATA_DIR, os.major(devNum), os.minor(devNum)))
+
+    @classmethod
+    def WaitForDevice(cls, inPath, inTimeoutSecs):
+        # Returns as soon as the device at inPath is ready, rechecking on each uevent
+        deadline = time.time() + inTimeoutSecs
+        try:
+            sock = cls.Open() # Opened before the first check, so that no event is missed
+        except Exception as e:
+            XSLogError('Device events unavailable - polling for '+inPath+': ', e)
+            sock = None
+        try:
+            while not cls.IsDeviceReady(inPath):
+                remainingSecs = deadline - time.time()
+                if remainingSecs <= 0:
+                    raise DeviceTimeout(Lang('Timed out after ')+str(inTimeoutSecs)+Lang(' seconds waiting for device ')+inPath)
+                if sock is None:
+                    time.sleep(min(cls.POLL_SECS, remainingSecs))
+                elif len(select.select([sock], [], [], remainingSecs)[0]) > 0:
+                    sock.recv(65536)
+        finally:
+            if sock is not None:
+                sock.close()
+
 class IPUtils:
     @classmethod
     def ValidateIP(cls, text):
@@ -307,11 +307,7 @@ class XSFeatureDMV:
 
     @classmethod
     def AllActivateHandler(cls):
-        drivers = Task.Sync(lambda x: x.xenapi.Host_driver.get_all_records())
-        if len(drivers) > 100:
-            Layout.Inst().PushDialogue(InfoDialogue(Lang('This feature is unavailable in Pools with more than 100 DMV drivers')))
-        else:
-            Layout.Inst().TopDialogue().ChangeMenu('MENU_ALLDRV')
+        Layout.Inst().TopDialogue().ChangeMenu('MENU_ALLDRV')
 
     @classmethod
     def InfoActivateHandler(cls, inHandle):
@@ -331,30 +327,25 @@ class XSFeatureDMV:
                 hw_present_driverRefs.append(variant['driver'])
 
         retVal = copy.copy(inMenu)
-        retVal.RemoveChoices()
         # inList is a list of HotOpaqueRef objects
         driverList = [ HotAccessor().dmv[x] for x in inList ]
 
         # Sort list by driver name
         driverList.sort(key=lambda driver: driver.friendly_name(''))
 
-        for driver in driverList:
-            driverRef = driver.HotOpaqueRef().OpaqueRef()
-            nameLabel = driver.friendly_name(Lang('<Unknown>'))
-            if driverRef in hw_present_driverRefs:
-                retVal.AddChoice(name = nameLabel,
-                                 onAction = cls.InfoActivateHandler,
-                                 statusUpdateHandler = cls.InfoStatusUpdateHandler,
-                                 handle = driver.HotOpaqueRef())
+        def MakeChoice(inName, inHandle):
+            if inHandle.OpaqueRef() in hw_present_driverRefs:
+                onAction = cls.InfoActivateHandler
             else:
-                retVal.AddChoice(name = nameLabel,
-                                 onAction = cls.EmptyHandler,
-                                 statusUpdateHandler = cls.InfoStatusUpdateHandler,
-                                 handle = driver.HotOpaqueRef())
-
-        if retVal.NumChoices() == 0:
-            retVal.AddChoice(name = Lang('<No Multi Version Drivers Present>'),
-                                        statusUpdateHandler = cls.NoDMVStatusUpdateHandler)
+                onAction = cls.EmptyHandler
+            return ChoiceDef(inName,
+                             onAction = onAction,
+                             statusUpdateHandler = cls.InfoStatusUpdateHandler,
+                             handle = inHandle)
+
+        retVal.SourceSet(MenuSource([ (driver.friendly_name(Lang('<Unknown>')), driver.HotOpaqueRef()) for driver in driverList ],
+            MakeChoice,
+            ChoiceDef(Lang('<No Multi Version Drivers Present>'), statusUpdateHandler = cls.NoDMVStatusUpdateHandler)))
 
         return retVal
 
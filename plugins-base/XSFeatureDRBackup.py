@@ -19,6 +19,8 @@ if __name__ == "__main__":
 from XSConsoleStandard import *
 
 class DRBackupDialogue(SRDialogue):
+    PROBE_TIMEOUT_SECONDS = 120
+
     def __init__(self):
 
         self.custom = {
@@ -36,23 +38,21 @@ class DRBackupDialogue(SRDialogue):
             sr_uuid = inSR['uuid']
             command = "%s/xe-backup-metadata -n -u %s" % (Config.Inst().HelperPath(), sr_uuid)
 
-            status, output = getstatusoutput(command)
+            status, output = getstatusoutput(command, self.PROBE_TIMEOUT_SECONDS)
             initalize_vdi = ""
             if status == 3:
                initalize_vdi = "-c"
             elif status != 0 and status != 3:
                raise Exception(output)
 
-            Layout.Inst().TransientBanner(Lang("Backing up metadata... This may take several minutes."))
             command = "%s/xe-backup-metadata %s -u %s" % (Config.Inst().HelperPath(), initalize_vdi, sr_uuid)
-            status, output = getstatusoutput(command)
-            if status == 0:
-                Layout.Inst().PushDialogue(InfoDialogue(Lang("Backup Successful"), output))
-            else:
-                raise Exception(output)
+            job = Executor.Inst().Submit(ExecutorJob(command, inShell = True, inMergeStderr = True))
+            Layout.Inst().PushDialogue(CommandDialogue(job, Lang("Backing up metadata... This may take several minutes."),
+                OnComplete = lambda inJob: Data.Inst().Update(),
+                SuccessText = Lang("Backup Successful"), FailureText = Lang("Metadata Backup failed: ")))
         except Exception as e:
             Layout.Inst().PushDialogue(InfoDialogue(Lang("Metadata Backup failed: ")+Lang(e)))
-        Data.Inst().Update()
+            Data.Inst().Update()
 
 class XSFeatureDRBackup:
     @classmethod
@@ -17,7 +17,16 @@ if __name__ == "__main__":
     raise Exception("This script is a plugin for xsconsole and cannot run independently")
 
 from XSConsoleStandard import *
-import subprocess
+
+QUERY_TIMEOUT_SECONDS = 300
+
+def _runQuery(command):
+    # Runs a command that lists backups or VDIs, returning (status, stdout, stderr)
+    job = Executor.Inst().RunNow(ExecutorJob(command, QUERY_TIMEOUT_SECONDS))
+    job.Wait()
+    output = "".join([ line + "\n" for line in job.Stdout() ])
+    errput = "".join([ line + "\n" for line in job.Stderr() ])
+    return job.ReturnCode(), output, errput
 
 def _listBackups(sr_uuid, vdi_uuid, legacy=False):
     # list the available backups
@@ -25,12 +34,7 @@ def _listBackups(sr_uuid, vdi_uuid, legacy=False):
     command = ["%s/xe-restore-metadata" % (Config.Inst().HelperPath(),), "-l", "-u", sr_uuid, "-x", vdi_uuid]
     if legacy:
         command.append("-o")
-    cmd = subprocess.Popen(command,
-                           stdout = subprocess.PIPE,
-                           stderr = subprocess.PIPE,
-                           universal_newlines = True)
-    output, errput = cmd.communicate()
-    status = cmd.returncode
+    status, output, errput = _runQuery(command)
     if status != 0:
         raise Exception("(%s,%s)" % (output,errput))
     Layout.Inst().PushDialogue(DRRestoreSelection(output, vdi_uuid, sr_uuid, legacy=legacy))
@@ -165,25 +169,21 @@ class DRRestoreSelection(Dialogue):
             Layout.Inst().PushDialogue(InfoDialogue(Lang("Internal Error, unexpected choice: " + inChoice)))
         else:
             chosen_mode = inChoice
-            Layout.Inst().TransientBanner(Lang("Restoring VM Metadata.  This may take a few minutes..."))
             command = ["%s/xe-restore-metadata" % (Config.Inst().HelperPath(),), "-y", "-u", self.sr_uuid, "-x", self.vdi_uuid, "-d", self.chosen_date, "-m", chosen_mode]
             if dryRun:
                 command.append("-n")
             if self.legacy:
                 command.append("-o")
 
-            cmd = subprocess.Popen(command,
-                                   stdout = subprocess.PIPE,
-                                   stderr = subprocess.STDOUT,
-                                   universal_newlines = True)
-            output, _ = cmd.communicate()
-            status = cmd.returncode
             Layout.Inst().PopDialogue()
-            if status == 0:
-                Layout.Inst().PushDialogue(InfoDialogue(Lang("Metadata Restore Succeeded: ") + output))
-            else:
-                XSLogFailure('Metadata restore failed: '+str(output))
-                Layout.Inst().PushDialogue(InfoDialogue(Lang("Metadata Restore Failed: ") + output))
+            job = Executor.Inst().Submit(ExecutorJob(command, inMergeStderr = True))
+            Layout.Inst().PushDialogue(CommandDialogue(job, Lang("Restoring VM Metadata.  This may take a few minutes..."),
+                OnComplete = self.HandleRestoreCompletion,
+                SuccessText = Lang("Metadata Restore Succeeded"), FailureText = Lang("Metadata Restore Failed: ")))
+
+    def HandleRestoreCompletion(self, inJob):
+        if not inJob.Succeeded():
+            XSLogFailure('Metadata restore failed: '+"\n".join(inJob.OutputLines()))
 
     def HandleKey(self, inKey):
         handled = False
@@ -226,12 +226,7 @@ class DRRestoreDialogue(SRDialogue):
         command = ["%s/xe-restore-metadata" % (Config.Inst().HelperPath(),), "-p", "-u", sr_uuid]
         if legacy:
             command.append("-o")
-        cmd = subprocess.Popen(command,
-                               stdout = subprocess.PIPE,
-                               stderr = subprocess.PIPE,
-                               universal_newlines = True)
-        output, errput = cmd.communicate()
-        status = cmd.returncode
+        status, output, errput = _runQuery(command)
         if status != 0:
             raise Exception("(%s,%s)" % (output,errput))
         if len(output) == 0:
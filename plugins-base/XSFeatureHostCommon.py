@@ -70,8 +70,7 @@ class HostUtils:
         task = cls.AsyncOperation(inOperation, inHostHandle)
 
         if task is not None:
-            while task.IsPending():
-                time.sleep(0.1)
+            task.Wait()
             task.RaiseIfFailed()
 
     @classmethod
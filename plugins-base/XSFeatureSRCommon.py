@@ -105,8 +105,7 @@ class SRUtils:
         task = cls.AsyncOperation(inOperation, inSRHandle)
 
         if task is not None:
-            while task.IsPending():
-                time.sleep(0.1)
+            task.Wait()
             task.RaiseIfFailed()
 
     @classmethod
@@ -135,13 +134,8 @@ class SRUtils:
 
     @classmethod
     def SRFlags(cls, inSR):
-        retVal = []
-        if inSR.uuid() in [ pool.default_SR.uuid() for pool in HotAccessor().pool ]:
-            retVal.append('default')
-        if inSR.uuid() in [ pool.suspend_image_SR.uuid() for pool in HotAccessor().pool ]:
-            retVal.append('suspend')
-        if inSR.uuid() in [ pool.crash_dump_SR.uuid() for pool in HotAccessor().pool ]:
-            retVal.append('crashdump')
+        roles = HotAccessor().SRPoolRoles(inSR.HotOpaqueRef())
+        retVal = [ role for role in ('default', 'suspend', 'crashdump') if role in roles ]
         return retVal
 
     @classmethod
@@ -124,9 +124,9 @@ class SRNewDialogue(Dialogue):
 
     def ExtendedSRName(self, inUUID):
         retVal = inUUID
-        matchingSRs = [ sr for sr in HotAccessor().sr if sr.uuid() == inUUID ]
-        if len(matchingSRs) > 0:
-            sr = matchingSRs[0]
+        srRef = HotAccessor().RefByUUID('sr', inUUID)
+        if srRef is not None:
+            sr = HotAccessor().sr[srRef]
             retVal = sr.name_label(Lang('<Unknown>'))
             if len(sr.PBDs()) == 0:
                 retVal += Lang(' (detached)')
@@ -107,7 +107,6 @@ class XSFeatureSRInfo:
     @classmethod
     def MenuRegenerator(cls, inList, inMenu):
         retVal = copy.copy(inMenu)
-        retVal.RemoveChoices()
         # inList is a list of HotOpaqueRef objects
         srList = [ sr for sr in HotAccessor().visible_sr if sr.other_config({}).get('xensource_internal', '') != 'true' ]
 
@@ -115,16 +114,12 @@ class XSFeatureSRInfo:
         srList.sort(key=lambda sr: (-sr.shared(False), sr.name_label('')))
 
         srUtils = Importer.GetResource('SRUtils')
-        for sr in srList:
-            name = srUtils.AnnotatedName(sr)
-            retVal.AddChoice(name = name,
-                                        onAction = cls.InfoActivateHandler,
-                                        statusUpdateHandler = cls.InfoStatusUpdateHandler,
-                                        handle = sr.HotOpaqueRef())
-
-        if retVal.NumChoices() == 0:
-            retVal.AddChoice(name = Lang('<No Storage Repositories Present>'),
-                statusUpdateHandler = cls.NoSRStatusUpdateHandler)
+        retVal.SourceSet(MenuSource([ (srUtils.AnnotatedName(sr), sr.HotOpaqueRef()) for sr in srList ],
+            lambda name, handle: ChoiceDef(name,
+                onAction = cls.InfoActivateHandler,
+                statusUpdateHandler = cls.InfoStatusUpdateHandler,
+                handle = handle),
+            ChoiceDef(Lang('<No Storage Repositories Present>'), statusUpdateHandler = cls.NoSRStatusUpdateHandler)))
 
         return retVal
 
@@ -32,43 +32,32 @@ class SaveBugReportDialogue(FileDialogue):
         FileDialogue.__init__(self) # Must fill in self.custom before calling __init__
 
     def DoAction(self):
-        success = False
-
         Layout.Inst().PopDialogue()
 
-        Layout.Inst().PushDialogue(BannerDialogue(
-            Lang("Saving Bug Report...")))
-
         try:
-            try:
-                Layout.Inst().Refresh()
-                Layout.Inst().DoUpdate()
-
-                filename = self.vdiMount.MountedPath(self.filename)
-                FileUtils.AssertSafePath(filename)
-
-                file = open(filename, "w")
-                # xen-bugtool requires a value for $USER
-                command = "( export USER=root && /usr/sbin/xen-bugtool --yestoall --silent --output=tar --outfd="+str(file.fileno()) + ' )'
-                status, output = getstatusoutput(command)
-                file.close()
-
-                if status != 0:
-                    raise Exception(output)
-
-                Layout.Inst().PopDialogue()
-                Layout.Inst().PushDialogue(InfoDialogue(
-                    Lang("Saved Bug Report")))
-
-            except Exception as e:
-                Layout.Inst().PopDialogue()
-                Layout.Inst().PushDialogue(InfoDialogue( Lang("Save Failed"), Lang(e)))
-
-        finally:
-            try:
-                self.PreExitActions()
-            except Exception as e:
-                Layout.Inst().PushDialogue(InfoDialogue( Lang("Save Failed"), Lang(e)))
+            filename = self.vdiMount.MountedPath(self.filename)
+            FileUtils.AssertSafePath(filename)
+
+            self.file = open(filename, "w")
+            # xen-bugtool requires a value for $USER
+            command = "( export USER=root && /usr/sbin/xen-bugtool --yestoall --silent --output=tar --outfd="+str(self.file.fileno()) + ' )'
+            job = ExecutorJob(command, inShell = True, inMergeStderr = True, inPassFDs = [self.file.fileno()])
+            Layout.Inst().PushDialogue(CommandDialogue(Executor.Inst().Submit(job), Lang("Saving Bug Report..."),
+                OnComplete = self.HandleCompletion,
+                SuccessText = Lang("Saved Bug Report"), FailureText = Lang("Save Failed: ")))
+        except Exception as e:
+            Layout.Inst().PushDialogue(InfoDialogue( Lang("Save Failed"), Lang(e)))
+            self.HandleCompletion(None)
+
+    def HandleCompletion(self, inJob):
+        # The command has finished, so the file can be closed and the device unmounted
+        try:
+            if getattr(self, 'file', None) is not None:
+                self.file.close()
+                self.file = None
+            self.PreExitActions()
+        except Exception as e:
+            Layout.Inst().PushDialogue(InfoDialogue( Lang("Save Failed"), Lang(e)))
 
 class XSFeatureSaveBugReport:
     @classmethod
@@ -80,8 +80,7 @@ class VMUtils:  # type:ignore[no-redef]
         task = cls.AsyncOperation(inOperation, inVMHandle, inParam0)
 
         if task is not None:
-            while task.IsPending():
-                time.sleep(0.1)
+            task.Wait()
             task.RaiseIfFailed()
 
     @classmethod
@@ -100,11 +100,7 @@ class XSFeatureVMInfo:
 
     @classmethod
     def AllActivateHandler(cls):
-        vmIDs = Task.Sync(lambda x: x.xenapi.VM.get_all_records_where('field "is_a_template" = "false" and field "is_control_domain" = "false"'))
-        if len(vmIDs) > 100:
-            Layout.Inst().PushDialogue(InfoDialogue(Lang('This feature is unavailable in Pools with more than 100 Virtual Machines')))
-        else:
-            Layout.Inst().TopDialogue().ChangeMenu('MENU_ALLVM')
+        Layout.Inst().TopDialogue().ChangeMenu('MENU_ALLVM')
 
     @classmethod
     def InfoActivateHandler(cls, inHandle):
@@ -114,23 +110,23 @@ class XSFeatureVMInfo:
     @classmethod
     def MenuRegenerator(cls, inList, inMenu):
         retVal = copy.copy(inMenu)
-        retVal.RemoveChoices()
-        # inList is a list of HotOpaqueRef objects
-        vmList = [ HotAccessor().vm[x] for x in inList ]
+        # inList is a list of HotOpaqueRef objects.  Names come from the guest_vm collection, which
+        # already excludes templates and control domains, so there is no fetch per VM
+        guestVMs = HotAccessor().guest_vm({})
+        vmList = []
+        for vmRef in inList:
+            vm = guestVMs.get(vmRef, None)
+            if vm is not None:
+                vmList.append((vm.get('name_label', Lang('<Unknown>')), vmRef))
         # Sort list by VM name
-        vmList.sort(key=lambda vm: vm.name_label(''))
-
-        for vm in vmList:
-            nameLabel = vm.name_label(Lang('<Unknown>'))
-            if not vm.is_control_domain(True) and not vm.is_a_template(True):
-                retVal.AddChoice(name = nameLabel,
-                                            onAction = cls.InfoActivateHandler,
-                                            statusUpdateHandler = cls.InfoStatusUpdateHandler,
-                                            handle = vm.HotOpaqueRef())
-
-        if retVal.NumChoices() == 0:
-            retVal.AddChoice(name = Lang('<No Virtual Machines Present>'),
-                                        statusUpdateHandler = cls.NoVMStatusUpdateHandler)
+        vmList.sort(key=lambda entry: entry[0])
+
+        retVal.SourceSet(MenuSource(vmList,
+            lambda name, handle: ChoiceDef(name,
+                onAction = cls.InfoActivateHandler,
+                statusUpdateHandler = cls.InfoStatusUpdateHandler,
+                handle = handle),
+            ChoiceDef(Lang('<No Virtual Machines Present>'), statusUpdateHandler = cls.NoVMStatusUpdateHandler)))
 
         return retVal
 
@@ -19,6 +19,9 @@ if __name__ == "__main__":
 from XSConsoleStandard import *
 
 class ClaimSRDialogue(Dialogue):
+    SR_TIMEOUT_SECONDS = 30
+    SR_POLL_SECONDS = 0.5
+
     def __init__(self):
         Dialogue.__init__(self)
 
@@ -294,6 +297,21 @@ class ClaimSRDialogue(Dialogue):
                     retVal = True
         return retVal
 
+    def WaitForSR(self):
+        # The claim restarts xapi, so reread until xapi reports the SR on the claimed disk
+        deadline = time.time() + self.SR_TIMEOUT_SECONDS
+        while True:
+            try:
+                Data.Inst().Update() # Read information about the new SR
+                if self.IsKnownSROnDisk(self.deviceToErase.device):
+                    return
+            except Exception as e:
+                XSLogError('Disk claim SR check failed: ', e)
+            if time.time() >= deadline:
+                XSLogFailure('Timed out waiting for xapi to report the new SR on '+str(self.deviceToErase.device))
+                return
+            time.sleep(self.SR_POLL_SECONDS)
+
     def DoAction(self):
         Layout.Inst().TransientBanner(Lang("Claiming and Configuring Disk..."))
         XSLog('Disk claim initiated for '+str(self.deviceToErase.device))
@@ -307,8 +325,10 @@ class ClaimSRDialogue(Dialogue):
                 "/opt/xensource/libexec/delete-partitions-and-claim-disk", self.deviceToErase.device)
         status = pipe.CallRC()
 
-        time.sleep(4) # Allow xapi to pick up the new SR
-        Data.Inst().Update() # Read information about the new SR
+        if status == 0:
+            self.WaitForSR()
+        else:
+            Data.Inst().Update()
 
         if status != 0:
             output = "\n".join(pipe.AllOutput())
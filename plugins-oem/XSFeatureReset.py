@@ -99,20 +99,17 @@ class ResetDialogue(Dialogue):
         XSLog('Resetting to factory defaults')
         Data.Inst().SetVerboseBoot(False)
         Data.Inst().CloseSession()
-        try:
-            Layout.Inst().TransientBanner(Lang('Stopping Virtual Machines...'))
-            ShellPipe('service', 'xapi-domains', 'stop').Call()
-        except Exception as e:
-            Layout.Inst().TransientBanner(Lang('Could not stop Virtual Machines: ' + Lang(e)))
-            time.sleep(3.0)
-        try:
-            Layout.Inst().TransientBanner(Lang('Resetting to Factory Defaults...'))
-            ShellPipe('/opt/xensource/libexec/revert-to-factory', 'yesimeanit').Call()
-            Layout.Inst().TransientBanner(Lang('Rebooting...'))
+        # Stopping VMs and resetting can take minutes, so run both as one command that can't be cancelled part way through
+        command = "service xapi-domains stop || echo 'Could not stop Virtual Machines'; exec /opt/xensource/libexec/revert-to-factory yesimeanit"
+        job = Executor.Inst().Submit(ExecutorJob(command, inShell = True, inMergeStderr = True, inCanCancel = False))
+        Layout.Inst().PushDialogue(CommandDialogue(job, Lang('Resetting to Factory Defaults...'),
+            OnComplete = self.HandleCompletion,
+            SuccessText = Lang('Rebooting...'), FailureText = Lang('Reset to Factory Defaults Failed: ')))
+
+    def HandleCompletion(self, inJob):
+        if inJob.Succeeded():
             Layout.Inst().ExitBannerSet(Lang("Rebooting..."))
             Layout.Inst().SubshellCommandSet("/sbin/reboot -f") # -f avoids running init scripts on shutdown
-        except Exception as e:
-            Layout.Inst().PushDialogue(InfoDialogue(Lang('Reset to Factory Defaults Failed'), Lang(e)))
 
 class XSFeatureReset:
     @classmethod
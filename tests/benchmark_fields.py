@@ -0,0 +1,55 @@
+# Benchmark of FieldArranger with cached layouts against laying out fields on every call.
+# Run from the top level directory with: python -m tests.benchmark_fields [numParagraphs]
+
+import sys
+import time
+
+from XSConsoleFields import *
+
+PARAGRAPH = ('The software is licensed, not sold.  This agreement only gives you some rights to use the '
+    'software.  The licensor reserves all other rights.  Unless applicable law gives you more rights '
+    'despite this limitation, you may use the software only as expressly permitted in this agreement.  ')
+
+
+def MakeArranger(inNumParagraphs, inXSize = 78, inYSize = 22):
+    # A boxed pane holding EULA-sized wrapped text and a static help line, as XSFeatureEULA shows
+    fieldGroup = FieldGroup()
+    text = '\n\n'.join([ PARAGRAPH * 3 ] * inNumParagraphs)
+    fieldGroup.BodyFieldAdd(None, WrappedTextField(text, 'MODAL_BRIGHT', Field.FLOW_RETURN))
+    fieldGroup.StaticFieldAdd(None, TextField('<Enter> Accept  <Esc> Decline', 'MODAL_BASE', Field.FLOW_RIGHT))
+    arranger = FieldArranger(fieldGroup, inXSize, inYSize)
+    arranger.AddBox()
+    return arranger
+
+
+def Render(inArranger):
+    # The layout calls made by PaneSizerCentre.Update, DialoguePane.Render and scrolling for one frame
+    inArranger.XBounds()
+    inArranger.YBounds()
+    inArranger.BodyLayout()
+    inArranger.StaticLayout()
+    inArranger.YSize()
+
+
+def TimeRenders(inArranger, inRepeats):
+    Render(inArranger) # The first frame lays out and wraps the text in both cases
+    startTime = time.time()
+    for i in range(inRepeats):
+        Render(inArranger)
+    return (time.time() - startTime) / inRepeats
+
+
+def Main(inArgs):
+    repeats = 20
+    for numParagraphs in [ int(arg) for arg in inArgs ] or [10, 50, 200]:
+        arranger = MakeArranger(numParagraphs)
+        cachedSecs = TimeRenders(arranger, repeats)
+        # Bypass the cache by laying out the fields directly, as before
+        arranger.CachedLayout = lambda inName, inFields, inYStep: arranger.LayoutFields(inFields, inYStep)
+        uncachedSecs = TimeRenders(arranger, repeats)
+        print('%4d paragraphs: uncached %7.2fms, cached %7.2fms per frame (%.1fx)' %
+            (numParagraphs, uncachedSecs * 1000.0, cachedSecs * 1000.0, uncachedSecs / cachedSecs))
+
+
+if __name__ == '__main__':
+    Main(sys.argv[1:])
@@ -0,0 +1,55 @@
+# Benchmark of plugin registration at startup, importing every plugin against registering from the
+# plugin manifest.  Each start runs in a new process so that no plugin is already imported.
+# Run from the top level directory with: python -m tests.benchmark_importer [numStarts]
+
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+PLUGIN_DIRS = ['plugins-base', 'plugins-oem', 'plugins-extras']
+
+
+def Start(inManifestPath):
+    # Runs in the child process.  Prints the registration time and the number of plugins imported
+    from XSConsoleStandard import Importer
+    Importer.manifestPath = inManifestPath
+    modulesBefore = set(sys.modules.keys())
+    startTime = time.time()
+    for plugInDir in PLUGIN_DIRS:
+        Importer.ImportAbsDir(os.path.abspath(plugInDir))
+    elapsedSecs = time.time() - startTime
+    imported = [ name for name in set(sys.modules.keys()) - modulesBefore if name.startswith('XSFeature') or name.startswith('XSMenu') ]
+    print('%f %d %d' % (elapsedSecs, len(imported), len(Importer.plugIns) + sum(len(entries) for entries in Importer.menuEntries.values())))
+
+
+def TimeStart(inManifestPath):
+    output = subprocess.check_output([sys.executable, '-m', 'tests.benchmark_importer', '--child', inManifestPath])
+    elapsedSecs, numImported, numRegistered = output.decode('utf-8').split()
+    return float(elapsedSecs), int(numImported), int(numRegistered)
+
+
+def Main(inArgs):
+    numStarts = int(inArgs[0]) if len(inArgs) > 0 else 5
+    tempDir = tempfile.mkdtemp()
+    try:
+        manifestPath = os.path.join(tempDir, 'plugin-manifest.json')
+        for title, keepManifest in (('without manifest', False), ('with manifest', True)):
+            results = []
+            for i in range(numStarts):
+                if not keepManifest and os.path.exists(manifestPath):
+                    os.remove(manifestPath)
+                results.append(TimeStart(manifestPath))
+            best = min(results)
+            print('%-17s %7.2fms, %2d plugins imported, %2d registrations' % (title, best[0] * 1000.0, best[1], best[2]))
+    finally:
+        shutil.rmtree(tempDir)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) > 2 and sys.argv[1] == '--child':
+        Start(sys.argv[2])
+    else:
+        Main(sys.argv[1:])
@@ -0,0 +1,78 @@
+# Benchmark of HotMetrics.ParseXML against the previous xml.dom.minidom parser.
+# Run from the top level directory with: python -m tests.benchmark_metrics [numVMs]
+
+import sys
+import time
+import xml.dom.minidom
+
+from XSConsoleMetrics import HotMetrics
+
+VM_METRICS = ['cpu0', 'cpu1', 'memory', 'memory_internal_free', 'vbd_xvda_read', 'vbd_xvda_write',
+    'vif_0_rx', 'vif_0_tx']
+HOST_METRICS = ['cpu%d' % i for i in range(16)] + ['memory_total_kib', 'memory_free_kib', 'loadavg']
+
+
+def GenerateRRDUpdates(inNumVMs, inNumRows = 2, inEnd = 1700000000):
+    # Generates an rrd_updates document shaped like the one xapi returns for a host and its VMs
+    entries = [ 'AVERAGE:host:host-uuid:' + name for name in HOST_METRICS ]
+    for vm in range(inNumVMs):
+        entries += [ 'AVERAGE:vm:vm-uuid-%d:%s' % (vm, name) for name in VM_METRICS ]
+
+    lines = ['<xport><meta><start>%d</start><step>5</step><end>%d</end>' % (inEnd - 5 * inNumRows, inEnd)]
+    lines.append('<rows>%d</rows><columns>%d</columns><legend>' % (inNumRows, len(entries)))
+    lines += [ '<entry>%s</entry>' % entry for entry in entries ]
+    lines.append('</legend></meta><data>')
+    for row in range(inNumRows):
+        # Newest row first, as xapi sends them
+        rowTime = inEnd - 5 * row
+        lines.append('<row><t>%d</t>' % rowTime)
+        lines += [ '<v>%d.%d</v>' % (rowTime % 100, i) for i in range(len(entries)) ]
+        lines.append('</row>')
+    lines.append('</data></xport>')
+    return '\n'.join(lines)
+
+
+def MinidomParseXML(inXML):
+    # The DOM based parser that ParseXML replaced
+    xmlDoc = xml.dom.minidom.parseString(inXML)
+    metaNode = xmlDoc.getElementsByTagName('meta')[0]
+    valuesNode = xmlDoc.getElementsByTagName('data')[0]
+    legendNode = metaNode.getElementsByTagName('legend')[0]
+    entries = [ str(entry.firstChild.nodeValue.strip()) for entry in legendNode.getElementsByTagName('entry') ]
+
+    mostRecentRow = None
+    mostRecentTime = None
+    for row in valuesNode.getElementsByTagName('row'):
+        rowTime = int(row.getElementsByTagName('t')[0].firstChild.nodeValue.strip())
+        if mostRecentTime is None or mostRecentTime < rowTime:
+            mostRecentRow = row
+            mostRecentTime = rowTime
+
+    if mostRecentRow is None:
+        values = []
+    else:
+        values = [ str(v.firstChild.nodeValue.strip()) for v in mostRecentRow.getElementsByTagName('v') ]
+
+    return dict(zip(entries, values))
+
+
+def TimeParser(inParser, inXML, inRepeats):
+    startTime = time.time()
+    for i in range(inRepeats):
+        inParser(inXML)
+    return (time.time() - startTime) / inRepeats
+
+
+def Main(inArgs):
+    repeats = 10
+    for numVMs in [ int(arg) for arg in inArgs ] or [10, 50, 200]:
+        content = GenerateRRDUpdates(numVMs)
+        assert HotMetrics().ParseXML(content) == MinidomParseXML(content)
+        domSecs = TimeParser(MinidomParseXML, content, repeats)
+        streamSecs = TimeParser(HotMetrics().ParseXML, content, repeats)
+        print('%4d VMs, %7d bytes: minidom %7.2fms, streaming %7.2fms (%.1fx)' %
+            (numVMs, len(content), domSecs * 1000.0, streamSecs * 1000.0, domSecs / streamSecs))
+
+
+if __name__ == '__main__':
+    Main(sys.argv[1:])
@@ -0,0 +1,55 @@
+import unittest
+
+from XSConsoleData import BulkFetcher
+
+
+class FakeClass:
+    def __init__(self, inRecords, inCalls):
+        self.records = inRecords
+        self.calls = inCalls
+
+    def get_record(self, inRef):
+        self.calls.append(('get_record', inRef))
+        return self.records[inRef]
+
+    def get_all_records(self):
+        self.calls.append(('get_all_records', None))
+        return dict(self.records)
+
+    def get_all_records_where(self, inExpression):
+        self.calls.append(('get_all_records_where', inExpression))
+        return dict((ref, rec) for ref, rec in self.records.items() if '"%s"' % rec['SR'] in inExpression)
+
+
+class FakeSession:
+    def __init__(self, inRecords):
+        self.calls = []
+        self.xenapi = type('xenapi', (), {})()
+        self.xenapi.VDI = FakeClass(inRecords, self.calls)
+
+
+class TestBulkFetcher(unittest.TestCase):
+    def setUp(self):
+        records = dict(('OpaqueRef:vdi%d' % i, {'SR': 'OpaqueRef:sr%d' % (i % 100)}) for i in range(300))
+        self.session = FakeSession(records)
+        self.fetcher = BulkFetcher(self.session)
+
+    def test_records_where_chunks_queries(self):
+        srRefs = ['OpaqueRef:sr%d' % i for i in range(100)]
+        result = self.fetcher.RecordsWhere('VDI', 'SR', srRefs + ['OpaqueRef:NULL'])
+        self.assertEqual(len(result), 300)
+        self.assertEqual(self.fetcher.NumCalls(), 2) # 100 values at 64 per query
+
+    def test_records_where_empty(self):
+        self.assertEqual(self.fetcher.RecordsWhere('VDI', 'SR', []), {})
+        self.assertEqual(self.fetcher.NumCalls(), 0)
+
+    def test_records_for_uses_one_call(self):
+        refs = ['OpaqueRef:vdi1', 'OpaqueRef:vdi2', 'OpaqueRef:vdi3']
+        result = self.fetcher.RecordsFor('VDI', refs)
+        self.assertEqual(sorted(result.keys()), refs)
+        self.assertEqual(self.fetcher.CallReport(), 'VDI.get_all_records x1')
+
+
+if __name__ == '__main__':
+    unittest.main()
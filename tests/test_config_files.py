@@ -0,0 +1,45 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from XSConsoleData import Data
+from XSConsoleUtils import ConfigFileReader
+
+
+class TestConfigFileReader(unittest.TestCase):
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempDir)
+        self.path = os.path.join(self.tempDir, 'resolv.conf')
+        self.Write('; comment\nnameserver 10.0.0.1\nsearch example.com\n')
+        self.reader = ConfigFileReader()
+
+    def Write(self, inContents):
+        configFile = open(self.path, 'w')
+        configFile.write(inContents)
+        configFile.close()
+
+    def test_read_once_until_changed(self):
+        statKey, lines = self.reader.Read(self.path)
+        self.assertEqual(lines, ['; comment', 'nameserver 10.0.0.1', 'search example.com'])
+        self.assertEqual(self.reader.Read(self.path), (statKey, lines))
+        self.Write('nameserver 10.0.0.2\n')
+        self.assertEqual(self.reader.Read(self.path)[1], ['nameserver 10.0.0.2'])
+        self.assertEqual(self.reader.reads, 2)
+
+    def test_missing_file(self):
+        self.assertEqual(self.reader.Read(os.path.join(self.tempDir, 'missing')), (None, None))
+
+    def test_scan_skipped_when_unchanged(self):
+        data = Data()
+        scans = []
+        self.assertTrue(data.ScanConfigFile(self.path, scans.append))
+        self.assertFalse(data.ScanConfigFile(self.path, scans.append))
+        self.Write('nameserver 10.0.0.2\n')
+        self.assertTrue(data.ScanConfigFile(self.path, scans.append))
+        self.assertEqual(len(scans), 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
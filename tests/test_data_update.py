@@ -0,0 +1,36 @@
+import unittest
+
+from XSConsoleData import Data
+
+
+def FakeUpdateLocked(inData):
+    inData.updateGeneration += 1
+    inData.data['host'] = {'hostname': 'built'}
+
+
+class TestUpdateSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.addCleanup(setattr, Data, 'UpdateLocked', Data.UpdateLocked)
+        Data.UpdateLocked = FakeUpdateLocked
+        self.data = Data()
+        self.data.data = {'host': {'hostname': 'old'}, 'config_files': {}}
+
+    def Snapshot(self):
+        return dict((name, dict(value)) for name, value in self.data.data.items())
+
+    def test_snapshot_swapped_in(self):
+        snapshot = self.Snapshot()
+        self.data.UpdateSnapshot(snapshot, self.data.Version())
+        self.assertEqual(self.data.host.hostname(), 'built')
+
+    def test_overtaken_by_synchronous_update(self):
+        generation = self.data.Version()
+        snapshot = self.Snapshot()
+        self.data.Update()
+        self.data.data['host']['hostname'] = 'synchronous'
+        self.data.UpdateSnapshot(snapshot, generation)
+        self.assertEqual(self.data.host.hostname(), 'synchronous')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,55 @@
+import time
+import unittest
+
+from XSConsoleExecutor import Executor, ExecutorJob, getstatusoutput
+from XSConsoleUtils import ShellPipe
+
+
+class TestExecutor(unittest.TestCase):
+    def test_getstatusoutput(self):
+        self.assertEqual(getstatusoutput('echo one; echo two >&2; exit 2'), (2, 'one\ntwo'))
+        self.assertEqual(getstatusoutput('sleep 10', 0.2), (None, ''))
+
+    def test_output_streamed(self):
+        job = Executor.Inst().Submit(ExecutorJob(['/bin/sh', '-c', 'echo first; sleep 10']))
+        deadline = time.time() + 5.0
+        while job.OutputLines() == [] and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(job.OutputLines(), ['first'])
+        self.assertTrue(job.IsPending())
+        job.Cancel()
+        self.assertTrue(job.Wait(5.0))
+        self.assertEqual(job.ReturnCode(), None)
+        self.assertEqual(job.Message(), 'Cancelled')
+
+    def test_timeout_after_output_closed(self):
+        job = Executor.Inst().Submit(ExecutorJob(['/bin/sh', '-c', 'exec >&- 2>&-; sleep 10'], 0.2))
+        self.assertTrue(job.Wait(5.0))
+        self.assertTrue(job.timedOut)
+
+    def test_cancel_all_runs_completions(self):
+        completed = []
+        job = Executor.Inst().Submit(ExecutorJob(['sleep', '10']))
+        job.AddCompletion(completed.append)
+        Executor.Inst().CancelAll()
+        self.assertEqual(completed, [job])
+        job.RunCompletions() # Completions only run once
+        self.assertEqual(completed, [job])
+
+    def test_concurrency_capped(self):
+        jobs = [ Executor.Inst().Submit(ExecutorJob(['sleep', '0.2'])) for i in range(Executor.MAX_RUNNING + 1) ]
+        self.assertFalse(jobs[-1].started)
+        for job in jobs:
+            self.assertTrue(job.Wait(5.0))
+        self.assertTrue(jobs[-1].Succeeded())
+
+    def test_shell_pipe(self):
+        self.assertEqual(ShellPipe('cat').Pipe('tr', 'a-z', 'A-Z').Stdout(), [])
+        pipe = ShellPipe('/bin/sh', '-c', 'cat; echo err >&2; exit 1')
+        self.assertEqual(pipe.CallRC(['a', 'b']), 1)
+        self.assertEqual((pipe.Stdout(), pipe.Stderr()), (['a', 'b'], ['err']))
+        self.assertRaises(OSError, ShellPipe, '/nonexistent/command')
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,48 @@
+import unittest
+
+from XSConsoleFields import *
+
+
+class CountingField(TextField):
+    def __init__(self, text):
+        TextField.__init__(self, text, 'MODAL_BASE', Field.FLOW_RETURN)
+        self.updates = 0
+
+    def UpdateWidth(self, inWidth):
+        self.updates += 1
+
+
+class TestLayoutCache(unittest.TestCase):
+    def setUp(self):
+        self.fieldGroup = FieldGroup()
+        self.field = CountingField('hello')
+        self.fieldGroup.BodyFieldAdd(None, self.field)
+        self.arranger = FieldArranger(self.fieldGroup, 60, 20)
+
+    def test_layout_reused(self):
+        layout = self.arranger.BodyLayout()
+        layout.pop()
+        self.arranger.XBounds()
+        self.arranger.YBounds()
+        self.assertEqual(len(self.arranger.BodyLayout()), 2)
+        self.assertEqual(self.field.updates, 1)
+
+    def test_invalidated_by_fields_and_size(self):
+        self.arranger.BodyLayout()
+        self.fieldGroup.BodyFieldAdd(None, TextField('world', 'MODAL_BASE', Field.FLOW_RETURN))
+        self.assertEqual(self.arranger.BodyLayout()[-1].ypos, 3)
+        self.arranger.XSizeSet(40)
+        self.arranger.BodyLayout()
+        self.assertEqual(self.field.updates, 3)
+
+    def test_invalidated_by_input(self):
+        inputField = InputField('', 'MODAL_BASE', 'MODAL_BRIGHT', Field.FLOW_RIGHT, None)
+        self.fieldGroup.InputFieldAdd('name', inputField)
+        self.fieldGroup.BodyFieldAdd(None, TextField('after', 'MODAL_BASE', Field.FLOW_RETURN))
+        xPos = self.arranger.BodyLayout()[2].xpos
+        inputField.text = 'a much longer name'
+        self.assertEqual(self.arranger.BodyLayout()[2].xpos, xPos + len(inputField.text) - InputField.MIN_WIDTH)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,35 @@
+import os
+import shutil
+import tempfile
+import unittest
+
+from XSConsoleData import Data
+
+
+class TestHardwareCache(unittest.TestCase):
+    def setUp(self):
+        tempDir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempDir)
+        self.data = Data()
+        self.data.hardwareCachePath = os.path.join(tempDir, 'cache', 'hardware-cache.json')
+        self.data.data = {
+            'dmi' : {'system_manufacturer' : 'Vendor', 'memory_sizes' : ['4096 MB']},
+            'lspci' : {'storage_controllers' : [('SATA controller', 'AHCI')]},
+            'timezones' : {'cities' : {}}
+        }
+
+    def test_round_trip(self):
+        self.data.WriteHardwareCache([1, 'boot'])
+        hardware = self.data.ReadHardwareCache([1, 'boot'])
+        self.assertEqual(sorted(hardware.keys()), ['dmi', 'lspci'])
+        self.assertEqual(hardware['dmi']['memory_sizes'], ['4096 MB'])
+        self.assertEqual(hardware['lspci']['storage_controllers'], [['SATA controller', 'AHCI']])
+
+    def test_key_mismatch(self):
+        self.data.WriteHardwareCache([1, 'boot'])
+        self.assertEqual(self.data.ReadHardwareCache([1, 'another boot']), None)
+        self.assertEqual(self.data.ReadHardwareCache(None), None)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,142 @@
+import time
+import unittest
+
+from XSConsoleHotData import HotData, HotOpaqueRef
+from XSConsoleScheduler import RefreshWorker
+
+
+class TestHotDataEvents(unittest.TestCase):
+    def setUp(self):
+        self.hotData = HotData()
+        self.hotData.ApplyEvents([
+            {'class': 'vm', 'operation': 'add', 'ref': 'OpaqueRef:vm1', 'snapshot': {'name_label': 'one'}},
+            {'class': 'vm', 'operation': 'add', 'ref': 'OpaqueRef:vm2', 'snapshot': {'name_label': 'two'}},
+        ], True)
+
+    def test_initial_batch_replaces_collections(self):
+        self.assertEqual(len(self.hotData.Fetch('vm', None)), 2)
+        self.assertEqual(self.hotData.Fetch('sr', None), {})
+
+    def test_deltas(self):
+        collection = self.hotData.Fetch('vm', None)
+        self.hotData.ApplyEvents([
+            {'class': 'vm', 'operation': 'mod', 'ref': 'OpaqueRef:vm1', 'snapshot': {'name_label': 'renamed'}},
+            {'class': 'vm', 'operation': 'del', 'ref': 'OpaqueRef:vm2'},
+        ], False)
+        vm1 = HotOpaqueRef('OpaqueRef:vm1', 'vm')
+        self.assertEqual(self.hotData.Fetch('vm', vm1)['name_label'], 'renamed')
+        self.assertEqual(list(self.hotData.Fetch('vm', None).keys()), [vm1])
+        # Collections already handed out are not modified
+        self.assertEqual(len(collection), 2)
+
+    def test_delete_cache_keeps_subscribed_data(self):
+        self.hotData.DeleteCache()
+        self.assertEqual(len(self.hotData.Fetch('vm', None)), 2)
+
+    def test_fetch_accesses_count_unsubscribed_reads(self):
+        self.hotData.AddFetcher('guest_metrics', lambda inOpaqueRef: {}, 5)
+        accesses = self.hotData.FetchAccesses()
+        self.hotData.Fetch('vm', None)
+        self.assertEqual(self.hotData.FetchAccesses(), accesses)
+        self.hotData.Fetch('guest_metrics', None)
+        self.assertEqual(self.hotData.FetchAccesses(), accesses + 1)
+
+
+class TestHotDataCollectionCache(unittest.TestCase):
+    def setUp(self):
+        self.calls = []
+        self.hotData = HotData()
+        self.hotData.AddFetcher('vm', self.FakeFetchVM, 5)
+
+    def FakeFetchVM(self, inOpaqueRef):
+        self.calls.append(inOpaqueRef)
+        if inOpaqueRef is not None:
+            return {'name_label': 'refetched'}
+        return dict((HotOpaqueRef('OpaqueRef:vm%d' % i, 'vm'), {'name_label': 'vm%d' % i}) for i in range(500))
+
+    def test_collection_fetch_caches_items(self):
+        names = [self.hotData.GetData(['vm', 'name_label'], None, [ref, None])
+            for ref in list(self.hotData.Fetch('vm', None).keys())]
+        self.assertEqual(len(names), 500)
+        self.assertEqual(self.calls, [None])
+
+    def test_item_fetch_updates_collection(self):
+        collection = self.hotData.Fetch('vm', None)
+        vm1 = HotOpaqueRef('OpaqueRef:vm1', 'vm')
+        del self.hotData.data[vm1]
+        self.hotData.Fetch('vm', vm1)
+        self.assertEqual(collection[vm1]['name_label'], 'refetched')
+
+    def test_version_changes_with_data(self):
+        self.hotData.Fetch('vm', None)
+        version = self.hotData.Version()
+        self.hotData.FetchAndCache('vm', None) # Same records, so same version
+        self.assertEqual(self.hotData.Version(), version)
+        vm1 = HotOpaqueRef('OpaqueRef:vm1', 'vm')
+        self.hotData.FetchAndCache('vm', vm1)
+        self.assertNotEqual(self.hotData.Version(), version)
+
+    def test_stale_while_revalidate(self):
+        self.hotData.SetStaleWhileRevalidate('vm', True)
+        collection = self.hotData.Fetch('vm', None)
+        self.hotData.data['vm'].timestamp -= 60 # Expire the collection
+        self.assertTrue(self.hotData.Fetch('vm', None) is collection) # Stale value, refetched in the background
+        for i in range(100):
+            if not RefreshWorker.Inst().IsBusy():
+                break
+            time.sleep(0.01)
+        self.assertEqual(self.calls, [None, None])
+        self.assertFalse(self.hotData.Fetch('vm', None) is collection)
+
+
+class TestHotDataIndexes(unittest.TestCase):
+    def setUp(self):
+        self.hotData = HotData()
+        self.hotData.ApplyEvents([
+            {'class': 'vm', 'operation': 'add', 'ref': 'OpaqueRef:vm1',
+                'snapshot': {'uuid': 'u1', 'resident_on': 'OpaqueRef:host1', 'power_state': 'Running'}},
+            {'class': 'vm', 'operation': 'add', 'ref': 'OpaqueRef:vm2',
+                'snapshot': {'uuid': 'u2', 'resident_on': 'OpaqueRef:NULL', 'power_state': 'Halted'}},
+            {'class': 'pbd', 'operation': 'add', 'ref': 'OpaqueRef:pbd1',
+                'snapshot': {'host': 'OpaqueRef:host1', 'SR': 'OpaqueRef:sr1'}},
+        ], True)
+
+    def Refs(self, inRefs):
+        return [ ref.OpaqueRef() for ref in inRefs ]
+
+    def test_lookups(self):
+        vm1 = HotOpaqueRef('OpaqueRef:vm1', 'vm')
+        host1 = HotOpaqueRef('OpaqueRef:host1', 'host')
+        sr1 = HotOpaqueRef('OpaqueRef:sr1', 'sr')
+        self.assertEqual(self.hotData.IndexLookup('vm_by_uuid', 'u1'), [vm1])
+        self.assertEqual(self.hotData.IndexLookup('vms_by_host', host1), [vm1])
+        self.assertEqual(self.Refs(self.hotData.IndexLookup('vms_by_power_state', 'halted')), ['OpaqueRef:vm2'])
+        self.assertEqual(self.Refs(self.hotData.IndexLookup('pbds_by_host', host1)), ['OpaqueRef:pbd1'])
+        self.assertEqual(self.hotData.IndexLookup('hosts_by_sr', sr1), [host1])
+
+    def test_rebuilt_when_collection_changes(self):
+        self.assertEqual(self.hotData.IndexLookup('vm_by_uuid', 'u3'), [])
+        self.hotData.ApplyEvents([
+            {'class': 'vm', 'operation': 'add', 'ref': 'OpaqueRef:vm3', 'snapshot': {'uuid': 'u3'}},
+            {'class': 'vm', 'operation': 'del', 'ref': 'OpaqueRef:vm1'},
+        ], False)
+        self.assertEqual(self.Refs(self.hotData.IndexLookup('vm_by_uuid', 'u3')), ['OpaqueRef:vm3'])
+        self.assertEqual(self.hotData.IndexLookup('vm_by_uuid', 'u1'), [])
+
+    def test_pool_scale(self):
+        events = [ {'class': 'vm', 'operation': 'add', 'ref': 'OpaqueRef:vm%d' % i,
+            'snapshot': {'uuid': 'u%d' % i, 'resident_on': 'OpaqueRef:host%d' % (i % 2), 'power_state': 'Running'}}
+            for i in range(5000) ]
+        events += [ {'class': 'pbd', 'operation': 'add', 'ref': 'OpaqueRef:pbd%d' % i,
+            'snapshot': {'host': 'OpaqueRef:host1', 'SR': 'OpaqueRef:sr1'}} for i in range(2) ]
+        self.hotData.ApplyEvents(events, True)
+        startTime = time.time()
+        self.assertEqual(len(self.hotData.IndexLookup('vms_by_power_state', 'running')), 5000)
+        self.assertEqual(len(self.hotData.IndexLookup('vms_by_host', HotOpaqueRef('OpaqueRef:host0', 'host'))), 2500)
+        self.assertLess(time.time() - startTime, 1.0) # Several seconds if each insert scans the list
+        sr1 = HotOpaqueRef('OpaqueRef:sr1', 'sr')
+        self.assertEqual(self.Refs(self.hotData.IndexLookup('hosts_by_sr', sr1)), ['OpaqueRef:host1'])
+
+
+if __name__ == '__main__':
+    unittest.main()
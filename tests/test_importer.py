@@ -0,0 +1,59 @@
+import os
+import shutil
+import tempfile
+import types
+import unittest
+
+from XSConsoleImporter import Importer, PlugInReference
+
+
+class Handler:
+    @classmethod
+    def Activate(cls, inValue):
+        return inValue * 2
+
+
+class TestManifestEncoding(unittest.TestCase):
+    def setUp(self):
+        self.module = types.ModuleType('XSFeatureTest')
+        self.module.Handler = Handler
+
+    def test_class_method_round_trip(self):
+        encoded = Importer.EncodeValue(self.module, {'title' : 'Test', 'handler' : Handler.Activate})
+        self.assertEqual(encoded['handler'], {'__ref__' : ['Handler', 'Activate']})
+        decoded = Importer.DecodeValue('XSFeatureTest', '/nonexistent', encoded)
+        self.assertEqual(decoded['title'], 'Test')
+        self.assertTrue(isinstance(decoded['handler'], PlugInReference))
+
+    def test_lambda_not_recorded(self):
+        self.assertRaises(Exception, Importer.EncodeValue, self.module, lambda: None)
+
+
+class TestManifestValidity(unittest.TestCase):
+    def setUp(self):
+        tempDir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempDir)
+        self.addCleanup(setattr, Importer, 'manifestPath', Importer.manifestPath)
+        self.addCleanup(setattr, Importer, 'manifest', Importer.manifest)
+        Importer.manifestPath = os.path.join(tempDir, 'plugin-manifest.json')
+        Importer.manifest = {'/plugins' : []}
+        Importer.WriteManifest()
+
+    def ReadManifest(self):
+        Importer.manifest = None
+        return Importer.ReadManifest()
+
+    def test_unchanged(self):
+        self.assertEqual(self.ReadManifest(), {'/plugins' : []})
+
+    def test_core_file_changed(self):
+        coreFiles = Importer.CoreFiles()
+        self.assertIn('XSConsoleImporter.py', [ filename for filename, statKey in coreFiles ])
+        coreFiles[0][1][1] += 1 # As if the file had been upgraded
+        self.addCleanup(setattr, Importer, 'CoreFiles', Importer.__dict__['CoreFiles'])
+        Importer.CoreFiles = classmethod(lambda cls: coreFiles)
+        self.assertEqual(self.ReadManifest(), {})
+
+
+if __name__ == '__main__':
+    unittest.main()
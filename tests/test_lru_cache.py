@@ -0,0 +1,34 @@
+import unittest
+
+from XSConsoleBases import LRUCache
+from XSConsoleLang import Language
+
+
+class TestLRUCache(unittest.TestCase):
+    def setUp(self):
+        self.cache = LRUCache('test', 2)
+        self.addCleanup(LRUCache.caches.remove, self.cache)
+
+    def test_hits_and_misses(self):
+        self.assertEqual(self.cache.Lookup('a', lambda: 1), 1)
+        self.assertEqual(self.cache.Lookup('a', lambda: 2), 1)
+        self.assertEqual(self.cache.Stats(), {'entries': 1, 'hits': 1, 'misses': 1})
+
+    def test_least_recently_used_discarded(self):
+        self.cache.Lookup('a', lambda: 1)
+        self.cache.Lookup('b', lambda: 2)
+        self.cache.Lookup('a', lambda: 1) # 'b' is now the least recently used
+        self.cache.Lookup('c', lambda: 3)
+        self.assertEqual(list(self.cache.entries.keys()), ['a', 'c'])
+
+    def test_reflow_cached(self):
+        text = 'The quick brown fox jumps over the lazy dog, twice over'
+        hits = Language.reflowCache.hits
+        lines = Language.ReflowText(text, 20)
+        lines.append('changed by the caller')
+        self.assertEqual(Language.ReflowText(text, 20), Language.ReflowUncached(text, 20))
+        self.assertEqual(Language.reflowCache.hits, hits + 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,47 @@
+import unittest
+
+from XSConsoleMenus import ChoiceDef, Menu, MenuSource
+
+
+class TestMenuSource(unittest.TestCase):
+    def setUp(self):
+        self.created = []
+        entries = [ ('vm%04d' % i, 'handle%d' % i) for i in range(5000) ]
+        self.menu = Menu(None, 'MENU_VM', 'All VMs')
+        self.menu.SourceSet(MenuSource(entries, self.MakeChoice, ChoiceDef('<None>')))
+
+    def MakeChoice(self, inName, inHandle):
+        self.created.append(inHandle)
+        return ChoiceDef(inName, handle = inHandle)
+
+    def test_choices_created_on_demand(self):
+        self.assertEqual(self.menu.NumChoices(), 5000)
+        self.assertEqual(self.menu.ChoiceName(4999), 'vm4999')
+        self.menu.HandleKey('KEY_UP') # Wraps to the last choice
+        self.assertEqual(self.menu.CurrentChoiceDef().handle, 'handle4999')
+        self.assertEqual(self.created, ['handle4999'])
+
+    def test_type_ahead_filter(self):
+        for key in '0012':
+            self.menu.HandleKey(key)
+        self.assertEqual(self.menu.NumChoices(), 1)
+        self.assertEqual(self.menu.CurrentChoiceDef().name, 'vm0012')
+        self.assertEqual(self.menu.Title(), 'All VMs [0012]')
+        self.menu.HandleKey('KEY_BACKSPACE')
+        self.assertEqual(self.menu.NumChoices(), 15) # vm001x and vmx001
+        self.menu.HandleKey('KEY_ESCAPE')
+        self.assertEqual(self.menu.NumChoices(), 5000)
+
+    def test_no_matches(self):
+        self.menu.HandleKey('x')
+        self.assertEqual(self.menu.NumChoices(), 1)
+        self.assertEqual(self.menu.CurrentChoiceDef().name, '<None>')
+
+    def test_filter_kept_on_regeneration(self):
+        self.menu.HandleKey('9')
+        self.menu.SourceSet(MenuSource([ ('vm9', 'h9'), ('vm8', 'h8') ], self.MakeChoice, ChoiceDef('<None>')))
+        self.assertEqual([ self.menu.ChoiceName(i) for i in range(self.menu.NumChoices()) ], ['vm9'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,141 @@
+import io
+import time
+import unittest
+
+from XSConsoleAuth import Auth
+from XSConsoleMetrics import HotMetrics, MetricsHistory
+from tests.benchmark_metrics import GenerateRRDUpdates, MinidomParseXML
+
+
+class TestParseXML(unittest.TestCase):
+    def test_matches_minidom(self):
+        content = GenerateRRDUpdates(20, inNumRows = 3)
+        result = HotMetrics().ParseXML(content)
+        self.assertEqual(result, MinidomParseXML(content))
+        self.assertEqual(len(result), 19 + 20 * 8)
+
+    def test_uses_most_recent_row(self):
+        content = ('<xport><meta><legend><entry>a</entry><entry>b</entry></legend></meta><data>'
+            '<row><t>10</t><v>1</v><v>2</v></row><row><t>20</t><v>3</v><v>4</v></row>'
+            '<row><t>15</t><v>5</v><v>6</v></row></data></xport>')
+        self.assertEqual(HotMetrics().ParseXML(content), {'a': '3', 'b': '4'})
+
+    def test_no_rows(self):
+        content = '<xport><meta><legend><entry>a</entry></legend></meta><data></data></xport>'
+        self.assertEqual(HotMetrics().ParseXML(content), {})
+
+
+class TestMetricsIndex(unittest.TestCase):
+    def setUp(self):
+        self.metrics = HotMetrics()
+        self.metrics.thisHostUUID = 'host-uuid'
+        self.metrics.data = self.metrics.ParseXML(GenerateRRDUpdates(3))
+        self.metrics.BuildIndex()
+        self.metrics.timestamp = time.time()
+
+    def test_host(self):
+        host = self.metrics.LocalHostMetrics()
+        self.assertEqual(host['numcpus'], 16)
+        self.assertEqual(host['memory_total'], float(self.metrics.data['AVERAGE:host:host-uuid:memory_total_kib']) * 1024.0)
+
+    def test_vm(self):
+        vm = self.metrics.VMMetrics('vm-uuid-1')
+        self.assertEqual(vm['numcpus'], 2)
+        self.assertEqual(vm['cpuusage'], (float(self.metrics.data['AVERAGE:vm:vm-uuid-1:cpu0']) +
+            float(self.metrics.data['AVERAGE:vm:vm-uuid-1:cpu1'])) / 2)
+        self.assertEqual(vm['counters']['vif_0_rx'], self.metrics.data['AVERAGE:vm:vm-uuid-1:vif_0_rx'])
+        self.assertEqual(sorted(self.metrics.AllVMMetrics().keys()), ['vm-uuid-0', 'vm-uuid-1', 'vm-uuid-2'])
+
+    def test_unknown_vm(self):
+        vm = self.metrics.VMMetrics('missing')
+        self.assertEqual((vm['numcpus'], vm['cpuusage'], vm['memory_total']), (0, None, None))
+
+
+class TestMetricsHistory(unittest.TestCase):
+    def test_ring_buffer_wraps(self):
+        history = MetricsHistory(3)
+        for t in range(5):
+            history.Append(t, ['a'], [str(t * 10)])
+        self.assertEqual(history.Series('a'), [(2.0, 20.0), (3.0, 30.0), (4.0, 40.0)])
+        self.assertEqual(history.LastTime(), 4.0)
+
+    def test_missing_series_dropped(self):
+        history = MetricsHistory(2)
+        history.Append(1, ['a', 'b'], ['1', '2'])
+        history.Append(2, ['a'], ['3'])
+        self.assertEqual(history.Series('b'), [(1.0, 2.0)])
+        history.Append(3, ['a'], ['4'])
+        self.assertEqual(history.Series('b'), [])
+        self.assertEqual(list(history.series.keys()), ['a'])
+
+    def test_incremental_rows(self):
+        metrics = HotMetrics()
+        self.assertTrue(metrics.FetchStart() <= int(time.time()) - metrics.SNAPSHOT_SECS)
+        rows = []
+        content = GenerateRRDUpdates(1, inNumRows = 3, inEnd = int(time.time()))
+        metrics.ParseStream(io.BytesIO(content.encode('utf-8')),
+            lambda rowTime, entries, values: rows.append((rowTime, entries, values)))
+        metrics.AddHistoryRows(rows)
+        metrics.AddHistoryRows(rows[:1]) # Overlapping rows are ignored
+        self.assertEqual(len(metrics.history.Series('AVERAGE:vm:vm-uuid-0:cpu0')), 3)
+        self.assertEqual(metrics.FetchStart(), max(row[0] for row in rows))
+
+
+class FakeResponse(io.BytesIO):
+    def __init__(self, inStatus, inBody):
+        io.BytesIO.__init__(self, inBody.encode('utf-8'))
+        self.status = inStatus
+        self.will_close = False
+
+
+class FakeConnection:
+    def __init__(self, inStatuses):
+        self.statuses = inStatuses
+        self.paths = []
+
+    def request(self, inMethod, inPath):
+        self.paths.append(inPath)
+
+    def getresponse(self):
+        return FakeResponse(self.statuses.pop(0), GenerateRRDUpdates(1, inEnd = int(time.time())))
+
+    def close(self):
+        pass
+
+
+class FakeSession:
+    def __init__(self, inID):
+        self._session = inID
+
+
+class TestPersistentConnection(unittest.TestCase):
+    def setUp(self):
+        self.sessions = []
+        self.metrics = HotMetrics()
+        self.metrics.thisHostUUID = 'host-uuid'
+        self.connection = FakeConnection([200, 200, 401, 200])
+        self.metrics.connection = self.connection
+        # A private Auth, so that the session pool starts empty whatever other tests have run
+        self.addCleanup(setattr, Auth, 'instance', Auth.instance)
+        auth = Auth.instance = Auth()
+        auth.OpenSession = self.OpenSession
+        auth.CloseSession = lambda inSession: None
+
+    def OpenSession(self):
+        self.sessions.append(FakeSession('session%d' % len(self.sessions)))
+        return self.sessions[-1]
+
+    def test_session_reused_and_renewed(self):
+        self.metrics.FetchData()
+        self.metrics.FetchData()
+        self.assertEqual(len(self.sessions), 1)
+        self.assertEqual(self.metrics.Counters()['logins_avoided'], 1)
+        self.metrics.FetchData() # 401 then 200 with a new session
+        self.assertEqual(len(self.sessions), 2)
+        self.assertEqual(self.metrics.Counters()['session_reconnects'], 1)
+        self.assertTrue('session_id=session1' in self.connection.paths[-1])
+        self.assertEqual(self.metrics.Counters()['connections_reused'], 4)
+
+
+if __name__ == '__main__':
+    unittest.main()
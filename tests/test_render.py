@@ -0,0 +1,83 @@
+import unittest
+
+from XSConsoleCurses import CursesPalette, CursesPane
+
+
+class FakeWin:
+    def __init__(self):
+        self.writes = []
+        self.erased = 0
+        self.boxed = 0
+
+    def addstr(self, inY, inX, inStr, inAttr):
+        self.writes.append((inY, inX, inStr, inAttr))
+
+    def bkgdset(self, inChar, inAttr):
+        pass
+
+    def erase(self):
+        self.erased += 1
+
+    def box(self, inX, inY):
+        self.boxed += 1
+
+    def noutrefresh(self):
+        pass
+
+
+class TestRetainedPane(unittest.TestCase):
+    def setUp(self):
+        self.savedColours = CursesPalette.colours
+        CursesPalette.colours = {'base': 1, 'bright': 2}
+        self.savedBytes = CursesPane.bytesWritten
+        self.pane = CursesPane(0, 0, 10, 4, 0, 0)
+        self.pane.win = FakeWin()
+        self.pane.hasBox = False
+        self.pane.DefaultColourSet('base')
+        self.pane.RetainedSet(True)
+
+    def tearDown(self):
+        CursesPalette.colours = self.savedColours
+        CursesPane.bytesWritten = self.savedBytes
+
+    def Render(self, inLines):
+        self.pane.win.writes = []
+        self.pane.Erase()
+        for y, (text, colour) in enumerate(inLines):
+            self.pane.AddText(text, 0, y, colour)
+        self.pane.Refresh()
+        return self.pane.win.writes
+
+    def test_first_frame_skips_blanks(self):
+        writes = self.Render([('ab', None), ('', None), ('  c', None), ('d', 'bright')])
+        self.assertEqual(writes, [(0, 0, b'ab', 1), (2, 2, b'c', 1), (3, 0, b'd', 2)])
+        self.assertEqual(self.pane.win.erased, 1)
+        self.assertTrue(self.pane.FrameChanged())
+
+    def test_only_changed_cells_written(self):
+        self.Render([('hello', None), ('world', None)])
+        bytesBefore = CursesPane.bytesWritten
+        writes = self.Render([('help!', None), ('world', None)])
+        self.assertEqual(writes, [(0, 3, b'p!', 1)])
+        self.assertEqual(CursesPane.bytesWritten - bytesBefore, 2)
+        self.assertEqual(self.pane.win.erased, 1)
+
+    def test_unchanged_frame(self):
+        self.Render([('hello', None)])
+        self.assertEqual(self.Render([('hello', None)]), [])
+        self.assertFalse(self.pane.FrameChanged())
+
+    def test_attribute_change_and_erased_text(self):
+        self.Render([('abc', None), ('xyz', None)])
+        writes = self.Render([('abc', 'bright'), ('x', None)])
+        self.assertEqual(writes, [(0, 0, b'abc', 2), (1, 1, b'  ', 1)])
+
+    def test_invalidate_redraws(self):
+        self.Render([('abc', None)])
+        self.pane.Invalidate()
+        self.assertEqual(self.Render([('abc', None)]), [(0, 0, b'abc', 1)])
+        self.assertEqual(self.pane.win.erased, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,67 @@
+import time
+import unittest
+
+from XSConsoleScheduler import RefreshWorker, Scheduler
+
+
+class TestScheduler(unittest.TestCase):
+    def setUp(self):
+        self.scheduler = Scheduler()
+        self.calls = []
+
+    def test_timers_run_in_order(self):
+        self.scheduler.AddTimer('b', 0.02, lambda: self.calls.append('b'))
+        self.scheduler.AddTimer('a', 0.01, lambda: self.calls.append('a'))
+        self.scheduler.Wait([])
+        self.scheduler.Wait([])
+        self.assertEqual(self.calls, ['a', 'b'])
+        self.assertEqual(self.scheduler.SecondsToNextTimer(), None)
+
+    def test_cancel_and_replace(self):
+        self.scheduler.AddTimer('a', 0.0, lambda: self.calls.append('first'))
+        self.scheduler.AddTimer('a', 0.0, lambda: self.calls.append('second'))
+        self.scheduler.AddTimer('b', 0.0, lambda: self.calls.append('b'))
+        self.scheduler.CancelTimer('b')
+        self.scheduler.Wait([], 0.0)
+        self.assertEqual(self.calls, ['second'])
+
+    def test_repeating_timer(self):
+        self.scheduler.AddTimer('tick', 0.0, lambda: self.calls.append('tick'), 0.01)
+        for i in range(3):
+            self.scheduler.Wait([])
+        self.assertEqual(self.calls, ['tick'] * 3)
+        self.assertTrue(self.scheduler.HasTimer('tick'))
+
+    def test_notify_wakes_wait(self):
+        self.scheduler.Notify()
+        self.scheduler.Notify()
+        startTime = time.time()
+        self.assertEqual(self.scheduler.Wait([], 5.0), [])
+        self.assertTrue(time.time() - startTime < 1.0)
+        self.assertTrue(self.scheduler.DrainNotifications())
+        self.assertFalse(self.scheduler.DrainNotifications())
+
+
+class TestRefreshWorker(unittest.TestCase):
+    def test_requests_merged_and_completions_run(self):
+        worker = RefreshWorker()
+        calls = []
+        completions = []
+        worker.condition.acquire() # Hold the worker until both requests are queued
+        try:
+            worker.Request('data', lambda: calls.append('data'), lambda: completions.append(1))
+            worker.Request('data', lambda: calls.append('again'), lambda: completions.append(2))
+            self.assertTrue(worker.IsPending('data'))
+        finally:
+            worker.condition.release()
+        for i in range(100):
+            if not worker.IsBusy():
+                break
+            time.sleep(0.01)
+        self.assertEqual(calls, ['data'])
+        worker.RunCompletions()
+        self.assertEqual(completions, [1, 2])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,61 @@
+import os
+import shutil
+import stat
+import tempfile
+import unittest
+
+from XSConsoleUtils import ServiceStates
+
+# Stands in for systemctl on the PATH, logging each call
+FAKE_SYSTEMCTL = '''#!/bin/sh
+echo "$@" >> "%s"
+if [ "$1" = "show" ]; then
+    printf 'UnitFileState=enabled\\nActiveState=active\\n\\nUnitFileState=disabled\\nActiveState=inactive\\n\\nUnitFileState=static\\nActiveState=failed\\n'
+elif [ "$2" = "missing" ]; then
+    echo "Unit missing.service not found." >&2
+    exit 5
+fi
+'''
+
+
+class TestServiceStates(unittest.TestCase):
+    def setUp(self):
+        tempDir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, tempDir)
+        self.logPath = os.path.join(tempDir, 'calls')
+        scriptPath = os.path.join(tempDir, 'systemctl')
+        script = open(scriptPath, 'w')
+        script.write(FAKE_SYSTEMCTL % self.logPath)
+        script.close()
+        os.chmod(scriptPath, stat.S_IRWXU)
+        oldPath = os.environ['PATH']
+        os.environ['PATH'] = tempDir + os.pathsep + oldPath
+        self.addCleanup(os.environ.__setitem__, 'PATH', oldPath)
+        self.states = ServiceStates()
+
+    def Calls(self):
+        with open(self.logPath) as logFile:
+            return [ line.strip() for line in logFile ]
+
+    def test_one_call_for_all_units(self):
+        sshd = self.states.State('sshd')
+        chronyd = self.states.State('chronyd')
+        self.assertEqual((sshd.enabled, sshd.active, chronyd.enabled, chronyd.active), (True, True, False, False))
+        self.assertEqual(self.Calls(), ['show --property=UnitFileState,ActiveState -- sshd chronyd'])
+
+    def test_new_unit_added_to_query(self):
+        self.states.State('sshd')
+        extra = self.states.State('xapi')
+        self.assertEqual((extra.enabled, extra.active), (True, False))
+        self.assertEqual(len(self.Calls()), 2)
+
+    def test_control_invalidates(self):
+        self.states.State('sshd')
+        self.states.Control('stop', 'sshd')
+        self.states.State('sshd')
+        self.assertEqual(self.Calls()[1:], ['stop sshd', 'show --property=UnitFileState,ActiveState -- sshd chronyd'])
+        self.assertRaises(Exception, self.states.Control, 'start', 'missing')
+
+
+if __name__ == '__main__':
+    unittest.main()
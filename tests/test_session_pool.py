@@ -0,0 +1,62 @@
+import unittest
+
+import XenAPI
+
+from XSConsoleAuth import Auth
+
+
+class FakeSession:
+    def __init__(self, inID):
+        self._session = inID
+        self.loggedOut = False
+
+    def logout(self):
+        self.loggedOut = True
+
+
+class TestSessionPool(unittest.TestCase):
+    def setUp(self):
+        self.sessions = []
+        self.auth = Auth()
+        self.auth.OpenSession = self.OpenSession
+
+    def OpenSession(self):
+        self.sessions.append(FakeSession('session%d' % len(self.sessions)))
+        return self.sessions[-1]
+
+    def test_sessions_reused(self):
+        for i in range(10):
+            self.auth.ReleaseSession(self.auth.AcquireSession())
+        self.assertEqual(len(self.sessions), 1)
+        self.assertEqual(self.auth.SessionPoolStats()['reuses'], 9)
+
+    def test_idle_sessions_bounded(self):
+        sessions = [ self.auth.AcquireSession() for i in range(Auth.POOL_MAX_IDLE + 2) ]
+        for session in sessions:
+            self.auth.ReleaseSession(session)
+        self.assertEqual(self.auth.SessionPoolStats()['idle'], Auth.POOL_MAX_IDLE)
+        self.assertEqual(len([ session for session in self.sessions if session.loggedOut ]), 2)
+
+    def test_reconnect_errors_discard(self):
+        session = self.auth.AcquireSession()
+        self.auth.ReleaseSession(session, XenAPI.Failure(['SESSION_INVALID', 'session0']))
+        self.assertTrue(session.loggedOut)
+        self.assertFalse(self.auth.AcquireSession() is session)
+
+    def test_unhealthy_idle_session_replaced(self):
+        session = self.auth.AcquireSession()
+        self.auth.ReleaseSession(session)
+        self.auth.idleSessions[0].idleSince -= Auth.POOL_HEALTH_CHECK_SECS + 1
+        self.assertFalse(self.auth.AcquireSession() is session) # FakeSession has no xenapi, so fails the check
+        self.assertEqual(len(self.sessions), 2)
+
+    def test_idle_expiry(self):
+        self.auth.ReleaseSession(self.auth.AcquireSession())
+        self.auth.idleSessions[0].idleSince -= Auth.POOL_IDLE_EXPIRY_SECS + 1
+        self.auth.ExpireIdleSessions()
+        self.assertEqual(self.auth.SessionPoolStats()['idle'], 0)
+        self.assertTrue(self.sessions[0].loggedOut)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,106 @@
+import threading
+import time
+import unittest
+
+try:
+    from xmlrpc.client import DateTime
+except ImportError:
+    from xmlrpclib import DateTime
+
+from XSConsoleAuth import Auth
+from XSConsoleHotData import HotOpaqueRef
+from XSConsoleTask import Task, TaskEntry
+
+
+class FakeTaskClass:
+    def __init__(self):
+        self.calls = []
+        self.fields = {'status': 'pending', 'created': DateTime('20260101T00:00:00Z'),
+            'finished': DateTime('20260101T00:00:05Z'), 'result': ''}
+
+    def __getattr__(self, inName):
+        def Call(inRef):
+            self.calls.append(inName)
+            return self.fields[inName[len('get_'):]]
+        return Call
+
+
+class FailingEventClass:
+    def __getattr__(self, inName):
+        def Call(*inParams):
+            raise Exception('event.'+inName+' failed')
+        return Call
+
+
+class FakeSession:
+    def __init__(self):
+        self.xenapi = type('xenapi', (), {})()
+        self.xenapi.task = FakeTaskClass()
+        self.xenapi.event = FailingEventClass()
+
+
+class TestTaskEvents(unittest.TestCase):
+    def setUp(self):
+        self.task = Task()
+        self.saved = Task.instance
+        Task.instance = self.task
+        self.session = FakeSession()
+        self.ref = HotOpaqueRef('OpaqueRef:task1', 'task')
+        self.entry = TaskEntry(self.ref, self.session)
+        self.task.taskList[self.ref] = self.entry
+
+    def tearDown(self):
+        Task.instance = self.saved
+
+    def Event(self, inStatus, inProgress):
+        return {'class': 'task', 'operation': 'mod', 'ref': 'OpaqueRef:task1',
+            'snapshot': {'status': inStatus, 'progress': inProgress, 'created': DateTime('20260101T00:00:00Z'),
+                'finished': DateTime('20260101T00:00:05Z'), 'result': '', 'error_info': [], 'allowed_operations': ['cancel']}}
+
+    def test_status_without_record_uses_xapi(self):
+        self.assertTrue(self.entry.IsPending())
+        self.assertEqual(self.session.xenapi.task.calls, ['get_status'])
+
+    def test_status_and_progress_from_events(self):
+        self.task.ApplyEvents([self.Event('pending', 0.5),
+            {'class': 'task', 'operation': 'add', 'ref': 'OpaqueRef:other', 'snapshot': {}}])
+        self.assertEqual(self.entry.ProgressValue(), 0.5)
+        self.assertTrue(self.entry.CanCancel())
+        self.assertEqual(list(self.task.records.keys()), [self.ref])
+        self.assertEqual(self.session.xenapi.task.calls, [])
+
+    def test_wait_wakes_on_event(self):
+        self.task.ApplyEvents([self.Event('pending', 0.0)])
+        self.task.watching = True # Wait for events rather than polling
+        timer = threading.Timer(0.05, lambda: self.task.ApplyEvents([self.Event('success', 1.0)]))
+        timer.start()
+        self.entry.Wait()
+        timer.join()
+        self.assertTrue(self.entry.Completed())
+        self.assertEqual(self.entry.DurationSecs(), 5)
+        self.assertEqual(self.session.xenapi.task.calls, [])
+
+    def test_watcher_failure_falls_back_to_polling(self):
+        # A private Auth, so that sessions released to its pool can't reach other tests
+        self.addCleanup(setattr, Auth, 'instance', Auth.instance)
+        auth = Auth.instance = Auth()
+        auth.AcquireSession = lambda: FakeSession()
+        auth.CloseSession = lambda inSession: None
+        self.task.ApplyEvents([self.Event('pending', 0.0)])
+        self.task.StartWatching()
+        deadline = time.time() + 5.0
+        while self.task.watching and time.time() < deadline:
+            time.sleep(0.01)
+        self.assertFalse(self.task.watching)
+        self.session.xenapi.task.fields['status'] = 'success'
+        waiter = threading.Thread(target = self.entry.Wait)
+        waiter.daemon = True
+        waiter.start()
+        waiter.join(5.0)
+        self.assertFalse(waiter.is_alive())
+        self.assertTrue(self.entry.Completed())
+        self.assertIn('get_status', self.session.xenapi.task.calls)
+
+
+if __name__ == '__main__':
+    unittest.main()
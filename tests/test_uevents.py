@@ -0,0 +1,73 @@
+import os
+import shutil
+import struct
+import tempfile
+import time
+import unittest
+
+from XSConsoleUtils import DeviceTimeout, Uevents
+
+
+def UdevMessage(inProperties):
+    properties = b'\0'.join(inProperties) + b'\0'
+    headerSize = 40
+    header = b'libudev\0' + struct.pack('!I', Uevents.UDEV_MAGIC) + struct.pack('=III', headerSize, headerSize, len(properties))
+    return header + b'\0' * (headerSize - len(header)) + properties
+
+
+class TestUevents(unittest.TestCase):
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempDir)
+        self.sysfsDir = Uevents.SYSFS_DIR
+        Uevents.SYSFS_DIR = self.tempDir
+        self.addCleanup(setattr, Uevents, 'SYSFS_DIR', self.sysfsDir)
+        for devPath, removable in (('/devices/usb1/1-1/host6/block/sdb', '1'), ('/devices/virtual/block/td0', '0')):
+            os.makedirs(self.tempDir + devPath)
+            with open(self.tempDir + devPath + '/removable', 'w') as removableFile:
+                removableFile.write(removable + '\n')
+
+    def test_kernel_message(self):
+        message = b'add@/devices/usb1/1-1/host6/block/sdb\0ACTION=add\0DEVPATH=/devices/usb1/1-1/host6/block/sdb\0DEVNAME=sdb\0DEVTYPE=disk\0SUBSYSTEM=block\0SEQNUM=2051\0'
+        properties = Uevents.Parse(message)
+        self.assertEqual(properties['DEVNAME'], 'sdb')
+        self.assertTrue(Uevents.IsRemovableMediaEvent(properties))
+
+    def test_udev_message(self):
+        properties = Uevents.Parse(UdevMessage([b'ACTION=remove', b'SUBSYSTEM=block', b'DEVNAME=/dev/sdb1', b'DEVTYPE=partition', b'ID_BUS=usb']))
+        self.assertEqual(properties['DEVNAME'], '/dev/sdb1')
+        self.assertTrue(Uevents.IsRemovableMediaEvent(properties))
+
+    def test_other_events_ignored(self):
+        self.assertFalse(Uevents.IsRemovableMediaEvent(Uevents.Parse(b'add@/devices/virtual/net/vif1.0\0ACTION=add\0SUBSYSTEM=net\0')))
+        self.assertFalse(Uevents.IsRemovableMediaEvent(Uevents.Parse(b'libudev\0' + b'\0' * 32)))
+        self.assertFalse(Uevents.IsRemovableMediaEvent(Uevents.Parse(UdevMessage([b'ACTION=add', b'SUBSYSTEM=block',
+            b'DEVPATH=/devices/virtual/block/td0', b'DEVTYPE=disk']))))
+        self.assertFalse(Uevents.IsRemovableMediaEvent(Uevents.Parse(UdevMessage([b'ACTION=remove', b'SUBSYSTEM=block',
+            b'DEVPATH=/devices/virtual/block/nbd3', b'DEVTYPE=disk']))))
+
+
+class TestWaitForDevice(unittest.TestCase):
+    def setUp(self):
+        self.tempDir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.tempDir)
+        self.udevDataDir = Uevents.UDEV_DATA_DIR
+        Uevents.UDEV_DATA_DIR = os.path.join(self.tempDir, 'no-udev')
+        self.addCleanup(setattr, Uevents, 'UDEV_DATA_DIR', self.udevDataDir)
+
+    def test_ready_device_returns_at_once(self):
+        path = os.path.join(self.tempDir, 'sdb')
+        open(path, 'w').close()
+        startTime = time.time()
+        Uevents.WaitForDevice(path, 5)
+        self.assertLess(time.time() - startTime, 1.0)
+
+    def test_timeout(self):
+        path = os.path.join(self.tempDir, 'sdc')
+        with self.assertRaises(DeviceTimeout) as context:
+            Uevents.WaitForDevice(path, 0.2)
+        self.assertIn(path, str(context.exception))
+
+
+if __name__ == '__main__':
+    unittest.main()
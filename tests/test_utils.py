@@ -1,6 +1,7 @@
+import time
 import unittest
 
-from XSConsoleUtils import IPUtils
+from XSConsoleUtils import IPUtils, ShellProbes
 
 
 class TestIPAddress(unittest.TestCase):
@@ -21,5 +22,18 @@ class TestIPAddress(unittest.TestCase):
         self.assertFalse(IPUtils.ValidateIP('256.256.256.256'))
 
 
+class TestShellProbes(unittest.TestCase):
+
+    def test_concurrent_with_timeouts(self):
+        probes = ShellProbes()
+        probes.Add('exit', 'echo output; exit 3', 5)
+        probes.Add('slow', 'sleep 0.3; echo done', 5)
+        probes.Add('hung', 'sleep 10', 0.3)
+        startTime = time.time()
+        results = probes.Run()
+        self.assertLess(time.time() - startTime, 2.0)
+        self.assertEqual(results, {'exit': (3, 'output'), 'slow': (0, 'done'), 'hung': (None, '')})
+
+
 if __name__ == '__main__':
     unittest.main()